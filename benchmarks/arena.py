@@ -0,0 +1,65 @@
+# Package: Graphic Server Protocol / Matplotlib
+# Authors: Nicolas P .Rougier <nicolas.rougier@inria.fr>
+# License: BSD 3 clause
+"""
+Workspace arena benchmark
+
+Render a mesh while rotating the camera (as during a trackball drag)
+and report, after warm-up, the number of arrays allocated in the
+workspace arena of the visual (should be zero) as well as the peak
+memory traced during a frame, which includes matplotlib own
+allocations (paths and colors) and per-frame temporaries that are not
+taken from the arena (sort orders, index arrays, gathered faces). The
+benchmark fails if the arena grows or if the peak exceeds `budget`
+times the size of the projected faces. Number of faces can be given:
+
+    python arena.py 10000 100000
+"""
+import sys
+import time
+import tracemalloc
+import numpy as np
+import matplotlib
+matplotlib.use("Agg")
+from gsp import core, visual, glm
+
+def sphere(count):
+    """ Random triangles on the unit sphere """
+
+    V = np.random.normal(0, 1, (count, 3))
+    V /= np.linalg.norm(V, axis=1)[:,None]
+    F = np.random.randint(0, count, (count, 3))
+    return V.astype(np.float32), F
+
+canvas = core.Canvas(512, 512, 100.0)
+viewport = core.Viewport(canvas, 0, 0, 512, 512)
+view = glm.translate((0, 0, -5))
+proj = glm.perspective(30, 1, 1, 100)
+
+sizes = [int(float(size)) for size in sys.argv[1:]] or [10_000, 100_000]
+budget = 16
+print(f"{'faces':>10} {'time (ms)':>10} {'allocations':>12} {'peak (MB)':>10} {'faces (MB)':>11}")
+for size in sizes:
+    V, F = sphere(size)
+    mesh = visual.Mesh(V, F, None, core.Color(1,1,1,1), core.Color(0,0,0,1), 0.25)
+    for angle in range(5):
+        mesh.render(viewport, glm.yrotate(angle), view, proj)
+    counters = mesh.counters
+
+    tracemalloc.start()
+    peak, duration = 0, 0
+    for angle in range(5, 25):
+        tracemalloc.reset_peak()
+        current = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        mesh.render(viewport, glm.yrotate(angle), view, proj)
+        duration += time.perf_counter() - start
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - current)
+    tracemalloc.stop()
+
+    allocations = mesh.counters["arena_allocations"] - counters["arena_allocations"]
+    nbytes = F.size*3*4
+    print(f"{size:>10,} {1000*duration/20:>10.1f} {allocations:>12} "
+          f"{peak/2**20:>10.1f} {nbytes/2**20:>11.1f}")
+    assert allocations == 0, "Workspace arena grew after warm-up"
+    assert peak < budget*nbytes, "Frame peak memory exceeds budget"
@@ -0,0 +1,45 @@
+# Package: Graphic Server Protocol / Matplotlib
+# Authors: Nicolas P .Rougier <nicolas.rougier@inria.fr>
+# License: BSD 3 clause
+"""
+Depth sort benchmark
+
+Compare np.argsort with the quantized radix sort used by visuals
+(sorting = "radix") on random depth values. The largest size (1e8)
+requires several gigabytes of memory and is only run when requested:
+
+    python sort.py 1e5 1e6 1e7 1e8
+"""
+import sys
+import time
+import numpy as np
+from gsp.visual.visual import radix_argsort
+
+def timeit(function, *args, repeat=3):
+    """ Best time (seconds) out of *repeat* calls """
+
+    best = np.inf
+    for i in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def error(depth, order):
+    """ Largest depth difference among consecutive misordered items """
+
+    depth = depth[order]
+    return max(0, (depth[:-1] - depth[1:]).max())
+
+sizes = [int(float(size)) for size in sys.argv[1:]] or [100_000, 1_000_000, 10_000_000]
+print(f"{'size':>12} {'method':>18} {'time (ms)':>10} {'error':>10}")
+for size in sizes:
+    depth = np.random.uniform(-1, +1, size).astype(np.float32)
+    methods = [("np.argsort",         np.argsort,    ()),
+               ("np.argsort stable",  lambda depth: np.argsort(depth, kind="stable"), ()),
+               ("radix (8 bits)",     radix_argsort, (8,)),
+               ("radix (16 bits)",    radix_argsort, (16,))]
+    for name, function, args in methods:
+        duration = timeit(function, depth, *args)
+        order = function(depth, *args)
+        print(f"{size:>12,} {name:>18} {1000*duration:>10.1f} {error(depth, order):>10.2e}")
@@ -0,0 +1,29 @@
+# Package: Graphic Server Protocol / Matplotlib
+# Authors: Nicolas P .Rougier <nicolas.rougier@inria.fr>
+# License: BSD 3 clause
+"""
+Compile the atlas of builtin markers without importing the gsp
+package (and its dependencies). Modules of gsp/core are imported
+from the source tree as part of a placeholder package:
+
+    python build_atlas.py [filename]
+
+The atlas is written to gsp/core/markers.npz by default.
+"""
+import os
+import sys
+import types
+import importlib
+
+def main(filename=None):
+    directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gsp", "core")
+    package = types.ModuleType("_gsp_core")
+    package.__path__ = [directory]
+    sys.modules["_gsp_core"] = package
+    atlas = importlib.import_module("_gsp_core.atlas")
+    Marker = importlib.import_module("_gsp_core.types").Marker
+    filename = filename or os.path.join(directory, "markers.npz")
+    atlas.compile(Marker.__sources__, filename)
+
+if __name__ == "__main__":
+    main(*sys.argv[1:2])
@@ -7,3 +7,4 @@ from . canvas import Canvas
 from . viewport import Viewport
 from . types import Type, Color, Marker, Measure
 from . types import LineCap, LineStyle, LineJoin
+from . loader import mesh
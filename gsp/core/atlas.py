@@ -0,0 +1,168 @@
+# Package: Graphic Server Protocol / Matplotlib
+# Authors: Nicolas P .Rougier <nicolas.rougier@inria.fr>
+# License: BSD 3 clause
+"""
+Marker atlas where the geometry of a set of markers (defined as SVG
+paths) is packed into a single array of vertices and a single array
+of codes, markers being delimited by offsets. The atlas of builtin
+markers is compiled when the package is built (see `compile` and
+build_atlas.py) or on first load for source checkouts (see
+`Marker.path`) such that loads read the packed arrays without parsing
+any SVG. Other markers are compiled at load time and saved in the
+cache directory (when enabled) in a file named after a hash of their
+sources.
+"""
+import os
+import hashlib
+import numpy as np
+from matplotlib.path import Path
+from . import diskcache
+
+#: Atlas of builtin markers, compiled at build time
+filename = os.path.join(os.path.dirname(os.path.abspath(__file__)), "markers.npz")
+
+# Version of the atlas layout, part of the hash
+_version = b"GSPATLAS1"
+
+
+def pack(sources):
+    """
+    Parse and pack the given marker *sources*.
+
+    Parameters
+    ----------
+    sources : dict
+        SVG path definitions indexed by marker identifier (int)
+
+    Returns
+    -------
+    dict
+        Marker identifiers (int64), offsets (int64), vertices
+        (float64, vec2) and codes (uint8) arrays
+    """
+
+    from . svg import svg_to_paths
+
+    keys = np.array(sorted(sources), dtype=np.int64)
+    paths = svg_to_paths([sources[key] for key in keys])
+    offsets = np.zeros(len(paths)+1, dtype=np.int64)
+    np.cumsum([len(path.vertices) for path in paths], out=offsets[1:])
+    vertices = np.zeros((offsets[-1], 2))
+    codes = np.full(offsets[-1], Path.LINETO, dtype=np.uint8)
+    for path, start, stop in zip(paths, offsets[:-1], offsets[1:]):
+        vertices[start:stop] = path.vertices
+        if path.codes is not None:
+            codes[start:stop] = path.codes
+        elif stop > start:
+            codes[start] = Path.MOVETO
+    return { "keys": keys, "offsets": offsets,
+             "vertices": vertices, "codes": codes }
+
+
+def compile(sources, filename=filename):
+    """
+    Compile the atlas of the given marker *sources* into *filename*,
+    with sources stored alongside such that they can be checked at
+    load time.
+
+    Parameters
+    ----------
+    sources : dict
+        SVG path definitions indexed by marker identifier (int)
+    filename : str
+        Atlas filename (.npz)
+    """
+
+    atlas = pack(sources)
+    atlas["sources"] = np.array([sources[key] for key in atlas["keys"]])
+    temporary = f"{filename}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as file:
+        np.savez(file, **atlas)
+    os.replace(temporary, filename)
+
+
+def read(filename, sources):
+    """
+    Return the paths of the given marker *sources* that are found
+    (with identical sources) in the atlas *filename*.
+
+    Parameters
+    ----------
+    filename : str
+        Atlas filename (.npz)
+    sources : dict
+        SVG path definitions indexed by marker identifier (int)
+
+    Returns
+    -------
+    dict
+        Matplotlib paths indexed by marker identifier
+    """
+
+    try:
+        with np.load(filename) as data:
+            atlas = { name: data[name] for name in
+                      ("keys", "offsets", "vertices", "codes", "sources") }
+    except (OSError, KeyError, ValueError):
+        return {}
+    offsets, vertices, codes = atlas["offsets"], atlas["vertices"], atlas["codes"]
+    return { int(key): Path(vertices[start:stop], codes[start:stop])
+             for key, source, start, stop in zip(atlas["keys"], atlas["sources"],
+                                                  offsets[:-1], offsets[1:])
+             if sources.get(int(key), None) == str(source) }
+
+
+def load(sources, cache=None):
+    """
+    Return the paths of the given marker *sources*. Builtin markers
+    are read from the atlas compiled at build time and other markers
+    are compiled, using the *cache* directory if given.
+
+    Parameters
+    ----------
+    sources : dict
+        SVG path definitions indexed by marker identifier (int)
+    cache : str | None
+        Cache directory (no cache if None)
+
+    Returns
+    -------
+    dict
+        Matplotlib paths indexed by marker identifier
+    """
+
+    paths = read(filename, sources) if os.path.exists(filename) else {}
+    sources = { key: source for key, source in sources.items()
+                if int(key) not in paths }
+    if not sources:
+        return paths
+
+    atlas, cached = None, None
+    if cache is not None:
+        digest = hashlib.sha1(_version)
+        for key in sorted(sources):
+            digest.update(f"{int(key)}:{sources[key]};".encode())
+        cached = os.path.join(cache, f"markers-{digest.hexdigest()}.npz")
+        if os.path.exists(cached):
+            try:
+                with np.load(cached) as data:
+                    atlas = { name: data[name] for name in
+                              ("keys", "offsets", "vertices", "codes") }
+                diskcache.touch(cached)
+            except (OSError, KeyError, ValueError):
+                atlas = None
+
+    if atlas is None:
+        atlas = pack(sources)
+        if cached is not None:
+            try:
+                os.makedirs(cache, exist_ok=True)
+                np.savez(cached, **atlas)
+                diskcache.evict(cache)
+            except OSError:
+                pass
+
+    offsets, vertices, codes = atlas["offsets"], atlas["vertices"], atlas["codes"]
+    paths.update({ int(key): Path(vertices[start:stop], codes[start:stop])
+                   for key, start, stop in zip(atlas["keys"], offsets[:-1], offsets[1:]) })
+    return paths
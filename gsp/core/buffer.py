@@ -49,6 +49,7 @@ class Buffer:
         self._array = None
         self._key = key
         self._buffers = {}
+        self._version = 0
 
         if dtype.names is not None:
             for name in dtype.names:
@@ -70,6 +71,23 @@ class Buffer:
         buffer = np.asanyarray(self).view(np.ubyte)
         buffer[offset:offset+len(data)] = np.frombuffer(data, np.ubyte)
 
+        # Updating a view also updates the underlying source
+        self._version += 1
+        if self._data is not None:
+            self._data._version += 1
+
+    @property
+    def version(self):
+        """
+        Version of the buffer that is incremented each time the buffer
+        or its underlying source is updated through `set_data`.
+        Modifications made through the underlying array are not
+        tracked.
+        """
+
+        if self._data is not None:
+            return self._data.version + self._version
+        return self._version
 
     def __getitem__(self, key):
         """
@@ -1,13 +1,15 @@
 # Package: Graphic Server Protocol / Matplotlib
 # Authors: Nicolas P .Rougier <nicolas.rougier@inria.fr>
 # License: BSD 3 clause
+import os
+import urllib.request
 import numpy as np
 from . buffer import Buffer
 from .. glm import ndarray
 
 class Data:
     """
-    Data represents a block of raw binary data, with an optional structure. This data is built using the provided uri that may either point to an external file, or be a data URI that encodes the binary data directly in the JSON file. When an uri is provided, data will is fetched just in time and stored locally. If no uri has been provided, aempty data will be created ex-nihilo just in time. Data can be modified and is tracked for any modification.
+    Data represents a block of raw binary data, with an optional structure. This data is built using the provided uri that may either point to an external file, or be a data URI that encodes the binary data directly in the JSON file. When an uri is provided, data will is fetched just in time and stored locally (local files are memory-mapped). If no uri has been provided, aempty data will be created ex-nihilo just in time. Data can be modified and is tracked for any modification.
 
     Examples
     --------
@@ -68,6 +70,7 @@ class Data:
 
         self._array = None
         self._buffers = []
+        self._version = 0
 
         if struct is not None:
             self._nbytes = sum([count*np.dtype(dt).itemsize for (count,dt) in struct])
@@ -94,6 +97,17 @@ class Data:
 
         buffer = np.asanyarray(self).view(np.ubyte)
         buffer[offset:offset+len(data)] = np.frombuffer(data, np.ubyte)
+        self._version += 1
+
+    @property
+    def version(self):
+        """
+        Version of the data that is incremented each time data is
+        updated through `set_data`. Modifications made through the
+        underlying array (e.g. `np.asarray(data)`) are not tracked.
+        """
+
+        return self._version
 
     def __getitem__(self, index):
         """
@@ -114,9 +128,25 @@ class Data:
         """
 
         if self._array is None:
-            self._array = ndarray.tracked(self._nbytes, np.ubyte)
+            # Local files are memory-mapped (copy on write) and their
+            # size is given by the file when not specified
+            if self._uri is not None and os.path.isfile(self._uri):
+                if self._nbytes is None:
+                    self._nbytes = os.path.getsize(self._uri)
+                if self._nbytes > 0:
+                    self._array = np.memmap(self._uri, np.ubyte, mode="c",
+                                            shape=(self._nbytes,))
+                    return self._array
+                self._array = ndarray.tracked(0, np.ubyte)
+                return self._array
+
+            bytes = None
             if self._uri is not None:
-                data = urllib.request.urlopen(uri)
+                data = urllib.request.urlopen(self._uri)
                 bytes = data.read()
+                if self._nbytes is None:
+                    self._nbytes = len(bytes)
+            self._array = ndarray.tracked(self._nbytes, np.ubyte)
+            if bytes is not None:
                 self._array[...] = np.frombuffer(bytes, np.ubyte)
         return self._array
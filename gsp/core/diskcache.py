@@ -0,0 +1,77 @@
+# Package: Graphic Server Protocol / Matplotlib
+# Authors: Nicolas P .Rougier <nicolas.rougier@inria.fr>
+# License: BSD 3 clause
+"""
+Disk cache for data that is expensive to compute or parse (marker
+atlas, mesh sidecars, level of detail pyramids). The cache is opt-in:
+nothing is written to disk unless a cache directory has been set,
+either through the `GSP_CACHE` environment variable or by setting
+`directory`. The cache is bounded and the least recently used files
+are evicted first when its size exceeds `size`.
+
+```python
+from gsp.core import diskcache
+diskcache.directory = "/tmp/gsp"
+diskcache.size = 64 * 2**20
+```
+"""
+import os
+import fnmatch
+
+#: Cache directory (None to disable the cache)
+directory = os.environ.get("GSP_CACHE", None) or None
+
+#: Maximum size of the cache (bytes)
+size = int(os.environ.get("GSP_CACHE_SIZE", 256 * 2**20))
+
+# Names of files written in the cache (other files are left untouched)
+_patterns = ("markers-*.npz", "lod-*.npz", "*.gspmesh")
+
+
+def touch(filename):
+    """
+    Mark a cached *filename* as recently used.
+
+    Parameters
+    ----------
+    filename : str
+        Cached filename
+    """
+
+    try:
+        os.utime(filename)
+    except OSError:
+        pass
+
+
+def evict(path, limit=None):
+    """
+    Remove the least recently used cached files of the *path*
+    directory until their total size is below *limit*.
+
+    Parameters
+    ----------
+    path : str
+        Cache directory
+    limit : int | None
+        Maximum size in bytes (default to `size`)
+    """
+
+    limit = size if limit is None else limit
+    try:
+        entries = [entry for entry in os.scandir(path) if entry.is_file()
+                   and any(fnmatch.fnmatch(entry.name, pattern)
+                           for pattern in _patterns)]
+    except OSError:
+        return
+    entries = [(entry.stat().st_mtime, entry.stat().st_size, entry.path)
+               for entry in entries]
+    total = sum(nbytes for _, nbytes, _ in entries)
+    for _, nbytes, filename in sorted(entries):
+        if total <= limit:
+            break
+        try:
+            os.remove(filename)
+            total -= nbytes
+        except OSError:
+            pass
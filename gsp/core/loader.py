@@ -0,0 +1,376 @@
+# Package: Graphic Server Protocol / Matplotlib
+# Authors: Nicolas P .Rougier <nicolas.rougier@inria.fr>
+# License: BSD 3 clause
+"""
+Mesh loading from OBJ, PLY and STL files using vectorized readers.
+When the disk cache is enabled (see `diskcache`), loaded meshes are
+written into a binary sidecar file named after a hash of the source
+content such that later loads memory-map the sidecar instead of
+parsing the source again.
+"""
+import os
+import re
+import hashlib
+import numpy as np
+from . data import Data
+from . import diskcache
+
+# Sidecar layout: positions (float32), face indices (uint32), normals
+# (float32) followed by a trailer with magic and counts (int64).
+_magic = b"GSPMESH1"
+_trailer = np.dtype([("magic", "S8"), ("vertices", "<i8"),
+                     ("faces", "<i8"), ("normals", "<i8")])
+
+
+def _lines(raw):
+    """ Return the start and length of lines of the given raw bytes. """
+
+    starts = np.concatenate([[0], np.flatnonzero(raw == ord("\n")) + 1])
+    return starts, np.diff(np.concatenate([starts, [len(raw)]]))
+
+
+def _select(raw, starts, lengths, selected, prefix):
+    """
+    Return the bytes of *selected* lines (including their newline)
+    where the first *prefix* bytes of each line have been blanked.
+    """
+
+    data = raw.copy()
+    for i in range(prefix):
+        data[starts[selected] + i] = ord(" ")
+    return data[np.repeat(selected, lengths)]
+
+
+def _numbers(raw, dtype=np.float64):
+    """ Parse whitespace separated numbers from raw bytes. """
+
+    if not len(raw):
+        return np.zeros(0, dtype=dtype)
+    return np.fromstring(raw.tobytes().decode("ascii"), dtype=dtype, sep=" ")
+
+
+def _words(data, count):
+    """
+    Return the number of whitespace separated words of each of the
+    *count* lines of the given raw bytes.
+    """
+
+    word = (data != ord(" ")) & (data != ord("\n"))
+    begin = np.flatnonzero(word[1:] & ~word[:-1]) + 1
+    if len(word) and word[0]:
+        begin = np.concatenate([[0], begin])
+    lines = np.concatenate([[0], np.flatnonzero(data == ord("\n")) + 1])
+    return np.bincount(np.searchsorted(lines, begin, side="right") - 1,
+                       minlength=count)[:count]
+
+
+def _triangulate(counts, indices):
+    """
+    Triangulate polygons (as fans) given the number of vertices of
+    each polygon and their concatenated vertex *indices*.
+    """
+
+    counts = np.asarray(counts)
+    offsets = np.cumsum(counts) - counts
+    if (counts == 3).all():
+        return indices.reshape(-1,3)
+    triangles = np.maximum(counts - 2, 0)
+    polygon = np.repeat(np.arange(len(counts)), triangles)
+    local = np.arange(triangles.sum()) - np.repeat(np.cumsum(triangles) - triangles, triangles)
+    first = offsets[polygon]
+    return np.stack([indices[first],
+                     indices[first + local + 1],
+                     indices[first + local + 2]], axis=1)
+
+
+def read_obj(filename):
+    """
+    Read vertices positions, face indices and (per vertex) normals
+    of a Wavefront OBJ file. Polygons are triangulated and texture
+    or normal indices are ignored.
+
+    Parameters
+    ----------
+    filename : str
+        OBJ filename
+
+    Returns
+    -------
+    (np.ndarray, np.ndarray, np.ndarray | None)
+        Positions (vec3), face indices (int) and normals (vec3)
+    """
+
+    raw = np.fromfile(filename, dtype=np.uint8)
+    raw[raw == ord("\r")] = ord(" ")
+    raw[raw == ord("\t")] = ord(" ")
+    starts, lengths = _lines(raw)
+    padded = np.concatenate([raw, [0, 0]])
+    c0, c1 = padded[starts], padded[starts+1]
+    vertex = (c0 == ord("v")) & (c1 == ord(" "))
+    normal = (c0 == ord("v")) & (c1 == ord("n"))
+    face = (c0 == ord("f")) & (c1 == ord(" "))
+
+    # Vertices are "v x y z" with optional w (or colors) such that the
+    # number of values per line may vary.
+    data = _select(raw, starts, lengths, vertex, 1)
+    counts = _words(data, vertex.sum())
+    if (counts < 3).any():
+        line = np.flatnonzero(vertex)[np.argmax(counts < 3)] + 1
+        raise ValueError(f"Invalid vertex definition (line {line})")
+    values = _numbers(data)
+    offsets = np.cumsum(counts) - counts
+    positions = values[offsets[:,None] + np.arange(3)]
+    normals = _numbers(_select(raw, starts, lengths, normal, 2))
+    normals = normals.reshape(normal.sum(), -1)[:,:3] if len(normals) else None
+
+    # Face vertices are "v", "v/vt", "v//vn" or "v/vt/vn" and only
+    # v is kept by blanking anything between a slash and a space.
+    data = _select(raw, starts, lengths, face, 1)
+    if (data == ord("/")).any():
+        index = np.arange(len(data))
+        slash = np.maximum.accumulate(np.where(data == ord("/"), index, -1))
+        space = np.maximum.accumulate(np.where((data == ord(" ")) | (data == ord("\n")), index, -1))
+        data[slash > space] = ord(" ")
+
+    # Number of vertices per face (number of words per line)
+    counts = _words(data, face.sum())
+    indices = _numbers(data, np.int64)
+
+    # Negative indices are relative to the vertices defined so far
+    if (indices < 0).any():
+        defined = np.cumsum(vertex)[face]
+        defined = np.repeat(defined, counts)
+        indices = np.where(indices < 0, indices + defined + 1, indices)
+    face_indices = _triangulate(counts, indices - 1)
+
+    if normals is not None and len(normals) != len(positions):
+        normals = None
+    return positions, face_indices, normals
+
+
+_ply_types = {"char": "i1", "int8": "i1", "uchar": "u1", "uint8": "u1",
+              "short": "i2", "int16": "i2", "ushort": "u2", "uint16": "u2",
+              "int": "i4", "int32": "i4", "uint": "u4", "uint32": "u4",
+              "float": "f4", "float32": "f4", "double": "f8", "float64": "f8"}
+
+
+def read_ply(filename):
+    """
+    Read vertices positions, face indices and normals of a PLY file
+    (ascii or binary). Polygons are triangulated.
+
+    Parameters
+    ----------
+    filename : str
+        PLY filename
+
+    Returns
+    -------
+    (np.ndarray, np.ndarray, np.ndarray | None)
+        Positions (vec3), face indices (int) and normals (vec3)
+    """
+
+    with open(filename, "rb") as file:
+        content = file.read()
+    end = content.index(b"end_header") + len(b"end_header")
+    end = content.index(b"\n", end) + 1
+    header = content[:end].decode("ascii").split("\n")
+    body = content[end:]
+
+    fmt, elements = "ascii", []
+    for line in header:
+        words = line.split()
+        if not words:
+            continue
+        if words[0] == "format":
+            fmt = words[1]
+        elif words[0] == "element":
+            elements.append((words[1], int(words[2]), []))
+        elif words[0] == "property" and words[1] == "list":
+            elements[-1][2].append((words[4], (words[2], words[3])))
+        elif words[0] == "property":
+            elements[-1][2].append((words[2], words[1]))
+
+    order = {"binary_little_endian": "<", "binary_big_endian": ">"}.get(fmt, "=")
+    arrays, offset = {}, 0
+    if fmt == "ascii":
+        numbers = _numbers(np.frombuffer(body, dtype=np.uint8))
+    for name, count, properties in elements:
+        lists = [p for p, t in properties if isinstance(t, tuple)]
+        if fmt != "ascii":
+            if not lists:
+                dtype = np.dtype([(p, order + _ply_types[t]) for p, t in properties])
+                arrays[name] = np.frombuffer(body, dtype, count, offset)
+                offset += count * dtype.itemsize
+            elif len(properties) == 1:
+                (p, (ctype, itype)), = properties
+                ctype = np.dtype(order + _ply_types[ctype])
+                itype = np.dtype(order + _ply_types[itype])
+                # Fast path when all polygons are triangles
+                dtype = np.dtype([("count", ctype), ("indices", itype, 3)])
+                if count and len(body) - offset >= count*dtype.itemsize:
+                    array = np.frombuffer(body, dtype, count, offset)
+                    if (array["count"] == 3).all():
+                        arrays[name] = np.ones(count, int)*3, array["indices"].reshape(-1)
+                        offset += count*dtype.itemsize
+                        continue
+                counts, indices = np.zeros(count, int), []
+                for i in range(count):
+                    n = int(np.frombuffer(body, ctype, 1, offset)[0])
+                    offset += ctype.itemsize
+                    indices.append(np.frombuffer(body, itype, n, offset))
+                    offset += n*itype.itemsize
+                    counts[i] = n
+                arrays[name] = counts, np.concatenate(indices) if indices else np.zeros(0, int)
+            else:
+                raise NotImplementedError("Mixed list and scalar properties are not supported")
+        else:
+            if not lists:
+                size = len(properties)
+                values = numbers[offset:offset+count*size].reshape(count, size)
+                arrays[name] = {p: values[:,i] for i, (p, t) in enumerate(properties)}
+                offset += count*size
+            elif len(properties) == 1:
+                values = numbers[offset:offset+4*count]
+                if len(values) == 4*count and (values[::4] == 3).all():
+                    arrays[name] = np.ones(count, int)*3, values.reshape(-1,4)[:,1:].reshape(-1).astype(int)
+                    offset += 4*count
+                    continue
+                counts, indices = np.zeros(count, int), []
+                for i in range(count):
+                    n = int(numbers[offset])
+                    indices.append(numbers[offset+1:offset+1+n])
+                    offset += n+1
+                    counts[i] = n
+                arrays[name] = counts, np.concatenate(indices).astype(int) if indices else np.zeros(0, int)
+            else:
+                raise NotImplementedError("Mixed list and scalar properties are not supported")
+
+    vertex = arrays["vertex"]
+    positions = np.stack([vertex["x"], vertex["y"], vertex["z"]], axis=1).astype(np.float64)
+    normals = None
+    names = vertex.dtype.names if hasattr(vertex, "dtype") else vertex.keys()
+    if all(n in names for n in ("nx", "ny", "nz")):
+        normals = np.stack([vertex["nx"], vertex["ny"], vertex["nz"]], axis=1)
+    face_indices = np.zeros((0,3), int)
+    if "face" in arrays:
+        counts, indices = arrays["face"]
+        face_indices = _triangulate(counts, np.asarray(indices, dtype=np.int64))
+    return positions, face_indices, normals
+
+
+def read_stl(filename):
+    """
+    Read vertices positions and face indices of a STL file (ascii or
+    binary). Identical vertices are merged.
+
+    Parameters
+    ----------
+    filename : str
+        STL filename
+
+    Returns
+    -------
+    (np.ndarray, np.ndarray, None)
+        Positions (vec3), face indices (int) and no normals
+    """
+
+    with open(filename, "rb") as file:
+        content = file.read()
+    count = int(np.frombuffer(content, "<u4", 1, 80)[0]) if len(content) >= 84 else -1
+    if len(content) == 84 + 50*count:
+        dtype = np.dtype([("normal", "<f4", 3), ("vertices", "<f4", (3,3)),
+                          ("attribute", "<u2")])
+        vertices = np.frombuffer(content, dtype, count, 84)["vertices"].reshape(-1,3)
+    else:
+        values = re.findall(rb"vertex\s+(\S+)\s+(\S+)\s+(\S+)", content)
+        vertices = np.array(values, dtype=np.float64).reshape(-1,3)
+    positions, inverse = np.unique(vertices, axis=0, return_inverse=True)
+    return positions.astype(np.float64), inverse.reshape(-1,3), None
+
+
+_readers = {".obj": read_obj, ".ply": read_ply, ".stl": read_stl}
+
+
+def mesh(filename, cache=True, normals=False):
+    """
+    Load a mesh from an OBJ, PLY or STL file and return positions and
+    face indices (and normals if requested) as buffers. If a *cache*
+    directory is given (by default, the disk cache directory if it is
+    enabled), buffers are memory-mapped from a binary sidecar that is
+    named after a hash of the source content and written in this
+    directory. Later loads of the same content only map the sidecar.
+    Nothing is written next to the source file.
+
+    Parameters
+    ----------
+    filename : str
+        Mesh filename (.obj, .ply or .stl)
+    cache : str | bool | None
+        Directory where to store sidecar files, True for the disk
+        cache directory (default) and False or None for no sidecar
+    normals : bool
+        Whether to return normals (None if the mesh does not have
+        per vertex normals)
+
+    Returns
+    -------
+    (Buffer, Buffer) | (Buffer, Buffer, Buffer | None)
+        Positions (float32), face indices (uint32) and normals
+        (float32), with 3 values per vertex or face
+    """
+
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in _readers:
+        raise ValueError(f"Unknown mesh format ({extension})")
+    if cache is True:
+        cache = diskcache.directory
+    elif cache is False:
+        cache = None
+
+    sidecar = None
+    if cache is not None:
+        digest = hashlib.sha1()
+        with open(filename, "rb") as file:
+            for chunk in iter(lambda: file.read(1 << 24), b""):
+                digest.update(chunk)
+        name = f"{os.path.basename(filename)}.{digest.hexdigest()[:16]}.gspmesh"
+        sidecar = os.path.join(cache, name)
+
+    if sidecar is not None and os.path.exists(sidecar):
+        diskcache.touch(sidecar)
+        with open(sidecar, "rb") as file:
+            file.seek(-_trailer.itemsize, os.SEEK_END)
+            trailer = np.frombuffer(file.read(_trailer.itemsize), _trailer)[0]
+        if trailer["magic"] != _magic:
+            raise ValueError(f"Invalid mesh sidecar ({sidecar})")
+        counts = [int(trailer[name]) for name in ("vertices", "faces", "normals")]
+        content = None
+    else:
+        P, F, N = _readers[extension](filename)
+        P = np.ascontiguousarray(P, dtype=np.float32)
+        F = np.ascontiguousarray(F, dtype=np.uint32)
+        N = np.zeros((0,3), np.float32) if N is None else np.ascontiguousarray(N, dtype=np.float32)
+        counts = [len(P), len(F), len(N)]
+        trailer = np.array([(_magic, *counts)], dtype=_trailer)
+        content = b"".join(array.tobytes() for array in (P, F, N, trailer))
+        if sidecar is not None:
+            try:
+                os.makedirs(cache, exist_ok=True)
+                with open(sidecar + ".tmp", "wb") as file:
+                    file.write(content)
+                os.replace(sidecar + ".tmp", sidecar)
+                diskcache.evict(cache)
+                content = None if os.path.exists(sidecar) else content
+            except OSError:
+                pass
+        if content is not None:
+            sidecar = None
+
+    struct = [(3*counts[0], np.float32), (3*counts[1], np.uint32), (3*counts[2], np.float32)]
+    data = Data(sidecar, struct=struct)
+    if sidecar is None:
+        data.set_data(0, content[:-_trailer.itemsize])
+    if normals:
+        return data[0], data[1], (data[2] if counts[2] else None)
+    return data[0], data[1]
@@ -8,28 +8,29 @@ A path in SVG is defined by a 'path' element which contains a
 cubic and quadratic Béziers), arc and closepath instructions. See the SVG
 Path specification at <https://www.w3.org/TR/SVG/paths.html>.
 
+The parser is vectorized and parses several paths at once: characters
+are classified at the byte level, all numbers are converted at once,
+relative coordinates are resolved using cumulative sums and all arcs
+are converted together. Parsed paths are kept in a LRU cache keyed on
+the path definition.
+
 :copyright: (c) 2016, Nezar Abdennur.
 :license: BSD.
 
 """
 from __future__ import division, print_function
-from math import sin, cos, sqrt, degrees, radians, acos
-import re
+from collections import OrderedDict
 
 from matplotlib.path import Path
-import matplotlib.transforms as transforms
 import numpy as np
 
-__version__ = '1.0.0'
-__all__ = ['svg_to_path']
+__version__ = '1.1.0'
+__all__ = ['svg_to_path', 'svg_to_paths']
 
 
 COMMANDS = set('MmZzLlHhVvCcSsQqTtAa')
 UPPERCASE = set('MZLHVCSQTA')
 
-COMMAND_RE = re.compile(r"([MmZzLlHhVvCcSsQqTtAa])")
-FLOAT_RE = re.compile(r"[-+]?[0-9]*\.?[0-9]+(?:[eE][-+]?[0-9]+)?")
-
 COMMAND_CODES = {
     'M': (Path.MOVETO,),    # moveto
     'L': (Path.LINETO,),    # line
@@ -49,18 +50,39 @@ PARAMS = {
     'H': 1, # shorthand for horizontal line
     'V': 1, # shorthand for vertical line
     'Q': 4, # quadratic bezier
-    'T': 4, # shorthand for smooth quadratic bezier
+    'T': 2, # shorthand for smooth quadratic bezier
     'C': 6, # cubic bezier
-    'S': 6, # shorthand for smooth cubic bezier
+    'S': 4, # shorthand for smooth cubic bezier
     'Z': 0, # closepath
     'A': 7  # arc
 }
 
+# Number of parameters, index of the end point parameters and number of
+# vertices, indexed by (uppercase) command ascii code (0 is used for
+# the virtual segment holding the initial position of a path)
+_ARITY = np.full(128, -1, dtype=np.int64)
+_END = np.zeros(128, dtype=np.int64)
+_SIZE = np.zeros(128, dtype=np.int64)
+for _command, _count in PARAMS.items():
+    _ARITY[ord(_command)] = _count
+    _END[ord(_command)] = max(_count - 2, 0)
+    _SIZE[ord(_command)] = len(COMMAND_CODES[_command] or (None,))
+_ARITY[0] = 0
+_IS_COMMAND = np.zeros(256, dtype=bool)
+_IS_COMMAND[[ord(_command) for _command in COMMANDS]] = True
+
+# Maximum number of paths kept in the parse cache
+CACHE_SIZE = 4096
+
+# Parse cache (LRU) of normalized vertices and codes
+_cache = OrderedDict()
+
 
 def endpoint_to_center(start, radius, rotation, large, sweep, end):
     """
     Translates the "endpoint" parameterization of an elliptical arc used by
-    the SVG spec to the "center" parameterization.
+    the SVG spec to the "center" parameterization. All parameters can be
+    arrays such as to convert several arcs at once.
 
     Parameters
     ----------
@@ -101,9 +123,12 @@ def endpoint_to_center(start, radius, rotation, large, sweep, end):
     .. [1] http://www.w3.org/TR/SVG/implnote.html#ArcImplementationNotes
 
     """
+    start, radius, end = np.asarray(start), np.asarray(radius), np.asarray(end)
+    large, sweep = np.asarray(large), np.asarray(sweep)
+
     # Step 1: compute x1prim, y1prim
-    cosr = cos(radians(rotation))
-    sinr = sin(radians(rotation))
+    cosr = np.cos(np.radians(rotation))
+    sinr = np.sin(np.radians(rotation))
     dx = (start.real - end.real) / 2
     dy = (start.imag - end.imag) / 2
     x1prim = cosr * dx + sinr * dy
@@ -111,69 +136,123 @@ def endpoint_to_center(start, radius, rotation, large, sweep, end):
     x1prim_sq = x1prim * x1prim
     y1prim_sq = y1prim * y1prim
 
-    rx = abs(radius.real)
-    ry = abs(radius.imag)
+    # Correct out of range radii (SVG spec only scales UP)
+    rx = np.abs(radius.real)
+    ry = np.abs(radius.imag)
+    radius_scale = np.sqrt(np.maximum((x1prim_sq / (rx * rx)) +
+                                      (y1prim_sq / (ry * ry)), 1))
+    rx = rx * radius_scale
+    ry = ry * radius_scale
     rx_sq = rx * rx
     ry_sq = ry * ry
-
-    # Correct out of range radii
-    radius_scale = (x1prim_sq / rx_sq) + (y1prim_sq / ry_sq)
-    if radius_scale > 1:
-        radius_scale = sqrt(radius_scale)
-        rx *= radius_scale
-        ry *= radius_scale
-        rx_sq = rx * rx
-        ry_sq = ry * ry
-    else:
-        # SVG spec only scales UP
-        radius_scale = 1
     radius = rx + ry * 1j
 
     # Step 2: compute cxprim, cyprim
     t1 = rx_sq * y1prim_sq
     t2 = ry_sq * x1prim_sq
-    c = sqrt(abs((rx_sq * ry_sq - t1 - t2) / (t1 + t2)))
-    if large == sweep:
-        c = -c
+    c = np.sqrt(np.abs((rx_sq * ry_sq - t1 - t2) / (t1 + t2)))
+    c = np.where(large == sweep, -c, c)
     cxprim = c * rx * y1prim / ry
     cyprim = -c * ry * x1prim / rx
 
     # Step 3: compute the center from cxprim, cyprim
-    center = complex(
-        (cosr * cxprim - sinr * cyprim) + ((start.real + end.real) / 2),
-        (sinr * cxprim + cosr * cyprim) + ((start.imag + end.imag) / 2),
-    )
+    center = ((cosr * cxprim - sinr * cyprim) + ((start.real + end.real) / 2) +
+              ((sinr * cxprim + cosr * cyprim) + ((start.imag + end.imag) / 2)) * 1j)
 
     # Step 4: compute theta and delta_theta
     ux = (x1prim - cxprim) / rx
     uy = (y1prim - cyprim) / ry
     vx = (-x1prim - cxprim) / rx
     vy = (-y1prim - cyprim) / ry
-    n = sqrt(ux * ux + uy * uy)
-    p = ux
-    theta = degrees(acos(p / n))
-    if uy < 0:
-        theta = -theta
-    theta = theta % 360
-
-    n = sqrt((ux * ux + uy * uy) * (vx * vx + vy * vy))
+    n = np.sqrt(ux * ux + uy * uy)
+    theta = np.degrees(np.arccos(ux / n))
+    theta = np.where(uy < 0, -theta, theta) % 360
+
+    n = np.sqrt((ux * ux + uy * uy) * (vx * vx + vy * vy))
     p = ux * vx + uy * vy
-    d = p / n
     # In certain cases the above calculation can through inaccuracies
     # become just slightly out of range, f ex -1.0000000000000002.
-    d = np.clip(d, -1.0, 1.0)
+    d = np.clip(p / n, -1.0, 1.0)
 
-    delta = degrees(acos(d))
-    if (ux * vy - uy * vx) < 0:
-        delta = -delta
-    delta = delta % 360
-    if not sweep:
-        if delta > 0:
-            delta -= 360
+    delta = np.degrees(np.arccos(d))
+    delta = np.where((ux * vy - uy * vx) < 0, -delta, delta) % 360
+    delta = np.where((sweep == 0) & (delta > 0), delta - 360, delta)
 
     return radius, center, theta, theta + delta
 
 
+def _arcs(start, radius, rotation, large, sweep, end):
+    """
+    Generate elliptical arcs (cubic Bezier curves) given arrays of
+    endpoint parameterizations, see `arc_path`.
+
+    Returns
+    -------
+    counts : array (k,)
+        Number of vertices of each arc
+    codes : array (sum(counts),)
+        Command codes
+    verts : array (sum(counts),2)
+        Vertices
+    """
+
+    radius, center, theta1, theta2 = endpoint_to_center(
+        start, radius, rotation, large, sweep, end)
+
+    # Arcs on the unit circle drawn in increasing angle order, with the
+    # number of curve segments of `matplotlib.path.Path.arc`
+    reverse = theta2 <= theta1
+    eta1 = np.where(reverse, theta2, theta1)
+    eta2 = np.where(reverse, theta1, theta2)
+    turns = (eta2 - eta1) / 360
+    nearest = np.rint(turns)
+    full = (nearest != 0) & (np.abs(turns - nearest) <= 1e-12)
+    eta2 = np.where(full, eta1 + 360, eta2 - 360 * np.floor(turns))
+    eta1, eta2 = np.radians(eta1), np.radians(eta2)
+    segments = (2 ** np.ceil((eta2 - eta1) / (np.pi / 2))).astype(np.int64)
+
+    counts = 3 * segments + 1
+    offsets = np.cumsum(counts) - counts
+    verts = np.empty((counts.sum(), 2))
+    for n in np.unique(segments):
+        group = np.flatnonzero(segments == n)
+        e1, e2 = eta1[group][:,None], eta2[group][:,None]
+        deta = (e2 - e1) / n
+        t = np.tan(0.5 * deta)
+        alpha = np.sin(deta) * (np.sqrt(4.0 + 3.0 * t * t) - 1) / 3.0
+        steps = e1 + deta * np.arange(n + 1)
+        steps[:,-1] = e2[:,0]
+        cos, sin = np.cos(steps), np.sin(steps)
+        V = np.empty((len(group), 3*n + 1, 2))
+        V[:,0] = np.stack([cos[:,0], sin[:,0]], axis=-1)
+        V[:,1::3,0] = cos[:,:-1] - alpha * sin[:,:-1]
+        V[:,1::3,1] = sin[:,:-1] + alpha * cos[:,:-1]
+        V[:,2::3,0] = cos[:,1:] + alpha * sin[:,1:]
+        V[:,2::3,1] = sin[:,1:] - alpha * cos[:,1:]
+        V[:,3::3,0] = cos[:,1:]
+        V[:,3::3,1] = sin[:,1:]
+
+        # Make sure we are drawing from start to end
+        V[reverse[group]] = V[reverse[group], ::-1]
+
+        # Scale the axes, rotate the x-axis of the ellipse from the
+        # x-axis of the current coordinate system, translate to center
+        angle = np.radians(np.broadcast_to(rotation, reverse.shape)[group])
+        c, s = np.cos(angle)[:,None], np.sin(angle)[:,None]
+        x = V[...,0] * radius.real[group][:,None]
+        y = V[...,1] * radius.imag[group][:,None]
+        V[...,0] = c * x - s * y + center.real[group][:,None]
+        V[...,1] = s * x + c * y + center.imag[group][:,None]
+        index = offsets[group][:,None] + np.arange(3*n + 1)
+        verts[index] = V
+
+    # The initial MOVETO operation is changed into a LINETO to connect
+    # to the previous path
+    codes = np.full(len(verts), Path.CURVE4, dtype=Path.code_type)
+    codes[offsets] = Path.LINETO
+    return counts, codes, verts
+
+
 def arc_path(start, radius, rotation, large, sweep, end):
     """
     Generate an elliptical arc path given an endpoint parameterization.
@@ -218,276 +297,286 @@ def arc_path(start, radius, rotation, large, sweep, end):
     center through the given angle `rotation`.
 
     """
-    radius, center, theta1, theta2 = endpoint_to_center(
-        start,
-        radius,
-        rotation,
-        large,
-        sweep,
-        end
-    )
-
-    # Create an arc on the unit circle
-    # Matplotlib does this using CURVE4 operations
-    # https://matplotlib.org/stable/_modules/matplotlib/path.html#Path.arc
-    if theta2 > theta1:
-        arc = Path.arc(theta1=theta1, theta2=theta2)
-        reverse_path = False
-    else:
-        arc = Path.arc(theta1=theta2, theta2=theta1)
-        reverse_path = True
-
-    # Transform it into an elliptical arc:
-    # * scale the minor and major axes
-    # * translate it to the center
-    # * rotate the x-axis of the ellipse from the x-axis of the current
-    #   coordinate system
-    trans = (
-        transforms.Affine2D()
-        .scale(radius.real, radius.imag)
-        .translate(center.real, center.imag)
-        .rotate_deg_around(center.real, center.imag, rotation)
-    )
-    arc = trans.transform_path(arc)
-    codes = np.array(arc.codes)
-    verts = np.array(arc.vertices)
-
-    # Make sure we are drawing from start to end
-    if reverse_path:
-        verts = verts[::-1, :]
-
-    # Change the initial MOVETO operation into a LINETO to connect to the
-    # previous path
-    codes[0] = Path.LINETO
-
+    counts, codes, verts = _arcs(
+        np.atleast_1d(start), np.atleast_1d(radius), np.atleast_1d(rotation),
+        np.atleast_1d(large), np.atleast_1d(sweep), np.atleast_1d(end))
     return codes, verts
 
 
-def _tokenize_path(pathdef):
-    for x in COMMAND_RE.split(pathdef):
-        if x in COMMANDS:
-            yield x
-        for token in FLOAT_RE.findall(x):
-            yield token
-
-
-def _next_pos(elements):
-    return float(elements.pop()) + float(elements.pop()) * 1j
-
-
-def _parse_path(pathdef, current_pos):
-    # In the SVG specs, initial movetos are absolute, even if specified as 'm'.
-    # This is the default behavior here as well. But if you pass in a
-    # current_pos variable, the initial moveto will be relative to that
-    # current_pos. This is useful.
-    elements = list(_tokenize_path(pathdef))
-    # Reverse for easy use of .pop()
-    elements.reverse()
-
-    start_pos = None
-    command = None
-
-    while elements:
-
-        # 1. Determine the current command
-
-        if elements[-1] in COMMANDS:
-            # New command.
-            last_command = command  # Used by S and T
-            command = elements.pop()
-            absolute = command in UPPERCASE
-            command = command.upper()
-        else:
-            # Implicit command.
-            # If this element starts with numbers, it is an implicit command
-            # and we don't change the command. Check that it's allowed:
-            if command is None:
-                raise ValueError(
-                    "Unallowed implicit command in {}, position {}".format(
-                        pathdef, len(pathdef.split()) - len(elements))
-                    )
-            last_command = command  # Used by S and T
-
-        # 2. Parse the current command
-
-        # MOVETO
-        if command == 'M':
-            pos = _next_pos(elements)
-            if absolute:
-                current_pos = pos
-            else:
-                current_pos += pos
-
-            # when M is called, reset start_pos
-            # This behavior of Z is defined in svg spec:
-            # http://www.w3.org/TR/SVG/paths.html#PathDataClosePathCommand
-            start_pos = current_pos
-
-            yield COMMAND_CODES['M'], [(current_pos.real, current_pos.imag)]
-
-            # Implicit moveto commands are treated as lineto commands.
-            # So we set command to lineto here, in case there are
-            # further implicit commands after this moveto.
-            command = 'L'
-
-        # CLOSEPATH
-        elif command == 'Z':
-            # path closure
-            if current_pos != start_pos:
-                verts = [(start_pos.real, start_pos.imag)]
-                yield COMMAND_CODES['L'], verts
-
-            # mpl.Path: a point is required but ignored
-            verts = [(start_pos.real, start_pos.imag)]
-            yield COMMAND_CODES['Z'], verts
-
-            current_pos = start_pos
-            start_pos = None
-            command = None  # You can't have implicit commands after closing.
-
-        # LINETO
-        elif command == 'L':
-            pos = _next_pos(elements)
-            if not absolute:
-                pos += current_pos
-            verts = [(pos.real, pos.imag)]
-            yield COMMAND_CODES['L'], verts
-            current_pos = pos
-
-        # HORIZONTAL_PATHTO
-        elif command == 'H':
-            x = elements.pop()
-            pos = float(x) + current_pos.imag * 1j
-            if not absolute:
-                pos += current_pos.real
-            verts = [(pos.real, pos.imag)]
-            yield COMMAND_CODES['H'], verts
-            current_pos = pos
-
-        # VERTICAL_PATHTO
-        elif command == 'V':
-            y = elements.pop()
-            pos = current_pos.real + float(y) * 1j
-            if not absolute:
-                pos += current_pos.imag * 1j
-            verts = [(pos.real, pos.imag)]
-            yield COMMAND_CODES['V'], verts
-            current_pos = pos
-
-        # CUBIC_BEZIER
-        elif command == 'C':
-            control1 = _next_pos(elements)
-            control2 = _next_pos(elements)
-            end = _next_pos(elements)
-            if not absolute:
-                control1 += current_pos
-                control2 += current_pos
-                end += current_pos
-            verts = [
-                 (control1.real, control1.imag),
-                 (control2.real, control2.imag),
-                 (end.real, end.imag)
-            ]
-            yield COMMAND_CODES['C'], verts
-            current_pos = end
-
-        # SMOOTH_CUBIC_BEZIER
-        elif command == 'S':
-            # Smooth curve. First control point is the "reflection" of
-            # the second control point in the previous path.
-            if last_command not in 'CS':
-                # If there is no previous command or if the previous command
-                # was not an C, c, S or s, assume the first control point is
-                # coincident with the current point.
-                control1 = current_pos
-            else:
-                # The first control point is assumed to be the reflection of
-                # the second control point on the previous command relative
-                # to the current point.
-                last_control = control2
-                control1 = current_pos + current_pos - last_control
-            control2 = _next_pos(elements)
-            end = _next_pos(elements)
-            if not absolute:
-                control2 += current_pos
-                end += current_pos
-            verts = [
-                (control1.real, control1.imag),
-                (control2.real, control2.imag),
-                (end.real, end.imag)
-            ]
-            yield COMMAND_CODES['S'], verts
-            current_pos = end
-
-        # QUADRATIC_BEZIER
-        elif command == 'Q':
-            control = _next_pos(elements)
-            end = _next_pos(elements)
-            if not absolute:
-                control += current_pos
-                end += current_pos
-            verts = [
-                (control.real, control.imag),
-                (end.real, end.imag)
-            ]
-            yield COMMAND_CODES['Q'], verts
-            current_pos = end
-
-        # SMOOTH_QUADRATIC_BEZIER
-        elif command == 'T':
-            # Smooth curve. Control point is the "reflection" of
-            # the second control point in the previous path.
-            if last_command not in 'QT':
-                # If there is no previous command or if the previous command
-                # was not an Q, q, T or t, assume the first control point is
-                # coincident with the current point.
-                control = current_pos
-            else:
-                # The control point is assumed to be the reflection of
-                # the control point on the previous command relative
-                # to the current point.
-                last_control = control
-                control = current_pos + current_pos - last_control
-            end = _next_pos(elements)
-            if not absolute:
-                end += current_pos
-            verts = [
-                (control.real, control.imag),
-                (end.real, end.imag)
-            ]
-            yield COMMAND_CODES['T'], verts
-            current_pos = end
-
-        # ELLIPTICAL_ARC
-        elif command == 'A':
-            radius = _next_pos(elements)
-            rotation = float(elements.pop())
-            large = float(elements.pop())
-            sweep = float(elements.pop())
-            end = _next_pos(elements)
-
-            if not absolute:
-                end += current_pos
-
-            if current_pos == end:
-                # This is equivalent of omitting the segment, so do nothing
-                continue
-            elif radius.real == 0 or radius.imag == 0:
-                # This should be treated as a straight line
-                verts = [(end.real, end.imag)]
-                yield COMMAND_CODES['L'], verts
-            else:
-                codes, verts = arc_path(
-                    current_pos, radius, rotation, large, sweep, end
-                )
-                yield codes, verts
-
-            current_pos = end
+
+
+def _tokenize(pathdefs):
+    """
+    Tokenize path definitions at once: characters are classified and
+    separators are inserted before each number (numbers can be
+    delimited by signs or by a second decimal point, e.g. "1-2.5.5")
+    such that all numbers are parsed with a single `np.fromstring`.
+
+    Returns
+    -------
+    numbers : array
+        All numbers (float)
+    commands : array
+        Commands ascii codes (uint8)
+    counts : array
+        Number of numbers following each command
+    path : array
+        Index of the path of each command
+    """
+
+    text = "\n".join(pathdefs).encode("ascii", "replace")
+    raw = np.frombuffer(text, dtype=np.uint8)
+    lengths = np.array([len(pathdef) + 1 for pathdef in pathdefs], dtype=np.int64)
+
+    digit = (raw >= ord('0')) & (raw <= ord('9'))
+    dot = raw == ord('.')
+    sign = (raw == ord('-')) | (raw == ord('+'))
+    exponent = (raw == ord('e')) | (raw == ord('E'))
+    exponent[1:] &= digit[:-1] | dot[:-1]
+    exponent[0] = False
+    number = digit | dot | sign | exponent
+
+    # A number starts after a non number character, at a sign that
+    # is not part of an exponent and at a second decimal point
+    start = number.copy()
+    start[1:] &= ~number[:-1]
+    start[1:] |= sign[1:] & ~exponent[:-1]
+    start[0] |= sign[0]
+    dots = np.flatnonzero(dot)
+    run = np.cumsum(start)[dots]
+    start[dots[1:][run[1:] == run[:-1]]] = True
+    starts = np.flatnonzero(start)
+
+    buffer = np.insert(np.where(number, raw, ord(' ')), starts, ord(' '))
+    numbers = np.fromstring(buffer.tobytes(), sep=" ")
+    if len(numbers) != len(starts):
+        raise ValueError("Malformed number in path definition")
+
+    position = np.flatnonzero(_IS_COMMAND[raw])
+    commands = raw[position]
+    bounds = np.cumsum(lengths)
+    path = np.searchsorted(bounds, position, side="right")
+
+    # Each path must start with a command
+    first_number = np.searchsorted(starts, bounds - lengths)
+    first_command = np.searchsorted(position, bounds - lengths)
+    head = np.where(first_number < len(starts),
+                    starts[np.minimum(first_number, len(starts)-1)], len(raw))
+    command = np.where(first_command < len(position),
+                       position[np.minimum(first_command, len(position)-1)], len(raw))
+    invalid = (head < bounds) & (head < command)
+    if invalid.any():
+        raise ValueError(
+            "Unallowed implicit command in {}, position 0".format(
+                pathdefs[np.flatnonzero(invalid)[0]]))
+
+    counts = np.diff(np.searchsorted(starts, np.append(position, len(raw))))
+    return numbers, commands, counts, path
+
+
+def _parse_paths(pathdefs, current_pos):
+    """
+    Parse several path definitions at once and return their vertices,
+    codes and the offsets of each path in these arrays.
+
+    In the SVG specs, initial movetos are absolute, even if specified
+    as 'm'. This is the default behavior here as well. But if you pass
+    in a current_pos variable, the initial moveto will be relative to
+    that current_pos.
+    """
+
+    # 1. Tokenize, each path starts with a command and commands are
+    # followed by their parameters
+    numbers, commands, counts, path = _tokenize(pathdefs)
+    relative = commands >= ord('a')
+    commands = commands & 0xDF  # uppercase
+    arity = _ARITY[commands]
+
+    # 2. Expand implicit commands (implicit moveto are lineto) and
+    # insert a virtual segment holding the initial position of each path
+    invalid = np.where(arity > 0, (counts == 0) | (counts % np.maximum(arity, 1) != 0),
+                       counts != 0)
+    if invalid.any():
+        raise ValueError(
+            "Wrong number of parameters in {}".format(pathdefs[path[invalid][0]]))
+    repeats = np.where(arity > 0, counts // np.maximum(arity, 1), 1)
+    first = np.cumsum(repeats) - repeats
+    cmd = np.repeat(commands, repeats)
+    rel = np.repeat(relative, repeats)
+    local = np.arange(len(cmd)) - np.repeat(first, repeats)
+    implicit = np.ones(len(cmd), dtype=bool)
+    implicit[first] = False
+    cmd[(cmd == ord('M')) & implicit] = ord('L')
+    start = np.repeat(np.cumsum(counts) - counts, repeats) + local * _ARITY[cmd]
+    heads = np.searchsorted(np.repeat(path, repeats), np.arange(len(pathdefs)))
+    cmd = np.insert(cmd, heads, 0)
+    rel = np.insert(rel, heads, False)
+    start = np.insert(start, heads, len(numbers))
+    params = np.append(numbers, np.zeros(7))[start[:,None] + np.arange(7)]
+    virtual = cmd == 0
+    n = len(cmd)
+
+    is_M, is_Z, is_H, is_V = (cmd == ord(c) for c in "MZHV")
+    is_C, is_S, is_Q, is_T, is_A = (cmd == ord(c) for c in "CSQTA")
+
+    # 3. Resolve positions. Each segment ends at a position that is
+    # either absolute or relative to the previous one (per coordinate)
+    # such that positions are obtained from cumulative sums anchored on
+    # the last absolute position.
+    value = params[np.arange(n)[:,None], _END[cmd][:,None] + [0, 1]]
+    value[is_V, 1] = params[is_V, 0]
+    value[is_V, 0] = value[is_H, 1] = 0
+    value[is_Z] = 0
+    value[virtual] = current_pos.real, current_pos.imag
+    absolute = np.repeat(~rel[:,None], 2, axis=1)
+    absolute[is_V, 0] = absolute[is_H, 1] = False
+    absolute[is_Z] = True
+    delta = np.where(absolute, 0, value)
+    total = np.cumsum(delta, axis=0)
+    anchor = np.maximum.accumulate(
+        np.where(absolute, np.arange(n)[:,None], 0), axis=0)
+
+    # Closepath moves back to the start of the subpath (last moveto),
+    # which may itself be relative to a previous closepath
+    closes = np.flatnonzero(is_Z)
+    if len(closes):
+        moveto = np.maximum.accumulate(np.where(is_M, np.arange(n), -1))[closes]
+        head = np.maximum.accumulate(np.where(virtual, np.arange(n), 0))[closes]
+        if (moveto < head).any():
+            index = np.cumsum(virtual)[closes[moveto < head][0]] - 1
+            raise ValueError("Unallowed closepath in {}".format(pathdefs[index]))
+        source = anchor[moveto]
+        resolved = ~is_Z
+        pending = np.ones(len(closes), dtype=bool)
+        while pending.any():
+            ready = pending & resolved[source].all(axis=1)
+            for i in range(2):
+                a = source[ready, i]
+                value[closes[ready], i] = (value[a, i] + total[moveto[ready], i]
+                                           - total[a, i])
+            resolved[closes[ready]] = True
+            pending &= ~ready
+    positions = (np.take_along_axis(value, anchor, axis=0) + total -
+                 np.take_along_axis(total, anchor, axis=0))
+    previous = np.roll(positions, 1, axis=0)
+    before = np.roll(cmd, 1)
+
+    # 4. Control points
+    offset = np.where(rel[:,None], previous, 0)
+    control1 = params[:,0:2] + offset
+    control2 = np.where(is_C[:,None], params[:,2:4], params[:,0:2]) + offset
+    smooth = is_S & ((before == ord('C')) | (before == ord('S')))
+    control1[is_S] = previous[is_S]
+    control1[smooth] = 2 * previous[smooth] - np.roll(control2, 1, axis=0)[smooth]
+
+    # Smooth quadratic control points are reflections of the previous
+    # ones: c[i] = 2 p[i] - c[i-1] is solved with an alternating sum
+    # over runs of chained segments.
+    if is_T.any():
+        chained = is_T & ((before == ord('Q')) | (before == ord('T')))
+        sign = np.where(np.arange(n) % 2, -1.0, 1.0)[:,None]
+        initial = np.where(is_T[:,None], previous, control1)
+        increment = np.where(chained[:,None], 2 * sign * previous, sign * initial)
+        alternate = np.cumsum(increment, axis=0)
+        run = np.maximum.accumulate(np.where(~chained, np.arange(n), 0))
+        alternate -= alternate[run] - increment[run]
+        control1[is_T] = (sign * alternate)[is_T]
+
+    # 5. Vertices, arcs are generated all at once
+    skip = is_A & (previous == positions).all(axis=1)
+    line = is_A & ~skip & ((params[:,0] == 0) | (params[:,1] == 0))
+    arcs = np.flatnonzero(is_A & ~skip & ~line)
+    closing = is_Z & (previous != positions).any(axis=1)
+    arc_counts, arc_codes, arc_verts = _arcs(
+        previous[arcs] @ [1, 1j], params[arcs, 0] + params[arcs, 1] * 1j,
+        params[arcs, 2], params[arcs, 3], params[arcs, 4], positions[arcs] @ [1, 1j])
+
+    size = _SIZE[cmd]
+    size[closing] = 2
+    size[skip] = 0
+    size[arcs] = arc_counts
+    offsets = np.cumsum(size) - size
+    verts = np.empty((size.sum(), 2))
+    codes = np.full(len(verts), Path.LINETO, dtype=Path.code_type)
+
+    single = np.flatnonzero(is_M | is_H | is_V | line | (cmd == ord('L')))
+    verts[offsets[single]] = positions[single]
+    codes[offsets[is_M]] = Path.MOVETO
+    for mask, code, controls in ((is_C | is_S, Path.CURVE4, (control1, control2)),
+                                 (is_Q | is_T, Path.CURVE3, (control1,))):
+        index = np.flatnonzero(mask)
+        for k, control in enumerate(controls + (positions,)):
+            verts[offsets[index] + k] = control[index]
+            codes[offsets[index] + k] = code
+
+    # mpl.Path: a point is required but ignored
+    close = offsets[is_Z] + closing[is_Z]
+    verts[offsets[is_Z]] = positions[is_Z]
+    verts[close] = positions[is_Z]
+    codes[close] = Path.CLOSEPOLY
+
+    if len(arcs):
+        index = np.repeat(offsets[arcs] - np.cumsum(arc_counts) + arc_counts, arc_counts)
+        index += np.arange(len(arc_verts))
+        verts[index] = arc_verts
+        codes[index] = arc_codes
+
+    return verts, codes, np.append(offsets[virtual], len(verts))
+
+
+def svg_to_paths(pathdefs, current_pos=0 + 0j):
+    """
+    Parse several SVG path definition strings into matplotlib Path
+    objects. Definitions that are not already in the parse cache are
+    parsed all at once and added to the cache, that keeps the
+    `CACHE_SIZE` most recently used definitions.
+
+    Parameters
+    ----------
+    pathdefs : list of str
+        SVG path 'd' attributes
+    current_pos : complex, optional
+        Coordinates of the starting position of the paths (see
+        `svg_to_path`)
+
+    Returns
+    -------
+    list of :class:`matplotlib.path.Path` instances
+    """
+
+    current_pos = complex(current_pos)
+    keys = [(pathdef, current_pos) for pathdef in pathdefs]
+    missing = list(dict.fromkeys(key for key in keys if key not in _cache))
+    if missing:
+        verts, codes, offsets = _parse_paths([key[0] for key in missing], current_pos)
+
+        # Each path is normalized to fit [-0.5, +0.5] with y up
+        sizes = np.diff(offsets)
+        nonempty = sizes > 0
+        if nonempty.any():
+            lower = np.minimum.reduceat(verts.min(axis=1), offsets[:-1][nonempty])
+            upper = np.maximum.reduceat(verts.max(axis=1), offsets[:-1][nonempty])
+            lower = np.repeat(lower, sizes[nonempty])[:,None]
+            upper = np.repeat(upper, sizes[nonempty])[:,None]
+            verts = (verts - lower)/(upper - lower) - 0.5
+            verts[:,1] *= -1
+        for key, start, stop in zip(missing, offsets[:-1], offsets[1:]):
+            _cache[key] = verts[start:stop].copy(), codes[start:stop].copy()
+
+    paths = []
+    for key in keys:
+        _cache.move_to_end(key)
+        verts, codes = _cache[key]
+        paths.append(Path(verts.copy(), codes.copy()))
+    while len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+    return paths
 
 
 def svg_to_path(pathdef, current_pos=0 + 0j):
     """
     Parse an SVG path definition string into a matplotlib Path object.
+    Results are cached (see `svg_to_paths`).
 
     Parameters
     ----------
@@ -510,12 +599,4 @@ def svg_to_path(pathdef, current_pos=0 + 0j):
     matplotlib.transforms
 
     """
-    codes = []
-    verts = []
-    for c, v in _parse_path(pathdef, current_pos):
-        codes.extend(c)
-        verts.extend(v)
-    verts = np.asarray(verts)
-    verts = (verts-verts.min())/(verts.max()-verts.min()) - 0.5
-    verts[:,1] *= -1
-    return Path(verts, codes)
+    return svg_to_paths([pathdef], current_pos)[0]
@@ -1,6 +1,7 @@
 # Package: Graphic Server Protocol / Matplotlib
 # Authors: Nicolas P .Rougier <nicolas.rougier@inria.fr>
 # License: BSD 3 clause
+import os
 import numpy as np
 from enum import IntEnum
 
@@ -109,6 +110,8 @@ class Marker(IntEnum):
     [material-map-marker]: https://pictogrammers.com/library/mdi/icon/map-marker/
     [material-disc]: https://pictogrammers.com/library/mdi/icon/disc/
     [material-arrow-up-thick]: https://pictogrammers.com/library/mdi/icon/arrow-up-thick/
+
+    Custom markers can be defined from SVG paths using `register`.
     """
 
     point : int    = 1
@@ -124,64 +127,105 @@ class Marker(IntEnum):
     diamond : int  = 11
     arrow : int    = 12
 
-    __markers__ = None
+    # SVG definitions of markers (indexed by value)
+    __sources__ = {
+        # point
+        1 : "M12,2A10,10 0 0,0 2,12A10,10 0 0,0 12,22A10,10 0 0,0 22,12A10,10 0 0,0 12,2Z",
 
-    @classmethod
-    def path(cls, marker):
-        if cls.__markers__ is None:
-            from . svg import svg_to_path
+        # triangle
+        2 : "M1,21H23L12,2Z",
+
+        # square
+        3 : "M3,3V21H21V3",
+
+        # minus
+        4 : "M20 14H4V10H20",
 
-            cls.__markers__ =  {
-                Marker.point :
-                svg_to_path(
-                    "M12,2A10,10 0 0,0 2,12A10,10 0 0,0 12,22A10,10 0 0,0 22,12A10,10 0 0,0 12,2Z"),
+        # plus
+        5 : "M20 14H14V20H10V14H4V10H10V4H14V10H20V14Z",
 
-                Marker.triangle :
-                svg_to_path(
-                    "M1,21H23L12,2Z"),
+        # cross
+        6 : "M20 6.91L17.09 4L12 9.09L6.91 4L4 6.91L9.09 12L4 17.09L6.91 20L12 14.91L17.09 20L20 17.09L14.91 12L20 6.91Z",
 
-                Marker.square :
-                svg_to_path(
-                    "M3,3V21H21V3"),
+        # star
+        7 : "M12,17.27L18.18,21L16.54,13.97L22,9.24L14.81,8.62L12,2L9.19,8.62L2,9.24L7.45,13.97L5.82,21L12,17.27Z",
 
-                Marker.minus :
-                svg_to_path(
-                    "M20 14H4V10H20"),
+        # club
+        8 : "M12,2C14.3,2 16.3,4 16.3,6.2C16.21,8.77 14.34,9.83 14.04,10C15.04,9.5 16.5,9.5 16.5,9.5C19,9.5 21,11.3 21,13.8C21,16.3 19,18 16.5,18C16.5,18 15,18 13,17C13,17 12.7,19 15,22H9C11.3,19 11,17 11,17C9,18 7.5,18 7.5,18C5,18 3,16.3 3,13.8C3,11.3 5,9.5 7.5,9.5C7.5,9.5 8.96,9.5 9.96,10C9.66,9.83 7.79,8.77 7.7,6.2C7.7,4 9.7,2 12,2Z",
 
-                Marker.plus :
-                svg_to_path(
-                    "M20 14H14V20H10V14H4V10H10V4H14V10H20V14Z"),
+        # heart
+        9 : "M12,21.35L10.55,20.03C5.4,15.36 2,12.27 2,8.5C2,5.41 4.42,3 7.5,3C9.24,3 10.91,3.81 12,5.08C13.09,3.81 14.76,3 16.5,3C19.58,3 22,5.41 22,8.5C22,12.27 18.6,15.36 13.45,20.03L12,21.35Z",
 
-                Marker.cross :
-                svg_to_path(
-                    "M20 6.91L17.09 4L12 9.09L6.91 4L4 6.91L9.09 12L4 17.09L6.91 20L12 14.91L17.09 20L20 17.09L14.91 12L20 6.91Z"),
+        # spade
+        10 : "M12,2C9,7 4,9 4,14C4,16 6,18 8,18C9,18 10,18 11,17C11,17 11.32,19 9,22H15C13,19 13,17 13,17C14,18 15,18 16,18C18,18 20,16 20,14C20,9 15,7 12,2Z",
 
-                Marker.star :
-                svg_to_path(
-                    "M12,17.27L18.18,21L16.54,13.97L22,9.24L14.81,8.62L12,2L9.19,8.62L2,9.24L7.45,13.97L5.82,21L12,17.27Z"),
+        # diamond
+        11 : "M19,12L12,22L5,12L12,2",
 
-                Marker.club :
-                svg_to_path(
-                    "M12,2C14.3,2 16.3,4 16.3,6.2C16.21,8.77 14.34,9.83 14.04,10C15.04,9.5 16.5,9.5 16.5,9.5C19,9.5 21,11.3 21,13.8C21,16.3 19,18 16.5,18C16.5,18 15,18 13,17C13,17 12.7,19 15,22H9C11.3,19 11,17 11,17C9,18 7.5,18 7.5,18C5,18 3,16.3 3,13.8C3,11.3 5,9.5 7.5,9.5C7.5,9.5 8.96,9.5 9.96,10C9.66,9.83 7.79,8.77 7.7,6.2C7.7,4 9.7,2 12,2Z"),
+        # arrow
+        12 : "M14,20H10V11L6.5,14.5L4.08,12.08L12,4.16L19.92,12.08L17.5,14.5L14,11V20Z"
+    }
+
+    # Marker paths loaded from the atlas of sources
+    __paths__ = None
+
+    @classmethod
+    def path(cls, marker):
+        """
+        Return the (matplotlib) path of the given *marker* that is
+        loaded from a precompiled atlas of all markers.
 
-                Marker.heart :
-                svg_to_path(
-                    "M12,21.35L10.55,20.03C5.4,15.36 2,12.27 2,8.5C2,5.41 4.42,3 7.5,3C9.24,3 10.91,3.81 12,5.08C13.09,3.81 14.76,3 16.5,3C19.58,3 22,5.41 22,8.5C22,12.27 18.6,15.36 13.45,20.03L12,21.35Z"),
+        Parameters
+        ----------
+        marker : Marker | int
+            Marker type or value of a registered marker
+        """
 
-                Marker.spade :
-                svg_to_path(
-                    "M12,2C9,7 4,9 4,14C4,16 6,18 8,18C9,18 10,18 11,17C11,17 11.32,19 9,22H15C13,19 13,17 13,17C14,18 15,18 16,18C18,18 20,16 20,14C20,9 15,7 12,2Z"),
+        if cls.__paths__ is None:
+            from . import atlas, diskcache
+            # Source checkouts have no atlas of builtin markers, it is
+            # compiled next to the package if possible.
+            if not os.path.exists(atlas.filename):
+                try:
+                    atlas.compile({int(item): cls.__sources__[int(item)] for item in cls},
+                                  atlas.filename)
+                except OSError:
+                    pass
+            cls.__paths__ = atlas.load(cls.__sources__, diskcache.directory)
+        return cls.__paths__[int(marker)]
 
-                Marker.diamond :
-                svg_to_path(
-                    "M19,12L12,22L5,12L12,2"),
+    @classmethod
+    def register(cls, source, value=None):
+        """
+        Register a custom marker defined by an SVG path and return its
+        value that can be used wherever a marker type is expected. The
+        marker is compiled at load time (and cached if the disk cache is
+        enabled, see `diskcache`).
 
-                Marker.arrow :
-                svg_to_path(
-                    "M14,20H10V11L6.5,14.5L4.08,12.08L12,4.16L19.92,12.08L17.5,14.5L14,11V20Z")
-            }
+        Parameters
+        ----------
+        source : str
+            SVG path definition
+        value : int | None
+            Marker value (default to the value of an identical marker
+            or to the next available value)
+
+        Returns
+        -------
+        int
+            Marker value
+        """
 
-        return cls.__markers__[marker]
+        if value is None:
+            values = [key for key, item in cls.__sources__.items() if item == source]
+            value = values[0] if values else max(cls.__sources__) + 1
+        value = int(value)
+        if value in cls.__sources__ and cls.__sources__[value] != source:
+            raise ValueError(f"Marker {value} is already defined")
+        if cls.__sources__.get(value, None) != source:
+            cls.__sources__[value] = source
+            cls.__paths__ = None
+        return value
 
 
 class LineStyle(IntEnum):
@@ -9,6 +9,7 @@ from . depth import Depth
 from . colormap import Colormap
 from . operator import Add, Sub, Mul, Div
 from . screen import Screen, ScreenX, ScreenY, ScreenZ
+from . decimate import Decimate
 from . accessor import X, Y, Z, W, R, G, B, A
 from . measure import Measure, Pixel, Inch, Point
 from . measure import Millimeter, Centimeter, Meter, Kilometer
@@ -7,6 +7,55 @@ import matplotlib.pyplot as plt
 from gsp.core import Buffer
 from gsp.transform import Transform
 
+
+def _as_slice(index):
+    """
+    Return *index* as a slice when it describes a contiguous (or
+    regularly strided) range of items, None otherwise.
+    """
+
+    if isinstance(index, slice):
+        return index
+    if isinstance(index, range):
+        if len(index) == 0:
+            return slice(0, 0)
+        if index.start >= 0 and index.step > 0:
+            return slice(index.start, index.stop, index.step)
+        return None
+
+    index = np.asanyarray(index)
+    if index.ndim != 1 or index.dtype.kind not in "iu":
+        return None
+    if len(index) == 0:
+        return slice(0, 0)
+
+    start, stop = int(index[0]), int(index[-1]) + 1
+    if start < 0 or stop - start != len(index):
+        return None
+    if len(index) > 1 and not (index[1:] > index[:-1]).all():
+        return None
+    return slice(start, stop)
+
+
+def _gather(buffer, index):
+    """
+    Apply *index* to *buffer*, returning a view when *index* is a
+    contiguous range and performing a single gather otherwise.
+    """
+
+    if index is None:
+        return buffer
+
+    key = _as_slice(index)
+    if key is not None:
+        return buffer[key]
+
+    index = np.asanyarray(index)
+    if index.dtype.kind in "iu":
+        return np.take(buffer, index, axis=0)
+    return buffer[index]
+
+
 class Accessor(Transform):
     def __init__(self, buffer, key=None):
         Transform.__init__(self, buffer=buffer)
@@ -17,27 +66,42 @@ class Accessor(Transform):
         transform._key = self._key
         return transform
 
-    def evaluate(self, buffers=None):
-        if self._next:
+    def view(self, buffers=None):
+        """
+        Return the accessed component as a view on the underlying
+        buffer, without applying any index. When the next transform
+        is an accessor, views are chained such that no copy is made.
+        """
+
+        if isinstance(self._next, Accessor):
+            buffer = self._next.view(buffers)
+        elif self._next:
             buffer = self._next.evaluate(buffers)
         elif self._buffer is not None:
             buffer = self._buffer
         else:
             raise ValueError("Transform is not bound")
 
+        buffer = np.asanyarray(buffer)
         if buffer.dtype.names:
-            buffer = buffer[self._key]
+            return buffer[self._key]
         elif self._key in "xyzw":
-            buffer = buffer[..., "xyzw".index(self._key)]
+            return buffer[..., "xyzw".index(self._key)]
         elif self._key in "rgba":
-            buffer = buffer[..., "rgba".index(self._key)]
-        else:
-            raise IndexError(f"Unknown key {self._key}")
+            return buffer[..., "rgba".index(self._key)]
+        raise IndexError(f"Unknown key {self._key}")
 
-        if "index" in buffers.keys():
-            return buffer[buffers["index"]]
-        else:
-            return buffer
+    def evaluate(self, buffers=None):
+        """
+        Evaluate the accessor. If an index is present in *buffers*,
+        it is applied once, after all chained accessors have been
+        resolved as views.
+        """
+
+        buffer = self.view(buffers)
+        if buffers is not None and "index" in buffers.keys():
+            return _gather(buffer, buffers["index"])
+        return buffer
 
 
 class X(Accessor):
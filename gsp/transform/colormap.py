@@ -35,6 +35,8 @@ class Colormap(Transform):
             Name of the colormap
         """
 
+        self._colormap = colormap
+
     def copy(self):
         """
         Copy the transform
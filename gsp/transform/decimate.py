@@ -0,0 +1,94 @@
+# Package: Graphic Server Protocol / Matplotlib
+# Authors: Nicolas P .Rougier <nicolas.rougier@inria.fr>
+# License: BSD 3 clause
+import numpy as np
+from gsp.transform import Transform, Screen, Depth
+
+class Decimate(Transform):
+    """
+    Decimate transform is a JIT transform that returns the (sorted)
+    indices of the items to be rendered such that at most `count`
+    items are kept per bin of `size` × `size` pixels. Bins are
+    computed from screen coordinates and items with the highest
+    priority are kept in each bin. Items outside the viewport are
+    discarded. Items are vertices such that decimation only applies
+    to pixels, points and markers.
+
+    Examples
+    --------
+
+    ``` python
+    points = visual.Points(P, 25, FC, LC, LW)
+    points.set_variable("decimation", transform.Decimate(count=1))
+    ```
+    """
+
+    def __init__(self, count = 1,
+                       size = 1,
+                       priority = None):
+        """
+        Parameters
+        ----------
+        count : int
+            Maximum number of items per bin
+        size : float
+            Size of a bin (pixels)
+        priority : Transform | Buffer | None
+            Priority of items (float). When None, the depth is used
+            and the closest items are kept.
+        """
+
+        Transform.__init__(self)
+        self._count = count
+        self._size = size
+        self._priority = priority
+
+    def __call__(self):
+        raise ValueError("Decimate transform cannot be composed")
+
+    def copy(self):
+        transform = Transform.copy(self)
+        transform._count = self._count
+        transform._size = self._size
+        transform._priority = self._priority
+        return transform
+
+    def evaluate(self, buffers):
+        """
+        Evaluate the transform
+        """
+
+        if "viewport" not in buffers.keys():
+            raise ValueError("Viewport has not been specified")
+
+        positions = Screen("positions").evaluate(buffers)
+        positions = positions.reshape(-1, positions.shape[-1])
+
+        if self._priority is None:
+            priority = Depth("positions").evaluate(buffers)
+        elif isinstance(self._priority, Transform):
+            priority = self._priority.evaluate(buffers)
+        else:
+            priority = self._priority
+        priority = np.asanyarray(priority).reshape(-1)
+
+        # Pixel bins relative to the visible part of the viewport
+        viewport = buffers["viewport"]
+        width, height = viewport.size
+        xmin, xmax = viewport.xlim
+        ymin, ymax = viewport.ylim
+        nx = max(1, int(np.ceil(width / self._size)))
+        ny = max(1, int(np.ceil(height / self._size)))
+        x = (positions[:,0] - xmin) * (nx / (xmax - xmin))
+        y = (positions[:,1] - ymin) * (ny / (ymax - ymin))
+        index = np.flatnonzero((x >= 0) & (x < nx) & (y >= 0) & (y < ny))
+        bins = y[index].astype(np.int64) * nx + x[index].astype(np.int64)
+
+        # Sort items by bin, then by decreasing priority and keep the
+        # first count items of each bin
+        order = np.lexsort((-priority[index], bins))
+        bins = bins[order]
+        start = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])
+        length = np.diff(np.r_[start, len(bins)])
+        rank = np.arange(len(bins)) - np.repeat(start, length)
+        return np.sort(index[order[rank < self._count]])
@@ -6,6 +6,12 @@ from gsp.transform import Transform
 class Depth(Transform):
 
     def __init__(self, buffer="positions"):
+        """
+        Depth transform is a JIT transform that return depth. Depth
+        is pulled from the depth provider of the visual such that it
+        is only computed when requested.
+        """
+
         Transform.__init__(self)
         self._buffer = buffer
 
@@ -14,7 +20,7 @@ class Depth(Transform):
 
     def evaluate(self, buffers):
         if "depth" in buffers.keys():
-            if self._buffer in buffers["depth"].keys():
+            if self._buffer in buffers["depth"]:
                 return buffers["depth"][self._buffer]
             else:
                 raise ValueError(f"Depth buffer for {self._buffer} not found")
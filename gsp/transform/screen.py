@@ -8,7 +8,9 @@ class Screen(Transform):
     def __init__(self, buffer="positions"):
         """
         Screen transform is a JIT transform that return screen
-        coordinates (including depth)
+        coordinates (including depth). Screen coordinates are pulled
+        from the screen provider of the visual such that they are
+        only computed when requested.
         """
 
         Transform.__init__(self)
@@ -19,7 +21,7 @@ class Screen(Transform):
 
     def evaluate(self, buffers):
         if "screen" in buffers.keys():
-            if self._buffer in buffers["screen"].keys():
+            if self._buffer in buffers["screen"]:
                 return buffers["screen"][self._buffer]
             else:
                 raise ValueError(f"Screen buffer for {self._buffer} not found")
@@ -34,6 +34,25 @@ class Transform:
         self._next = next
         self._buffer = buffer
 
+    def __setattr__(self, name, value):
+        # Setting any parameter is a modification (see `version`)
+        object.__setattr__(self, name, value)
+        if name != "_version":
+            object.__setattr__(self, "_version", self.__dict__.get("_version", 0) + 1)
+
+    @property
+    def version(self):
+        """
+        Version of the transform that is incremented each time one of
+        its parameters is set, combined with the versions of the
+        tracked values (e.g. Buffer) and transforms it depends on.
+        Parameters modified in place (e.g. numpy arrays) are not
+        tracked.
+        """
+
+        return (self._version,) + tuple(item.version for item in vars(self).values()
+                                        if hasattr(item, "version"))
+
     def set_base(self, base = None):
         """
         Set a new base for the transform
@@ -9,3 +9,4 @@ from . pixels import Pixels
 from . points import Points
 from . markers import Markers
 from . segments import Segments
+from . compositor import Compositor
@@ -0,0 +1,277 @@
+# Package: Graphic Server Protocol / Matplotlib
+# Authors: Nicolas P .Rougier <nicolas.rougier@inria.fr>
+# License: BSD 3 clause
+import copy
+import numpy as np
+import matplotlib.artist
+from matplotlib.collections import Collection
+
+
+def merge(keys):
+    """
+    Merge several sorted sequences of *keys* and return, for each
+    merged item, the sequence it comes from and its index in this
+    sequence. Sequences are merged two by two (k-way merge in log(k)
+    passes) using binary searches and ties are resolved in favor of
+    the first sequence, such that the merge is stable.
+
+    Parameters
+    ----------
+    keys : list of np.ndarray
+        Sorted (increasing) sequences of keys
+
+    Returns
+    -------
+    (np.ndarray, np.ndarray)
+        Sequence and item indices of merged items
+    """
+
+    runs = [(np.asarray(k), np.full(len(k), i), np.arange(len(k)))
+            for i, k in enumerate(keys)]
+    if not runs:
+        return np.zeros(0, int), np.zeros(0, int)
+    while len(runs) > 1:
+        merged = []
+        for j in range(0, len(runs)-1, 2):
+            (k0, s0, i0), (k1, s1, i1) = runs[j], runs[j+1]
+            n = len(k0) + len(k1)
+            p0 = np.arange(len(k0)) + np.searchsorted(k1, k0, side="left")
+            p1 = np.arange(len(k1)) + np.searchsorted(k0, k1, side="right")
+            k = np.empty(n, np.result_type(k0, k1))
+            s = np.empty(n, int)
+            i = np.empty(n, int)
+            k[p0], s[p0], i[p0] = k0, s0, i0
+            k[p1], s[p1], i[p1] = k1, s1, i1
+            merged.append((k, s, i))
+        if len(runs) % 2:
+            merged.append(runs[-1])
+        runs = merged
+    return runs[0][1], runs[0][2]
+
+
+def split(collection, start, stop, count):
+    """
+    Return a copy of *collection* restricted to items in the range
+    [*start*, *stop*[. Properties are only restricted if they are
+    defined per item, i.e. if they have *count* elements.
+
+    Parameters
+    ----------
+    collection : matplotlib.collections.Collection
+        Collection to split
+    start : int
+        Index of the first item
+    stop : int
+        Index of the last item (excluded)
+    count : int
+        Number of items in the collection
+    """
+
+    part = copy.copy(collection)
+    part.set_visible(True)
+    paths = collection.get_paths()
+    if len(paths) == count:
+        # Bypass LineCollection.set_paths (set_segments) that would
+        # build new paths from vertices.
+        Collection.set_paths(part, paths[start:stop])
+    for name in ("offsets", "sizes", "facecolor", "edgecolor",
+                 "linewidth", "antialiased"):
+        getter = getattr(collection, "get_" + name, None)
+        if getter is None:
+            continue
+        value = getter()
+        if isinstance(value, np.ndarray) and value.ndim > 0 and len(value) == count:
+            getattr(part, "set_" + name)(value[start:stop])
+    return part
+
+
+class Composite(matplotlib.artist.Artist):
+    """
+    Matplotlib artist drawing a list of collections in order.
+    """
+
+    def __init__(self):
+        matplotlib.artist.Artist.__init__(self)
+        self.parts = []
+
+    def draw(self, renderer):
+        if not self.get_visible():
+            return
+        for part in self.parts:
+            part.draw(renderer)
+        self.stale = False
+
+
+class Compositor:
+    """
+    A compositor renders several visuals on a viewport such that
+    their items are drawn according to a single depth order, i.e.
+    items of different visuals are interleaved and occlusion is
+    correct across visuals. Each visual sorts its own items and the
+    compositor merges these sorted sequences. The resulting drawing
+    order is split into runs of consecutive items belonging to the
+    same visual, each run being drawn as a restricted copy of the
+    visual collection. Visuals that do not sort their items (pixels)
+    are drawn as usual.
+
+    Once rendered through a compositor, visuals are managed by it on
+    the viewport: the compositor renders them again when the canvas
+    is resized (the visuals' own resize handlers are bypassed) and a
+    visual rendered on its own is composited again, such that its
+    collection is not shown alongside composited items.
+
+    !!! Note
+
+        The number of runs depends on how items of visuals are
+        interleaved in depth, which may go up to the total number
+        of items in the worst case.
+    """
+
+    def __init__(self, *visuals):
+        """
+        Create a compositor for the given *visuals*.
+
+        Parameters
+        ----------
+        visuals : Visual
+            Visuals to composite
+        """
+
+        self._visuals = list(visuals)
+        self._composites = {}
+        self._fingerprints = {}
+        self._resizing = set()
+        self._rendering = False
+
+    def add(self, visual):
+        """
+        Add a *visual* to the compositor.
+
+        Parameters
+        ----------
+        visual : Visual
+            Visual to add
+        """
+
+        if visual not in self._visuals:
+            self._visuals.append(visual)
+
+    def render(self, viewport=None, model=None, view=None, proj=None):
+        """
+        Render all visuals on *viewport* using the given *model*,
+        *view*, *proj* matrices and composite them.
+
+        Parameters
+        ----------
+        viewport : Viewport
+            Viewport where to render the visuals
+        model : mat4
+            Model matrix to use for rendering
+        view : mat4
+            View matrix to use for rendering
+        proj : mat4
+            Projection matrix to use for rendering
+        """
+
+        for visual in self._visuals:
+            visual._composited[viewport] = self
+        if viewport not in self._resizing:
+            canvas = viewport._axes.get_figure().canvas
+            canvas.mpl_connect('resize_event',
+                               lambda event: self.resize(viewport))
+            self._resizing.add(viewport)
+
+        self._rendering = True
+        try:
+            for visual in self._visuals:
+                visual.render(viewport, model, view, proj)
+        finally:
+            self._rendering = False
+        self.composite(viewport)
+
+    def resize(self, viewport):
+        """
+        Render all visuals on *viewport* again after a resize and
+        composite them from scratch.
+
+        Parameters
+        ----------
+        viewport : Viewport
+            Viewport where the visuals have been rendered
+        """
+
+        self.clear(viewport)
+        self.render(viewport)
+
+    def clear(self, viewport):
+        """
+        Remove composited items from *viewport*. Collections of
+        visuals are shown again on their next render.
+
+        Parameters
+        ----------
+        viewport : Viewport
+            Viewport where the visuals have been rendered
+        """
+
+        composite = self._composites.get(viewport, None)
+        if composite is not None and composite.parts:
+            composite.parts = []
+            composite.stale = True
+        self._fingerprints.pop(viewport, None)
+
+    def composite(self, viewport):
+        """
+        Merge the depth of items of all visuals rendered on
+        *viewport* and update the drawing order accordingly.
+
+        Parameters
+        ----------
+        viewport : Viewport
+            Viewport where the visuals have been rendered
+        """
+
+        if viewport not in self._composites:
+            composite = Composite()
+            viewport._axes.add_artist(composite)
+            self._composites[viewport] = composite
+        composite = self._composites[viewport]
+
+        streams = []
+        for visual in self._visuals:
+            streams.extend(visual.streams(viewport))
+        collections = [collection for collection, depth in streams]
+        for collection in collections:
+            collection.set_visible(False)
+
+        # Nothing to do if no visual has been rendered since last time
+        fingerprints = tuple(visual._fingerprints.get(viewport, None)
+                             for visual in self._visuals)
+        previous = self._fingerprints.get(viewport, None)
+        if (previous is not None and len(previous) == len(fingerprints)
+            and all(a is b for a, b in zip(previous, fingerprints))):
+            return
+        self._fingerprints[viewport] = fingerprints
+
+        # Depth might be only partially sorted (e.g. sorting disabled
+        # or skipped), a running maximum keeps each stream order.
+        keys = [np.maximum.accumulate(depth) if len(depth) else depth
+                for collection, depth in streams]
+        source, items = merge(keys)
+
+        # Split drawing order into runs of a same collection
+        parts = []
+        if len(source):
+            starts = np.flatnonzero(np.diff(source)) + 1
+            starts = np.concatenate([[0], starts])
+            stops = np.concatenate([starts[1:], [len(source)]])
+            for start, stop in zip(starts, stops):
+                s = source[start]
+                collection = collections[s]
+                first = items[start]
+                parts.append(split(collection, first, first + stop - start,
+                                   len(keys[s])))
+        if collections:
+            composite.set_zorder(max(c.get_zorder() for c in collections))
+        composite.parts = parts
+        composite.stale = True
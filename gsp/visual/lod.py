@@ -0,0 +1,155 @@
+# Package: Graphic Server Protocol / Matplotlib
+# Authors: Nicolas P .Rougier <nicolas.rougier@inria.fr>
+# License: BSD 3 clause
+"""
+Level of detail (LOD) for meshes using vertex clustering: vertices
+falling into the same cell of a regular grid are merged and faces
+that become degenerate are removed. A pyramid is made of
+successively coarser levels obtained by halving the grid resolution.
+"""
+import os
+import hashlib
+import numpy as np
+from gsp.core import diskcache
+
+
+def cluster(positions, face_indices, cells):
+    """
+    Simplify a mesh by merging vertices that fall into the same cell
+    of a regular grid of *cells* cells along its largest extent.
+
+    Parameters
+    ----------
+    positions : np.ndarray
+        Vertices positions (vec3)
+    face_indices : np.ndarray
+        Face indices (int)
+    cells : int
+        Grid resolution
+
+    Returns
+    -------
+    (np.ndarray, np.ndarray, np.ndarray)
+        Simplified positions, face indices and indices of the
+        original face each simplified face comes from
+    """
+
+    positions = np.asarray(positions, dtype=np.float64).reshape(-1,3)
+    face_indices = np.asarray(face_indices).reshape(-1,3)
+
+    vmin, vmax = positions.min(axis=0), positions.max(axis=0)
+    size = max((vmax - vmin).max(), np.finfo(float).tiny) / cells
+    cell = np.minimum(((positions - vmin) / size).astype(np.int64), cells-1)
+    keys = (cell[:,0]*cells + cell[:,1])*cells + cell[:,2]
+    keys, inverse = np.unique(keys, return_inverse=True)
+    inverse = inverse.ravel()
+
+    # Merged vertices are located at the centroid of their cell vertices
+    count = np.bincount(inverse, minlength=len(keys))
+    merged = np.empty((len(keys), 3))
+    for i in range(3):
+        merged[:,i] = np.bincount(inverse, positions[:,i], len(keys)) / count
+
+    # Remove degenerate and duplicated faces
+    faces = inverse[face_indices]
+    valid = ((faces[:,0] != faces[:,1]) &
+             (faces[:,1] != faces[:,2]) &
+             (faces[:,2] != faces[:,0]))
+    face_map = np.flatnonzero(valid)
+    _, unique = np.unique(np.sort(faces[face_map], axis=1), axis=0, return_index=True)
+    face_map = face_map[np.sort(unique)]
+
+    return (merged.astype(np.float32),
+            faces[face_map].astype(np.int32),
+            face_map)
+
+
+def pyramid(positions, face_indices, minimum=256, cache=None):
+    """
+    Build a pyramid of simplified meshes, from the original one
+    (level 0) to coarser ones with at least *minimum* faces. If a
+    *cache* directory is given, the pyramid is loaded from (or saved
+    to) a file named after a hash of the mesh.
+
+    Parameters
+    ----------
+    positions : np.ndarray
+        Vertices positions (vec3)
+    face_indices : np.ndarray
+        Face indices (int)
+    minimum : int
+        Minimum number of faces of the coarsest level
+    cache : str | None
+        Cache directory
+
+    Returns
+    -------
+    list
+        List of (positions, face_indices, face_map) where face_map
+        is None for the original mesh
+    """
+
+    positions = np.ascontiguousarray(positions, dtype=np.float32).reshape(-1,3)
+    face_indices = np.ascontiguousarray(face_indices, dtype=np.int32).reshape(-1,3)
+
+    filename = None
+    if cache is not None:
+        digest = hashlib.sha1()
+        digest.update(positions.tobytes())
+        digest.update(face_indices.tobytes())
+        digest.update(str(minimum).encode())
+        filename = os.path.join(cache, f"lod-{digest.hexdigest()}.npz")
+        if os.path.exists(filename):
+            try:
+                with np.load(filename) as data:
+                    count = int(data["count"])
+                    levels = [(positions, face_indices, None)] + [
+                        (data[f"positions_{i}"], data[f"faces_{i}"], data[f"map_{i}"])
+                        for i in range(1, count)]
+                diskcache.touch(filename)
+                return levels
+            except (OSError, KeyError, ValueError):
+                pass
+
+    levels = [(positions, face_indices, None)]
+    cells = max(int(np.sqrt(len(face_indices))), 2)
+    while cells > 2 and len(levels[-1][1]) > minimum:
+        cells //= 2
+        level = cluster(positions, face_indices, cells)
+        if len(level[1]) < minimum:
+            break
+        if len(level[1]) < len(levels[-1][1]):
+            levels.append(level)
+
+    if filename is not None:
+        arrays = {"count": len(levels)}
+        for i, (P, F, M) in enumerate(levels[1:], 1):
+            arrays[f"positions_{i}"] = P
+            arrays[f"faces_{i}"] = F
+            arrays[f"map_{i}"] = M
+        try:
+            os.makedirs(cache, exist_ok=True)
+            np.savez(filename, **arrays)
+            diskcache.evict(cache)
+        except OSError:
+            pass
+    return levels
+
+
+def select(levels, budget):
+    """
+    Return the index of the finest level of the pyramid whose number
+    of faces is below the given *budget*, or the coarsest one.
+
+    Parameters
+    ----------
+    levels : list
+        Pyramid levels (see `pyramid`)
+    budget : int
+        Maximum number of faces
+    """
+
+    for i, (positions, face_indices, face_map) in enumerate(levels):
+        if len(face_indices) <= budget:
+            return i
+    return len(levels) - 1
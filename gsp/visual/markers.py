@@ -3,8 +3,10 @@
 # License: BSD 3 clause
 import numpy as np
 import matplotlib as mpl
-from gsp import glm
 from gsp.visual import Visual
+from gsp.visual.provider import Provider
+from gsp.visual.visual import version, tracked, composited
+from gsp.visual.compositor import Compositor
 from gsp.transform import Transform
 from gsp.core import Viewport, Buffer, Color, Measure, Marker
 
@@ -56,6 +58,12 @@ class Markers(Visual):
              ```
     """
 
+    # Items are vertices (see `Visual.eval_index`)
+    __decimation__ = True
+
+    # Prototype path of each marker type
+    __prototypes__ = {}
+
     def __init__(self, positions,
                        types = Marker.point,
                        sizes = 25.0,
@@ -99,52 +107,101 @@ class Markers(Visual):
         self.set_variable("fill_colors", fill_colors)
         self.set_variable("line_colors", line_colors)
         self.set_variable("line_widths", line_widths)
-        self.generate_markers(positions)
 
+        # Batching of markers without axis: None (one path per
+        # marker), "groups" (one collection per type and quantized
+        # angle) or "merged" (groups whose items are interleaved
+        # according to depth)
+        self.set_variable("batching", None)
 
-    def generate_markers(self, positions):
+        # Quantization step of angles (degrees) when batching
+        self.set_variable("angle_step", 1.0)
+
+        self.paths, self._paths_key = None, None
+        self._groups = {}
+        self._streams = {}
+        self._compositor = Compositor(self)
+
+
+    @classmethod
+    def prototype(cls, mtype):
         """
-        Generate paths for markers and dependng on positions.
+        Return the (unit size) path of the given marker type. It is
+        built once and shared among all markers of the same type.
+
+        Parameters
+        ----------
+        mtype : Marker | int
+            Marker type or value of a registered marker
         """
 
-        axis = self.eval_variable("axis")
-        types = self.eval_variable("types")
-        angles = self.eval_variable("angles")
-        self.paths = None
-
-        # If types or angles are set individually, we need to generate paths
-        if (axis is not None or
-            (hasattr(types, "__len__") and len(types) == len(positions)) or
-            (hasattr(angles, "__len__") and len(angles) == len(positions))):
-            self.paths = []
-            for i in range(len(positions)):
-                try:    mtype = types[i]
-                except: mtype = types
-                try:    angle = float(angles[i])
-                except: angle = float(angles)
-                try:    axis = axis[i]
-                except: axis = axis
-
-                mtype = Marker.path(mtype)
-                marker = mpl.markers.MarkerStyle(mtype)
-                transform = marker.get_transform()
-                path = marker.get_path().transformed(transform)
-
-                transform = glm.zrotate(angle)
-                if axis is not None:
-                    z_axis = (0,0,1)
-                    A = glm.align(positions[i], z_axis)
-                    transform = A @ transform
-                V = np.asarray(path._vertices, dtype=np.float32)
-                zeros = np.zeros(len(V), dtype=np.float32)
-                ones = np.ones(len(V), dtype=np.float32)
-                Z = np.c_[V, zeros, ones]
-                Z = Z @ transform.T
-                # Z = Z / Z[3]
-                path._vertices = Z[:,:2]
-                self.paths.append(path)
+        mtype = int(mtype)
+        if mtype not in cls.__prototypes__:
+            marker = mpl.markers.MarkerStyle(Marker.path(mtype))
+            path = marker.get_path().transformed(marker.get_transform())
+            cls.__prototypes__[mtype] = path
+        return cls.__prototypes__[mtype]
+
+    def generate_markers(self, positions):
+        """
+        Generate paths for markers depending on their types, angles
+        and axis (transformed by the model matrix). Markers with an
+        axis lie in the plane orthogonal to their axis and their path
+        is the projection of that plane onto the xy plane. Paths are
+        obtained by applying a batched product of per marker 2×2
+        matrices to the prototype vertices of each type.
 
+        Parameters
+        ----------
+        positions : np.ndarray
+            Markers positions (only used for their number)
+        """
 
+        count = len(positions)
+        types = self.eval_variable("types").reshape(-1)
+        angles = self.eval_variable("angles").astype(np.float64).reshape(-1)
+        axis = self.get_variable("axis")
+        if axis is not None:
+            axis = self.eval_variable("axis").astype(np.float64).reshape(-1,3)
+            axis = axis @ np.asarray(self._model, dtype=np.float64)[:3,:3].T
+
+        # Markers share the same path if nothing is set individually
+        n = count
+        if (axis is None and len(types) != count and len(angles) != count):
+            n = 1
+        types = types if len(types) == n else np.resize(types[:1], n)
+        angles = np.radians(angles if len(angles) == n else np.resize(angles[:1], n))
+
+        # Rotation around z
+        c, s = np.cos(angles), np.sin(angles)
+        L = np.zeros((n,3,3))
+        L[:,0,0], L[:,0,1], L[:,1,0], L[:,1,1], L[:,2,2] = c, -s, s, c, 1
+
+        # Rotation of z onto axis (Rodrigues formula)
+        if axis is not None:
+            axis = axis if len(axis) == n else np.resize(axis[:1], (n,3))
+            a = axis / np.maximum(np.linalg.norm(axis, axis=1), 1e-12)[:,None]
+            v = np.stack([-a[:,1], a[:,0], np.zeros(n)], axis=1)   # z × a
+            cos = a[:,2]
+            K = np.zeros((n,3,3))
+            K[:,0,1], K[:,0,2] = -v[:,2], v[:,1]
+            K[:,1,0], K[:,1,2] = v[:,2], -v[:,0]
+            K[:,2,0], K[:,2,1] = -v[:,1], v[:,0]
+            R = np.eye(3) + K + (K @ K) / np.maximum(1 + cos, 1e-12)[:,None,None]
+            R[cos < -1+1e-9] = np.diag([1,-1,-1])
+            L = R @ L
+        L = L[:,:2,:2]
+
+        self.paths = [None]*n
+        for mtype in np.unique(types):
+            group = np.flatnonzero(types == mtype)
+            path = self.prototype(mtype)
+            vertices = np.einsum("ij,gkj->gik", path.vertices, L[group])
+            for k, V in zip(group, vertices.astype(np.float32)):
+                self.paths[k] = mpl.path.Path(V, path.codes)
+
+
+    @composited
     def render(self, viewport=None, model=None, view=None, proj=None):
         """
         Render the visual on *viewport* using the given *model*,
@@ -163,20 +220,9 @@ class Markers(Visual):
         """
 
         # We store the model/view/proj matrices for the resize_event below
-        if model is not None:
-            self._model = model
-        model = self._model
-
-        if view is not None:
-            self._view = view
-        view = self._view
-
-        if proj is not None:
-            self._proj = proj
-        proj = self._proj
+        transform = self.set_matrices(model, view, proj)
 
         self.set_variable("viewport", viewport)
-        transform = proj @ view @ model
 
         # Create the collection if necessary
         if viewport not in self._viewports:
@@ -190,51 +236,209 @@ class Markers(Visual):
             # kept up to date with canvas size
             canvas = viewport._canvas._figure.canvas
             canvas.mpl_connect('resize_event',
-                               lambda event: self.render(viewport))
+                               lambda event: self.resize(viewport))
 
         collection = self._viewports[viewport]
+        if self.unchanged(viewport):
+            return
+
+        # Markers with an axis are oriented individually and cannot be batched
+        batching = self.get_variable("batching")
+        if batching not in (None, "groups", "merged"):
+            raise ValueError(f"Unknown batching mode: {batching}")
+        axis = self.get_variable("axis")
+        if axis is not None:
+            batching = None
+
+        # Skip the visual entirely if it is outside the viewport
+        # (taking the extent of markers into account)
+        sizes = self.eval_variable("sizes")
+        line_widths = self.eval_variable("line_widths")
+        margin = (np.sqrt(np.max(sizes)) + np.max(line_widths))/2
+        margin = margin*viewport._canvas._dpi/72
+        if self.outside(viewport, transform, margin):
+            collection.set_visible(False)
+            for group in self._groups.get(viewport, {}).values():
+                group.set_visible(False)
+            self._compositor.clear(viewport)
+            return
+        collection.set_visible(batching is None)
+
         positions = self.eval_variable("positions")
 
-        axis = self.eval_variable("axis")
-        if axis is not None:
-            P = glm.to_vec3(glm.to_vec4(positions) @ model.T)
-            self.generate_markers(P)
+        positions = positions.reshape(-1,3)
+        if batching is None:
+            # Paths are only reused if types and angles are tracked
+            # (untracked ones might have been modified in place)
+            variables = [self._variables.get(name) for name in ("types", "angles")]
+            key = tuple((id(value), version(value)) for value in variables)
+            if not all(tracked(value) for value in variables):
+                key = None
+            if (axis is not None or self.paths is None
+                or key is None or key != self._paths_key):
+                self.generate_markers(positions)
+                self._paths_key = key
+
+        positions = self.project(viewport, positions, transform)
+        depth = self.workspace(viewport, "depth", (len(positions),))
+        np.negative(positions[:,2], out=depth)
+        self.set_variable("screen", Provider(positions = positions))
+        self.set_variable("depth",  Provider(positions = depth))
+
+        # Cull markers outside the viewport and apply optional
+        # decimation (level of detail)
+        count = len(positions)
+        codes = self.outcodes(viewport, positions, margin)
+        index = self.eval_index(None if codes is None else codes == 0)
+        if index is not None:
+            positions = positions[index]
+            depth = depth[index]
+
+        sort_indices = self.sort(viewport, depth, index)
+        if batching is not None:
+            self.render_groups(viewport, positions, depth, count, index,
+                               sort_indices, sizes, line_widths)
+            if batching == "merged":
+                if viewport in self._composited:
+                    self._compositor.clear(viewport)
+                else:
+                    self._compositor.composite(viewport)
+            else:
+                self._compositor.clear(viewport)
+            return
+        for group in self._groups.get(viewport, {}).values():
+            group.set_visible(False)
+        self._compositor.clear(viewport)
+
+        self.update_collection(viewport, collection, "offsets",
+                               positions[:,:2], sort_indices)
+
+        if len(self.paths) == count and count > 1:
+            order = sort_indices if index is None else index[sort_indices]
+            collection.set_paths([self.paths[i] for i in order])
+        else:
+            collection.set_paths(self.paths)
 
-        positions = glm.to_vec3(glm.to_vec4(positions) @ transform.T)
-        depth = -positions[:,2]
+        fill_colors = self.select(self.eval_variable("fill_colors"), count, index)
+        self.update_collection(viewport, collection, "facecolors",
+                               fill_colors, sort_indices, "fill_colors")
 
-        sort_indices = np.argsort(depth)
-        positions = positions[sort_indices]
-        collection.set_offsets(positions[:,:2])
+        line_colors = self.select(self.eval_variable("line_colors"), count, index)
+        self.update_collection(viewport, collection, "edgecolors",
+                               line_colors, sort_indices, "line_colors")
 
-        if axis is not None:
-            paths = [self.paths[i] for i in sort_indices]
-            collection.set_paths(paths)
+        line_widths = self.select(line_widths, count, index)
+        self.update_collection(viewport, collection, "linewidths",
+                               line_widths, sort_indices, "line_widths")
 
-        self.set_variable("screen", {"positions": positions})
-        self.set_variable("depth",  {"positions": depth})
+        sizes = self.select(sizes, count, index)
+        self.update_collection(viewport, collection, "sizes",
+                               sizes, sort_indices, "sizes")
 
+    def render_groups(self, viewport, positions, depth, count, index,
+                            order, sizes, line_widths):
+        """
+        Render markers as groups of markers sharing a same type and
+        quantized angle. Each group is a collection with a single
+        path and per item offsets, sizes and colors such that it
+        renders as fast as a scatter plot. Groups are drawn one after
+        the other and items keep their depth order inside each group.
 
-        fill_colors = self.eval_variable("fill_colors")
-        if isinstance(fill_colors, np.ndarray) and (len(fill_colors) == len(positions)):
-            collection.set_facecolors(fill_colors[sort_indices])
-        else:
-            collection.set_facecolors(fill_colors)
+        Parameters
+        ----------
+        viewport : Viewport
+            Viewport where to render the visual
+        positions : np.ndarray
+            Projected positions of visible markers
+        depth : np.ndarray
+            Depth of visible markers
+        count : int
+            Number of markers (before culling)
+        index : np.ndarray | None
+            Indices of visible markers
+        order : np.ndarray
+            Drawing order of visible markers
+        sizes : np.ndarray
+            Markers sizes (before culling)
+        line_widths : np.ndarray
+            Markers line widths (before culling)
+        """
 
-        line_colors = self.eval_variable("line_colors")
-        if isinstance(line_colors, np.ndarray) and (len(line_colors) == len(positions)):
-            collection.set_edgecolors(line_colors[sort_indices])
-        else:
-            collection.set_edgecolors(line_colors)
+        n = len(order)
+        step = float(self.eval_variable("angle_step")[0])
+        steps = max(int(round(360/step)), 1)
+        types = self.select(self.eval_variable("types").reshape(-1), count, index)
+        angles = self.select(self.eval_variable("angles").reshape(-1), count, index)
+        types = types[order] if len(types) == n else types[:1]
+        angles = angles[order] if len(angles) == n else angles[:1]
+        angles = np.round(angles.astype(np.float64)/step).astype(np.int64) % steps
+        keys = np.broadcast_to(types.astype(np.int64)*steps + angles, (n,))
+
+        # Stable partition of items (in drawing order) per group, the
+        # small number of groups allows for a radix sort
+        groups, inverse = np.unique(keys, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        if len(groups) < 2**16:
+            inverse = inverse.astype(np.uint16)
+        members = np.argsort(inverse, kind="stable")
+        bounds = np.zeros(len(groups)+1, dtype=np.int64)
+        np.cumsum(np.bincount(inverse, minlength=len(groups)), out=bounds[1:])
+
+        fill_colors = self.select(self.eval_variable("fill_colors"), count, index)
+        line_colors = self.select(self.eval_variable("line_colors"), count, index)
+        line_widths = self.select(line_widths, count, index)
+        sizes = self.select(sizes, count, index)
+
+        # Contiguous offsets such that gathering them per group is fast
+        offsets = self.workspace(viewport, "offsets", (n,2))
+        offsets[...] = positions[:,:2]
+
+        collections = self._groups.setdefault(viewport, {})
+        for collection in collections.values():
+            collection.set_visible(False)
+        streams = []
+        for group, start, stop in zip(groups, bounds[:-1], bounds[1:]):
+            mtype, angle = divmod(int(group), steps)
+            key = mtype, angle*step
+            if key not in collections:
+                collection = viewport._axes.scatter([],[])
+                collection.set_antialiaseds(True)
+                collection.set_linewidths(0)
+                path = self.prototype(mtype)
+                c, s = np.cos(np.radians(key[1])), np.sin(np.radians(key[1]))
+                vertices = path.vertices @ np.array([[c, s], [-s, c]])
+                collection.set_paths([mpl.path.Path(vertices, path.codes)])
+                viewport._axes.add_collection(collection, autolim=False)
+                collections[key] = collection
+            collection = collections[key]
+            collection.set_visible(True)
+
+            items = order[members[start:stop]]
+            name = "%d.%g" % key
+            for attribute, value, variable in (
+                    ("offsets", offsets, None),
+                    ("facecolors", fill_colors, "fill_colors"),
+                    ("edgecolors", line_colors, "line_colors"),
+                    ("linewidths", line_widths, "line_widths"),
+                    ("sizes", sizes, "sizes")):
+                self.update_collection(viewport, collection, attribute, value,
+                                       items, variable, attribute + "." + name, n)
+            streams.append((collection, depth[items]))
+        self._streams[viewport] = self._fingerprints.get(viewport, None), streams
+
+    def streams(self, viewport):
+        """
+        Return the list of (collection, depth) of the last render on
+        *viewport*, with one entry per group of markers when they are
+        batched.
 
-        line_widths = self.eval_variable("line_widths")
-        if isinstance(line_widths, np.ndarray) and (len(line_widths) == len(positions)):
-            collection.set_linewidths(line_widths[sort_indices])
-        else:
-            collection.set_linewidths(line_widths)
+        Parameters
+        ----------
+        viewport : Viewport
+            Viewport where the visual is rendered
+        """
 
-        sizes = self.eval_variable("sizes")
-        if isinstance(sizes, np.ndarray) and (len(sizes) == len(positions)):
-            collection.set_sizes(sizes[sort_indices])
-        else:
-            collection.set_sizes(sizes)
+        fingerprint, streams = self._streams.get(viewport, (None, []))
+        if fingerprint is not None and fingerprint is self._fingerprints.get(viewport, None):
+            return streams
+        return Visual.streams(self, viewport)
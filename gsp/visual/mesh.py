@@ -1,11 +1,17 @@
 # Package: Graphic Server Protocol / Matplotlib
 # Authors: Nicolas P .Rougier <nicolas.rougier@inria.fr>
 # License: BSD 3 clause
+import hashlib
 import numpy as np
 from gsp import glm
 from gsp.visual import Visual
+from gsp.visual.provider import Provider
+from gsp.visual.visual import version, tracked, composited
+from gsp.visual import lod, raster
 from matplotlib.collections import PolyCollection
-from gsp.core import Viewport, Buffer, Color, Measure
+from matplotlib.image import AxesImage
+from matplotlib.colors import to_rgba_array
+from gsp.core import Viewport, Buffer, Color, Measure, diskcache
 
 class Mesh(Visual):
     """
@@ -88,7 +94,243 @@ class Mesh(Visual):
         self.set_variable("line_colors", line_colors)
         self.set_variable("line_widths", line_widths)
 
+        # Face culling can be None, "back" or "front". Front faces are
+        # faces whose projection is counter-clockwise.
+        self.set_variable("face_culling", None)
+
+        # Faces whose projected area is below threshold (pixels) are
+        # merged such that only the nearest one is kept per pixel.
+        self.set_variable("face_threshold", 0)
+
+        # Level of detail is used when a budget (number of faces) is
+        # given. A smaller budget (default is a quarter) is used while
+        # dragging (see `press` and `release`). Pyramid of levels is
+        # cached in the given directory (None to disable), defaulting
+        # to the disk cache directory (see `gsp.core.diskcache`).
+        self.set_variable("lod_budget", None)
+        self.set_variable("lod_drag_budget", None)
+        self.set_variable("lod_dragging", False)
+        self.set_variable("lod_cache", diskcache.directory)
+        self._pyramid = None, None
+
+        # Faces can be rasterized into an image (using a depth buffer)
+        # instead of being sorted and drawn as polygons. Lines are not
+        # rendered in this mode.
+        self.set_variable("rasterize", False)
+        self._images = {}
+
+
+    def press(self, viewport, model=None, view=None, proj=None):
+        """
+        Start an interaction (e.g. trackball drag) and render the
+        visual using a coarser level of detail (if any). This can be
+        connected to the "press" event of a camera.
+        """
+
+        self.set_variable("lod_dragging", True)
+        self.render(viewport, model, view, proj)
+
+    def release(self, viewport, model=None, view=None, proj=None):
+        """
+        End an interaction and render the visual using the regular
+        level of detail. This can be connected to the "release" event
+        of a camera.
+        """
+
+        self.set_variable("lod_dragging", False)
+        self.render(viewport, model, view, proj)
+
+    def level(self, viewport, positions, face_indices):
+        """
+        Return the positions, face indices and face map (index of
+        original faces, None for the original mesh) of the level of
+        detail to render on *viewport*. The level is the finest one
+        with less faces than the budget and than twice the number of
+        pixels covered by the projected bounding sphere.
+
+        Parameters
+        ----------
+        viewport : Viewport
+            Viewport where the visual is rendered
+        positions : np.ndarray
+            Vertices positions (vec3)
+        face_indices : np.ndarray
+            Face indices (int)
+        """
+
+        budget = self._variables.get("lod_budget", None)
+        if budget is None:
+            return positions, face_indices, None
+        if self._variables.get("lod_dragging", False):
+            budget = self._variables.get("lod_drag_budget", None) or budget // 4
+
+        # Untracked inputs might have been modified in place and the
+        # pyramid is then keyed on their content
+        P, F = self.get_variable("positions"), self.get_variable("face_indices")
+        key = id(P), version(P), id(F), version(F)
+        if not (tracked(P) and tracked(F)):
+            digest = hashlib.sha1(np.ascontiguousarray(positions))
+            digest.update(np.ascontiguousarray(face_indices))
+            key = key + (digest.hexdigest(),)
+        if self._pyramid[0] != key:
+            levels = lod.pyramid(positions, face_indices,
+                                 cache=self._variables.get("lod_cache", None))
+            self._pyramid = key, levels
+        levels = self._pyramid[1]
+
+        # Number of pixels covered by the projected bounding sphere
+        bounds = self.bounds(untracked=True)
+        if bounds is not None:
+            box, center, radius = bounds
+            modelview = self._view @ self._model
+            radius = radius * np.linalg.norm(modelview[:3,:3], axis=0).max()
+            rx, ry = radius*self._proj[0,0], radius*self._proj[1,1]
+            if self._proj[3,3] == 0:
+                distance = -(modelview[2,:3] @ center + modelview[2,3])
+                if distance > radius:
+                    rx, ry = rx/distance, ry/distance
+                else:
+                    rx = ry = np.inf
+            xmin, xmax = viewport.xlim
+            ymin, ymax = viewport.ylim
+            width, height = viewport.size
+            coverage = np.pi * rx*width/(xmax-xmin) * ry*height/(ymax-ymin)
+            if np.isfinite(coverage):
+                budget = min(budget, 2*coverage)
+
+        return levels[lod.select(levels, budget)]
+
+    def rasterize(self, viewport, faces, colors):
+        """
+        Rasterize projected *faces* with the given *colors* using a
+        depth buffer at *viewport* resolution and display the result
+        as a single image.
+
+        Parameters
+        ----------
+        viewport : Viewport
+            Viewport where the visual is rendered
+        faces : np.ndarray
+            Projected faces (n,3,3)
+        colors : np.ndarray
+            Face colors (n,4) or a single color
+        """
+
+        xmin, xmax = viewport.xlim
+        ymin, ymax = viewport.ylim
+        width, height = viewport.size
+        width, height = max(int(round(width)), 1), max(int(round(height)), 1)
+
+        count = len(faces)
+        vertices = self.workspace(viewport, "raster.vertices", (count,3,2))
+        np.subtract(faces[...,0], xmin, out=vertices[...,0])
+        np.subtract(faces[...,1], ymin, out=vertices[...,1])
+        vertices[...,0] *= width/(xmax - xmin)
+        vertices[...,1] *= height/(ymax - ymin)
+        colors = np.broadcast_to(to_rgba_array(colors), (count,4))
+
+        image = self.workspace(viewport, "raster.image", (height,width,4))
+        zbuffer = self.workspace(viewport, "raster.depth", (height,width))
+        raster.rasterize(vertices, faces[...,2], colors, image, zbuffer)
+
+        if viewport not in self._images:
+            artist = AxesImage(viewport._axes, interpolation="nearest", origin="lower")
+            viewport._axes.add_image(artist)
+            self._images[viewport] = artist
+        artist = self._images[viewport]
+        artist.set_data(image)
+        artist.set_extent((xmin, xmax, ymin, ymax))
+        artist.set_visible(True)
+
+    def signed_area(self, viewport, positions, face_indices):
+        """
+        Return the signed area of projected faces (normalized device
+        coordinates), which is positive for counter-clockwise faces.
+
+        Parameters
+        ----------
+        viewport : Viewport
+            Viewport where the visual is rendered
+        positions : np.ndarray
+            Projected positions (vec3)
+        face_indices : np.ndarray
+            Face indices (int)
+        """
+
+        count = len(face_indices)
+        vertices = self.workspace(viewport, "faces.xy", (count,3,2))
+        np.take(positions[:,:2], face_indices, axis=0, out=vertices, mode="clip")
+        edges = self.workspace(viewport, "faces.edges", (count,2,2))
+        np.subtract(vertices[:,1:], vertices[:,:1], out=edges)
+        area = self.workspace(viewport, "faces.area", (count,))
+        cross = self.workspace(viewport, "faces.cross", (count,))
+        np.multiply(edges[:,0,0], edges[:,1,1], out=area)
+        np.multiply(edges[:,0,1], edges[:,1,0], out=cross)
+        area -= cross
+        area *= 0.5
+        return area
+
+    def merge_faces(self, viewport, positions, face_indices, area, mask, threshold):
+        """
+        Return a mask of faces where faces whose projected area is
+        below *threshold* (pixels) have been merged: among small faces
+        whose centroid falls into the same pixel, only the nearest one
+        is kept, such that the pixel is still covered. Draw cost then
+        depends on the screen coverage rather than on the number of
+        faces.
+
+        Parameters
+        ----------
+        viewport : Viewport
+            Viewport where the visual is rendered
+        positions : np.ndarray
+            Projected positions (vec3)
+        face_indices : np.ndarray
+            Face indices (int)
+        area : np.ndarray
+            Signed area of faces (normalized device coordinates)
+        mask : np.ndarray | None
+            Mask of faces to consider (bool)
+        threshold : float
+            Area threshold (pixels)
+        """
 
+        count = len(face_indices)
+        xmin, xmax = viewport.xlim
+        ymin, ymax = viewport.ylim
+        width, height = viewport.size
+        sx, sy = width/(xmax - xmin), height/(ymax - ymin)
+
+        small = self.workspace(viewport, "faces.small", (count,), np.bool_)
+        np.less(np.abs(area), threshold/(sx*sy), out=small)
+        if mask is not None:
+            small &= mask
+        candidates = np.flatnonzero(small)
+        if not len(candidates):
+            return mask
+
+        # Bin small faces according to the pixel of their centroid
+        faces = positions[face_indices[candidates]]
+        centers = faces.mean(axis=1)
+        nx = int(np.ceil(width))
+        x = np.clip(((centers[:,0] - xmin)*sx).astype(int), 0, nx-1)
+        y = np.clip(((centers[:,1] - ymin)*sy).astype(int), 0, int(np.ceil(height))-1)
+        bins = y*nx + x
+
+        # Keep the nearest face in each bin
+        order = np.lexsort((centers[:,2], bins))
+        bins = bins[order]
+        first = np.ones(len(bins), dtype=bool)
+        first[1:] = bins[1:] != bins[:-1]
+
+        if mask is None:
+            mask = self.workspace(viewport, "faces.mask", (count,), np.bool_)
+            mask[...] = True
+        mask[candidates] = False
+        mask[candidates[order[first]]] = True
+        return mask
+
+    @composited
     def render(self, viewport, model=None, view=None, proj=None):
         """
         Render the visual on *viewport* using the given *model*,
@@ -107,20 +349,9 @@ class Mesh(Visual):
         """
 
         # We store the model/view/proj matrices for the resize_event below
-        if model is not None:
-            self._model = model
-        model = self._model
-
-        if view is not None:
-            self._view = view
-        view = self._view
-
-        if proj is not None:
-            self._proj = proj
-        proj = self._proj
+        transform = self.set_matrices(model, view, proj)
 
         self.set_variable("viewport", viewport)
-        transform = proj @ view @ model
 
         if viewport not in self._viewports:
             collection = PolyCollection([], clip_on=True, snap=False)
@@ -131,9 +362,25 @@ class Mesh(Visual):
             # kept up to date with canvas size
             canvas = viewport._canvas._figure.canvas
             canvas.mpl_connect('resize_event',
-                               lambda event: self.render(viewport))
+                               lambda event: self.resize(viewport))
 
         collection = self._viewports[viewport]
+        if self.unchanged(viewport):
+            return
+
+        # Skip the visual entirely if it is outside the viewport
+        line_widths = self.eval_variable("line_widths")
+        margin = np.max(line_widths)/2 * viewport._canvas._dpi/72
+        rasterize = bool(self._variables.get("rasterize", False))
+        image = self._images.get(viewport, None)
+        if self.outside(viewport, transform, margin):
+            collection.set_visible(False)
+            if image is not None:
+                image.set_visible(False)
+            return
+        collection.set_visible(not rasterize)
+        if image is not None:
+            image.set_visible(rasterize)
 
         # Get positions
         positions = self.eval_variable("positions")
@@ -143,41 +390,97 @@ class Mesh(Visual):
         face_indices = self.eval_variable("face_indices")
         face_indices = face_indices.reshape(-1,3)
 
-        # Compute tranformed triangles (faces) and their (mean) depth
-        positions = glm.to_vec3(glm.to_vec4(positions) @ transform.T)
-        p_depth = positions[:,2]
-        faces = positions[face_indices]
-        f_depth = -faces[:,:,2].mean(axis=1)
-
-        self.set_variable("screen", {"positions": positions,
-                                   "faces": faces} )
-        self.set_variable("depth",  {"positions": p_depth,
-                                   "faces": f_depth} )
+        # Select level of detail
+        total = len(face_indices)
+        positions, face_indices, face_map = self.level(viewport, positions, face_indices)
+
+        # Transformed vertices, triangles (faces) and their (mean) depth
+        # are only computed for all faces if some transform needs them
+        positions = self.project(viewport, positions, transform)
+        self.set_variable("screen", Provider(
+            positions = positions,
+            faces = lambda P=positions, F=face_indices: P[F]))
+        self.set_variable("depth",  Provider(
+            positions = positions[:,2],
+            faces = lambda P=positions, F=face_indices: -P[:,2][F].mean(axis=1)))
+
+        # Cull faces whose vertices are all outside the same side of
+        # the viewport (conservative test on vertices clip codes)
+        count = len(face_indices)
+        codes = self.outcodes(viewport, positions, margin)
+        mask = None
+        if codes is not None:
+            f_codes = self.workspace(viewport, "faces.codes", face_indices.shape, np.uint8)
+            np.take(codes, face_indices, out=f_codes, mode="clip")
+            codes = self.workspace(viewport, "faces.code", (count,), np.uint8)
+            np.bitwise_and.reduce(f_codes, axis=1, out=codes)
+            mask = self.workspace(viewport, "faces.mask", (count,), np.bool_)
+            np.equal(codes, 0, out=mask)
+
+        # Cull back (or front) faces according to their screen winding
+        face_culling = self._variables.get("face_culling", None)
+        threshold = self._variables.get("face_threshold", 0) or 0
+        if face_culling is not None or threshold > 0:
+            area = self.signed_area(viewport, positions, face_indices)
+        if face_culling is not None:
+            if face_culling not in ("back", "front"):
+                raise ValueError(f"Unknown face culling mode ({face_culling})")
+            facing = self.workspace(viewport, "faces.facing", (count,), np.bool_)
+            if face_culling == "back":
+                np.greater(area, 0, out=facing)
+            else:
+                np.less(area, 0, out=facing)
+            if mask is None:
+                mask = facing
+            else:
+                mask &= facing
+
+        # Merge sub-pixel faces
+        if threshold > 0:
+            mask = self.merge_faces(viewport, positions, face_indices,
+                                    area, mask, threshold)
+        index = self.eval_index(mask)
+        if index is not None:
+            face_indices = face_indices[index]
+
+        # Faces and their depth are gathered into the workspace
+        faces = self.workspace(viewport, "faces", face_indices.shape + (3,))
+        np.take(positions, face_indices, axis=0, out=faces, mode="clip")
+        f_depth = self.workspace(viewport, "faces.depth", (len(faces),))
+        np.mean(faces[:,:,2], axis=1, out=f_depth)
+        np.negative(f_depth, out=f_depth)
+
+        # Rasterize faces (exact occlusion, no sorting needed)
+        if rasterize:
+            fill_colors = self.select(self.eval_variable("fill_colors"), total, face_map)
+            fill_colors = self.select(fill_colors, count, index)
+            self.rasterize(viewport, faces, fill_colors)
+            return
 
         # Sort faces according to f_depth
-        sort_indices = np.argsort(f_depth)
+        sort_indices = self.sort(viewport, f_depth, index)
 
 
         # Set positions in the collection
-        collection.set_verts(faces[sort_indices,:,:2])
+        self.update_collection(viewport, collection, "verts",
+                               faces[...,:2], sort_indices)
 
         # Set fill color(s)
-        fill_colors = self.eval_variable("fill_colors")
-        if isinstance(fill_colors, np.ndarray) and (len(fill_colors) == len(faces)):
-            collection.set_facecolors(fill_colors[sort_indices,:])
-        else:
-            collection.set_facecolors(fill_colors)
+        fill_colors = self.select(self.eval_variable("fill_colors"), total, face_map)
+        fill_colors = self.select(fill_colors, count, index)
+        self.update_collection(viewport, collection, "facecolors",
+                               fill_colors, sort_indices, "fill_colors")
 
         # Set line color(s)
-        line_colors = self.eval_variable("line_colors")
+        line_colors = self.select(self.eval_variable("line_colors"), total, face_map)
+        line_colors = self.select(line_colors, count, index)
         if line_colors is not None:
-            if isinstance(line_colors, np.ndarray) and (len(line_colors) == len(faces)):
-                collection.set_edgecolors(line_colors[sort_indices,:])
-            else:
-                collection.set_edgecolors(line_colors)
+            self.update_collection(viewport, collection, "edgecolors",
+                                   line_colors, sort_indices, "line_colors")
 
         # Set line width(s)
-        line_widths = self.eval_variable("line_widths")
         if line_widths is not None:
-            collection.set_linewidths(line_widths)
-            collection.set_antialiaseds(line_widths > 0)
+            self.update_collection(viewport, collection, "linewidths",
+                                   line_widths)
+            self.update_collection(viewport, collection, "antialiaseds",
+                                   line_widths > 0)
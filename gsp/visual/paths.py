@@ -1,12 +1,37 @@
 # Package: Graphic Server Protocol / Matplotlib
 # Authors: Nicolas P .Rougier <nicolas.rougier@inria.fr>
 # License: BSD 3 clause
-import glm
 import numpy as np
 from gsp.visual import Visual
-from matplotlib.collections import LineCollection
+from gsp.visual.provider import Provider
+from gsp.visual.visual import version, tracked, composited
+from gsp.visual.compositor import Compositor
+from matplotlib.collections import Collection, LineCollection
+from matplotlib.path import Path
 from gsp.core import Viewport, Buffer, Color, Measure, LineCap, LineStyle, LineJoin
 
+# Matplotlib equivalent of line styles (dash patterns), caps and joins
+LINESTYLES = {
+    LineStyle.solid:                 "solid",
+    LineStyle.dotted:                (0, (1, 5)),
+    LineStyle.densely_dotted:        (0, (1, 1)),
+    LineStyle.loosely_dotted:        (0, (1, 10)),
+    LineStyle.dashed:                (0, (5, 5)),
+    LineStyle.densely_dashed:        (0, (5, 1)),
+    LineStyle.loosely_dashed:        (0, (5, 10)),
+    LineStyle.dashdotted:            (0, (3, 5, 1, 5)),
+    LineStyle.densely_dashdotted:    (0, (3, 1, 1, 1)),
+    LineStyle.loosely_dashdotted:    (0, (3, 10, 1, 10)),
+    LineStyle.dashdotdotted:         (0, (3, 5, 1, 5, 1, 5)),
+    LineStyle.densely_dashdotdotted: (0, (3, 1, 1, 1, 1, 1)),
+    LineStyle.loosely_dashdotdotted: (0, (3, 10, 1, 10, 1, 10)) }
+LINECAPS = { LineCap.butt:    "butt",
+             LineCap.round:   "round",
+             LineCap.cap:     "projecting" }
+LINEJOINS = { LineJoin.miter: "miter",
+              LineJoin.round: "round",
+              LineJoin.bevel: "bevel" }
+
 
 class Paths(Visual):
     """
@@ -58,6 +83,12 @@ class Paths(Visual):
       - 2n : paths have individiual caps, start and
               end cap for can be diffetent (per item)
 
+    ## Line decimation:
+
+      - None : all vertices are rendered
+      - "m4" : only the first, last, minimum and maximum vertices
+               per pixel column of each path are rendered
+
     # Matplotlib implementation
 
     Matplotlib implementation has some limits regarding the level at
@@ -66,11 +97,15 @@ class Paths(Visual):
 
     Variables      | per visual | per path | per vertex |
     ---------------|------------|----------|------------|
-    `lines_colors` | yes        | yes︎︎      | no         |
-    `lines_widths` | yes        | yes︎︎      | no         |
+    `lines_colors` | yes        | yes︎︎      | yes        |
+    `lines_widths` | yes        | yes︎︎      | yes        |
     `lines_styles` | yes        | yes      | --         |
-    `lines_joins`  | yes        | no       | --         |
-    `lines_caps`   | yes        | no       | --         |
+    `lines_joins`  | yes        | yes      | --         |
+    `lines_caps`   | yes        | yes      | --         |
+
+    Paths with different styles, caps or joins are drawn using one
+    collection per (style, cap, join) and different start and end
+    caps are not supported (start cap is used).
 
 
 
@@ -121,7 +156,308 @@ class Paths(Visual):
         self.set_variable("line_caps", line_caps)
         self.set_variable("line_joins", line_joins)
 
+        # Decimation of vertices can be None or "m4", in which case
+        # only the first, last, minimum and maximum vertices of each
+        # run of vertices falling in a same pixel column are kept
+        self.set_variable("line_decimation", None)
+
+        # Grouping of paths with different styles, caps or joins:
+        # "groups" (one collection per style, cap and join drawn one
+        # after the other) or "merged" (groups whose items are
+        # interleaved according to depth)
+        self.set_variable("grouping", "groups")
+
+        # Layout of paths (lengths, offsets and vertices) with the
+        # line indices it has been computed from and, per viewport,
+        # matplotlib paths that are views of the vertices (or of the
+        # segments when paths are expanded)
+        self._layout = None, None, None, None
+        self._indices = None
+        self._views = {}
+        self._segments = {}
+        self._groups = {}
+        self._streams = {}
+        self._compositor = Compositor(self)
+
+    def decimate(self, viewport, positions, offsets):
+        """
+        Return the indices of the vertices kept by M4 decimation,
+        that is the first, last, minimum (y) and maximum (y) vertices
+        of each run of consecutive vertices of a path falling in the
+        same pixel column of *viewport*, with the offset of each path
+        in the kept vertices. Vertices left or right of the viewport
+        fall in two extra columns.
+
+        Parameters
+        ----------
+        viewport : Viewport
+            Viewport where the visual is rendered
+        positions : np.ndarray
+            Projected positions of path vertices (vec3)
+        offsets : np.ndarray
+            Offset of each path in *positions*
+
+        Returns
+        -------
+        (np.ndarray, np.ndarray)
+            Indices of kept vertices and offsets of paths
+        """
+
+        count = len(positions)
+        if count == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(len(offsets), dtype=np.int64)
+
+        width, height = viewport.size
+        xmin, xmax = viewport.xlim
+        columns = np.floor((positions[:,0] - xmin) * (width / (xmax - xmin)))
+        columns = np.clip(columns, -1, max(1, int(np.ceil(width))), out=columns)
+
+        # Runs of consecutive vertices in a same column and path
+        starts = self.workspace(viewport, "m4.starts", (count,), np.bool_)
+        starts[0] = True
+        np.not_equal(columns[1:], columns[:-1], out=starts[1:])
+        starts[offsets] = True
+        starts = np.flatnonzero(starts)
+        lengths = np.diff(np.append(starts, count))
+        runs = np.repeat(np.arange(len(starts)), lengths)
+
+        keep = self.workspace(viewport, "m4.keep", (count,), np.bool_)
+        keep[...] = False
+        keep[starts] = True
+        keep[starts + lengths - 1] = True
+        y = positions[:,1]
+        for reduce in (np.minimum, np.maximum):
+            extrema = np.flatnonzero(y == np.repeat(reduce.reduceat(y, starts), lengths))
+            first = np.ones(len(extrema), dtype=bool)
+            np.not_equal(runs[extrema[1:]], runs[extrema[:-1]], out=first[1:])
+            keep[extrema[first]] = True
+
+        kept = np.flatnonzero(keep)
+        offsets = np.searchsorted(kept, offsets)
+        return kept, offsets
+
+    def split(self, viewport, positions):
+        """
+        Gather the vertices of all paths into a persistent buffer of
+        *viewport* and return the gathered vertices with the
+        offset and length of each path.
+
+        Parameters
+        ----------
+        viewport : Viewport
+            Viewport where the visual is rendered
+        positions : np.ndarray
+            Projected positions (vec3)
+
+        Returns
+        -------
+        (np.ndarray, np.ndarray, np.ndarray, np.ndarray)
+            Gathered vertices (vec3), offsets, lengths and vertex
+            indices of paths
+        """
+
+        # Untracked line indices might have been modified in place and
+        # are compared to the ones the layout has been computed from
+        variable = self._variables.get("line_indices", None)
+        key = id(variable), version(variable)
+        indices, stale = None, self._layout[0] != key
+        if not tracked(variable):
+            indices = self.eval_variable("line_indices").reshape(-1,2)
+            stale = stale or not np.array_equal(indices, self._indices)
+        if stale:
+            if indices is None:
+                indices = self.eval_variable("line_indices").reshape(-1,2)
+            lengths = indices[:,1] - indices[:,0] + 1
+            offsets = np.zeros(len(lengths), dtype=np.int64)
+            np.cumsum(lengths[:-1], out=offsets[1:])
+            vertices = np.repeat(indices[:,0] - offsets, lengths) + np.arange(lengths.sum())
+            self._layout = key, lengths, offsets, vertices
+            self._indices = np.array(indices)
+        key, lengths, offsets, vertices = self._layout
+
+        gathered = self.workspace(viewport, "paths", (len(vertices),3))
+        np.take(positions, vertices, axis=0, out=gathered, mode="clip")
+        return gathered, offsets, lengths, vertices
+
+    def views(self, viewport, gathered, kept=None, starts=None):
+        """
+        Return matplotlib paths (object array) made of the *gathered*
+        vertices. Paths are views of a persistent buffer of
+        *viewport* that are built once and only rebuilt when the
+        layout changes (or the buffer is reallocated). When vertices
+        are decimated, paths are rebuilt from the *kept* vertices.
+
+        Parameters
+        ----------
+        viewport : Viewport
+            Viewport where the visual is rendered
+        gathered : np.ndarray
+            Gathered vertices of paths (vec3)
+        kept : np.ndarray | None
+            Indices of kept vertices (None if all are kept)
+        starts : np.ndarray | None
+            Offsets of paths in kept vertices
+        """
+
+        if kept is not None:
+            xy = self.workspace(viewport, "paths.xy", (len(kept),2), np.float64)
+            xy[...] = gathered[kept,:2]
+            paths = np.fromiter((Path(V) for V in np.split(xy, starts[1:])),
+                                dtype=object, count=len(starts))
+            self._views[viewport] = None, None, paths
+            return paths
+
+        key, lengths, offsets, vertices = self._layout
+        xy = self.workspace(viewport, "paths.xy", (len(vertices),2), np.float64)
+        xy[...] = gathered[:,:2]
+        views = self._views.get(viewport, None)
+        if views is None or views[0] is not vertices or views[1] != xy.ctypes.data:
+            paths = np.fromiter((Path(V) for V in np.split(xy, offsets[1:])),
+                                dtype=object, count=len(offsets))
+            self._views[viewport] = vertices, xy.ctypes.data, paths
+        return self._views[viewport][2]
+
+    def expand(self, order, starts, count, kept=None):
+        """
+        Expand the given (sorted) paths into segments and return the
+        indices of the start and end vertices of each segment, with
+        the number of segments of each path.
+
+        Parameters
+        ----------
+        order : np.ndarray
+            Indices of the paths to expand
+        starts : np.ndarray
+            Offsets of paths in (kept) vertices
+        count : int
+            Number of (kept) vertices
+        kept : np.ndarray | None
+            Indices of kept vertices (None if all are kept)
+
+        Returns
+        -------
+        (np.ndarray, np.ndarray, np.ndarray)
+            Start and end vertex of each segment and number of
+            segments per path
+        """
 
+        lengths = np.diff(np.append(starts, count))
+        counts = np.maximum(lengths[order] - 1, 0)
+        offsets = np.zeros(len(order), dtype=np.int64)
+        np.cumsum(counts[:-1], out=offsets[1:])
+        first = np.repeat(starts[order] - offsets, counts) + np.arange(counts.sum())
+        if kept is not None:
+            return kept[first], kept[first+1], counts
+        return first, first+1, counts
+
+    def eval_styles(self, count):
+        """
+        Return the style key of each path, combining its line style,
+        cap and join as `style*16 + cap*4 + join`.
+
+        Parameters
+        ----------
+        count : int
+            Number of paths
+        """
+
+        styles = self.eval_variable("line_styles").reshape(-1).astype(np.int64)
+        caps = self.eval_variable("line_caps").reshape(-1).astype(np.int64)
+        joins = self.eval_variable("line_joins").reshape(-1).astype(np.int64)
+
+        # Start and end caps (per visual or per item), only start cap is used
+        if len(caps) != count and len(caps) in (2, 2*count):
+            caps = caps[::2]
+        return np.broadcast_to(styles*16 + caps*4 + joins, (count,))
+
+    def set_style(self, collection, key):
+        """
+        Set line style, cap and join of *collection* from a style *key*.
+
+        Parameters
+        ----------
+        collection : LineCollection
+            Collection to style
+        key : int
+            Style key (see `eval_styles`)
+        """
+
+        style, cap, join = key // 16, (key // 4) % 4, key % 4
+        collection.set_linestyle(LINESTYLES[style])
+        collection.set_capstyle(LINECAPS[cap])
+        collection.set_joinstyle(LINEJOINS[join])
+
+    def render_groups(self, viewport, keys, paths, depth, attributes):
+        """
+        Render paths (or segments) as groups sharing a same style, cap
+        and join. Each group is a collection and items keep their
+        drawing order inside each group.
+
+        Parameters
+        ----------
+        viewport : Viewport
+            Viewport where to render the visual
+        keys : np.ndarray
+            Style key of items in drawing order
+        paths : np.ndarray
+            Paths of items in drawing order (object array)
+        depth : np.ndarray
+            Depth of items in drawing order
+        attributes : list
+            List of (attribute, value, order, variable) where value is
+            indexed through order (when not None) for each item
+        """
+
+        n = len(keys)
+        groups, inverse = np.unique(keys, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        if len(groups) < 2**16:
+            inverse = inverse.astype(np.uint16)
+        members = np.argsort(inverse, kind="stable")
+        bounds = np.zeros(len(groups)+1, dtype=np.int64)
+        np.cumsum(np.bincount(inverse, minlength=len(groups)), out=bounds[1:])
+
+        collections = self._groups.setdefault(viewport, {})
+        for collection in collections.values():
+            collection.set_visible(False)
+        streams = []
+        for group, start, stop in zip(groups, bounds[:-1], bounds[1:]):
+            key = int(group)
+            if key not in collections:
+                collection = LineCollection([], clip_on=True, snap=False)
+                self.set_style(collection, key)
+                viewport._axes.add_collection(collection, autolim=False)
+                collections[key] = collection
+            collection = collections[key]
+            collection.set_visible(True)
+
+            items = members[start:stop]
+            Collection.set_paths(collection, paths[items].tolist())
+            for attribute, value, order, variable in attributes:
+                self.update_collection(viewport, collection, attribute, value,
+                                       items if order is None else order[items],
+                                       variable, attribute + ".%d" % key, n)
+            streams.append((collection, depth[items]))
+        self._streams[viewport] = self._fingerprints.get(viewport, None), streams
+
+    def streams(self, viewport):
+        """
+        Return the list of (collection, depth) of the last render on
+        *viewport*, with one entry per group of paths when they are
+        styled differently.
+
+        Parameters
+        ----------
+        viewport : Viewport
+            Viewport where the visual is rendered
+        """
+
+        fingerprint, streams = self._streams.get(viewport, (None, []))
+        if fingerprint is not None and fingerprint is self._fingerprints.get(viewport, None):
+            return streams
+        return Visual.streams(self, viewport)
+
+    @composited
     def render(self, viewport=None, model=None, view=None, proj=None):
         """
         Render the visual on viewport using the given model, view,
@@ -140,19 +476,8 @@ class Paths(Visual):
         """
 
         # We store the model/view/proj matrices for the resize_event below
-        if model is not None:
-            self._model = model
-        model = self._model
-
-        if view is not None:
-            self._view = view
-        view = self._view
+        transform = self.set_matrices(model, view, proj)
 
-        if proj is not None:
-            self._proj = proj
-        proj = self._proj
-
-        transform = proj @ view @ model
         self.set_variable("viewport", viewport)
 
         # Create the collection if necessary
@@ -164,72 +489,139 @@ class Paths(Visual):
             # This is necessary for measure transforms that need to be
             # kept up to date with canvas size
             canvas = viewport._canvas._figure.canvas
-            canvas.mpl_connect('resize_event', lambda event: self.render(viewport))
+            canvas.mpl_connect('resize_event', lambda event: self.resize(viewport))
+
+            # Decimated vertices depend on the visible range
+            viewport._axes.callbacks.connect('xlim_changed',
+                lambda axes: (self.get_variable("line_decimation") is not None
+                              and self.render(viewport)))
 
         collection = self._viewports[viewport]
+        if self.unchanged(viewport):
+            return
+
+        # Skip the visual entirely if it is outside the viewport
+        line_widths = self.eval_variable("line_widths")
+        margin = np.max(line_widths)/2 * viewport._canvas._dpi/72
+        if self.outside(viewport, transform, margin):
+            collection.set_visible(False)
+            for group in self._groups.get(viewport, {}).values():
+                group.set_visible(False)
+            self._compositor.clear(viewport)
+            return
+
         positions = self.eval_variable("positions")
         positions = positions.reshape(-1,3)
-        positions = glm.to_vec3(glm.to_vec4(positions) @ transform.T)
+        positions = self.project(viewport, positions, transform)
         positions = positions.reshape(-1,3)
 
-        indices = self.eval_variable("line_indices").reshape(-1,2)
-        paths = [positions[start:end+1] for (start,end) in indices]
-
         # We sort paths according to the mean depth of vertices composing the path
         # (we could used instead minimum or maximum depth among all the vertices)
-        depth = [-p[...,2].mean() for p in paths]
-        sort_indices = np.argsort(depth)
-
-        paths = [paths[i][...,:2] for i in sort_indices]
-        collection.set_paths(paths)
-        self.set_variable("screen", {"positions": positions})
-        self.set_variable("depth",  {"positions": positions[..., 2],
-                                     "paths": depth})
-
-
-        line_colors = self.eval_variable("line_colors")
-
-        # Several colors
-        if isinstance(line_colors, np.ndarray):
-            # Number of color == number of paths
-            if len(line_colors) == len(paths):
-                collection.set_edgecolors(line_colors[sort_indices])
-            # Number of colors == number of vertices
-            elif len(line_colors) == len(positions):
-                raise NotImplementedError("Per vertex line color is not available")
-            else:
-                collection.set_edgecolors(line_colors)
-        # Unique line color
+        gathered, offsets, lengths, vertices = self.split(viewport, positions)
+        count = len(offsets)
+        depth = self.workspace(viewport, "depth", (count,))
+        if count:
+            np.add.reduceat(gathered[:,2], offsets, out=depth)
+            np.divide(depth, -lengths, out=depth)
+        self.set_variable("screen", Provider(positions = positions))
+        self.set_variable("depth",  Provider(positions = positions[..., 2],
+                                             paths = depth))
+
+        # Cull paths whose vertices are all outside the same side of
+        # the viewport (taking line widths into account)
+        codes = self.outcodes(viewport, positions, margin)
+        if codes is not None and count:
+            codes = np.bitwise_and.reduceat(codes[vertices], offsets)
+        index = self.eval_index(None if codes is None else codes == 0)
+        if index is not None:
+            depth = depth[index]
+        sort_indices = self.sort(viewport, depth, index)
+
+        order = sort_indices if index is None else index[sort_indices]
+        decimation = self.get_variable("line_decimation")
+        if decimation not in (None, "m4"):
+            raise ValueError(f"Unknown line decimation mode ({decimation})")
+        kept, starts = None, offsets
+        if decimation == "m4":
+            kept, starts = self.decimate(viewport, gathered, offsets)
+
+        grouping = self.get_variable("grouping")
+        if grouping not in ("groups", "merged"):
+            raise ValueError(f"Unknown grouping mode ({grouping})")
+        styles = self.eval_styles(count)
+
+        # Colors (vec4) and widths (scalar) are given per path or per
+        # vertex depending on their length (per path first). A single
+        # color is made 2d such that its components are not mistaken
+        # for per item values.
+        line_colors = np.atleast_2d(self.eval_variable("line_colors"))
+        per_path, per_vertex = [], []
+        for value, ndim in ((line_colors, 2), (line_widths, 1)):
+            items = isinstance(value, np.ndarray) and value.ndim == ndim
+            per_path.append(items and len(value) == count)
+            per_vertex.append(items and not per_path[-1] and len(value) == len(positions))
+
+        # Per vertex colors or widths: paths are expanded into segments
+        # whose values are interpolated at segment midpoints
+        if any(per_vertex):
+            start, end, counts = self.expand(order, starts,
+                len(gathered) if kept is None else len(kept), kept)
+            segments = self.workspace(viewport, "segments", (len(start),2,2), np.float64)
+            segments[:,0] = gathered[start,:2]
+            segments[:,1] = gathered[end,:2]
+            views = self._segments.get(viewport, None)
+            if (views is None or views[0] != segments.ctypes.data
+                or len(views[1]) != len(segments)):
+                views = segments.ctypes.data, np.fromiter(
+                    (Path(V) for V in segments), dtype=object, count=len(segments))
+                self._segments[viewport] = views
+            paths = views[1]
+            attributes = []
+            for attribute, value, path, vertex in (
+                    ("edgecolors", line_colors, per_path[0], per_vertex[0]),
+                    ("linewidths", line_widths, per_path[1], per_vertex[1])):
+                if vertex:
+                    value = (value[vertices[start]] + value[vertices[end]]) / 2
+                elif path:
+                    value = np.repeat(value[order], counts, axis=0)
+                attributes.append((attribute, value, None, None))
+            keys = np.repeat(styles[order], counts)
+            depth = np.repeat(depth[sort_indices], counts)
+
+        # Sorted paths are taken from the persistent views
         else:
-            collection.set_edgecolors(line_colors)
-
-
-        line_widths = self.eval_variable("line_widths")
-
-        # Several line_widths
-        if isinstance(line_widths, np.ndarray):
-            # Number of widths == number of paths
-            if len(line_widths) == len(paths):
-                collection.set_linewidths(line_widths[sort_indices])
-            # Number of colors == number of vertices
-            elif len(line_widths) == len(positions):
-                raise NotImplementedError("Per vertex line widths is not available")
+            paths = self.views(viewport, gathered, kept, starts)[order]
+            attributes = [
+                ("edgecolors", self.select(line_colors, count, index)
+                 if per_path[0] else line_colors, sort_indices, "line_colors"),
+                ("linewidths", self.select(line_widths, count, index)
+                 if per_path[1] else line_widths, sort_indices, "line_widths")]
+            keys = styles[order]
+            depth = depth[sort_indices]
+
+        # Paths with different styles are rendered as groups
+        if len(keys) and np.any(keys != keys[0]):
+            collection.set_visible(False)
+            self.render_groups(viewport, keys, paths, depth, attributes)
+            if grouping == "merged":
+                if viewport in self._composited:
+                    self._compositor.clear(viewport)
+                else:
+                    self._compositor.composite(viewport)
             else:
-                collection.set_linewidths(line_widths)
-        # Unique line width
-        else:
-            collection.set_linewidths(line_widths)
-
-
-        if isinstance(line_widths, np.ndarray):
-            # Number of caps == number of paths
-            if len(line_widths) == len(paths):
-                collection.set_linewidths(line_widths[sort_indices])
-            # Number of colors == number of vertices
-            elif len(line_widths) == len(positions):
-                raise NotImplementedError("Per vertex line widths is not available")
-            else:
-                collection.set_linewidths(line_widths)
-        # Unique line width
-        else:
-            collection.set_linewidths(line_widths)
+                self._compositor.clear(viewport)
+            return
+        for group in self._groups.get(viewport, {}).values():
+            group.set_visible(False)
+        self._compositor.clear(viewport)
+
+        collection.set_visible(True)
+        if len(keys):
+            self.set_style(collection, int(keys[0]))
+        # LineCollection.set_paths is set_segments that would build new
+        # Path objects from vertices (about 2.5s for 500k paths) while
+        # paths are persistent views that only need to be bound (10ms).
+        Collection.set_paths(collection, paths.tolist())
+        for attribute, value, items, variable in attributes:
+            self.update_collection(viewport, collection, attribute, value,
+                                   items, variable)
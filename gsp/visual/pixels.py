@@ -4,6 +4,8 @@
 import numpy as np
 from gsp import glm
 from gsp.visual import Visual
+from gsp.visual.visual import composited
+from gsp.visual.provider import Provider
 from gsp.core import Viewport, Buffer, Color
 
 
@@ -16,6 +18,9 @@ class Pixels(Visual):
         Even with antialias off, marker coverage leaks on neighbouring pixels if the position is not an exact divider of viewport size (in pixels). Vertices coordinates could be rounded at time of rendering but it is easier to set a very small size whose coverage is more or less guaranteed to be one pixel. However, this size seems to be wrong on Windows, depending on the screen size.
     """
 
+    # Items are vertices (see `Visual.eval_index`)
+    __decimation__ = True
+
     def __init__(self, positions,
                        colors  = Color(0,0,0,1)):
         """
@@ -34,6 +39,7 @@ class Pixels(Visual):
         self.set_variable("positions", positions)
         self.set_variable("colors", colors)
 
+    @composited
     def render(self, viewport, model=None, view=None, proj=None):
         """
         Render the visual on *viewport* using the given *model*,
@@ -52,19 +58,8 @@ class Pixels(Visual):
         """
 
         # We store the model/view/proj matrices for the resize_event below
-        if model is not None:
-            self._model = model
-        model = self._model
-
-        if view is not None:
-            self._view = view
-        view = self._view
-
-        if proj is not None:
-            self._proj = proj
-        proj = self._proj
+        transform = self.set_matrices(model, view, proj)
 
-        transform = proj @ view @ model
         self.set_variable("viewport", viewport)
 
 
@@ -81,13 +76,35 @@ class Pixels(Visual):
             # kept up to date with canvas size
             canvas = viewport._canvas._figure.canvas
             canvas.mpl_connect('resize_event',
-                               lambda event: self.render(viewport))
+                               lambda event: self.resize(viewport))
 
         collection = self._viewports[viewport]
+        if self.unchanged(viewport):
+            return
+
+        # Skip the visual entirely if it is outside the viewport
+        if self.outside(viewport, transform, 1):
+            collection.set_visible(False)
+            return
+        collection.set_visible(True)
+
         positions = self.eval_variable("positions")
         positions = positions.reshape(-1,3)
-        positions = glm.to_vec3(glm.to_vec4(positions) @ transform.T)
-        collection.set_offsets(positions[:,:2])
-        colors = self.eval_variable("colors")
+        positions = self.project(viewport, positions, transform)
+        self.set_variable("screen", Provider(positions = positions))
+        self.set_variable("depth",  Provider(
+            positions = lambda P=positions: -P[:,2]))
+
+        # Cull pixels outside the viewport and apply optional
+        # decimation (level of detail)
+        count = len(positions)
+        codes = self.outcodes(viewport, positions, 1)
+        index = self.eval_index(None if codes is None else codes == 0)
+        if index is not None:
+            positions = positions[index]
+
+        self.update_collection(viewport, collection, "offsets",
+                               positions[:,:2])
+        colors = self.select(self.eval_variable("colors"), count, index)
         if colors is not None:
-            collection.set_facecolors(colors)
+            self.update_collection(viewport, collection, "facecolors", colors)
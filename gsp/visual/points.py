@@ -4,6 +4,8 @@
 import numpy as np
 from gsp import glm
 from gsp.visual import Visual
+from gsp.visual.visual import composited
+from gsp.visual.provider import Provider
 from gsp.core import Viewport, Buffer, Color, Measure
 
 
@@ -15,6 +17,9 @@ class Points(Visual):
     any transform.
     """
 
+    # Items are vertices (see `Visual.eval_index`)
+    __decimation__ = True
+
     def __init__(self, positions,
                        sizes = 25.0,
                        fill_colors = Color(0,0,0,1),
@@ -47,6 +52,7 @@ class Points(Visual):
         self.set_variable("line_widths", line_widths)
 
 
+    @composited
     def render(self, viewport=None, model=None, view=None, proj=None):
         """
         Render the visual on *viewport* using the given *model*,
@@ -65,19 +71,8 @@ class Points(Visual):
         """
 
         # We store the model/view/proj matrices for the resize_event below
-        if model is not None:
-            self._model = model
-        model = self._model
-
-        if view is not None:
-            self._view = view
-        view = self._view
-
-        if proj is not None:
-            self._proj = proj
-        proj = self._proj
+        transform = self.set_matrices(model, view, proj)
 
-        transform = proj @ view @ model
         self.set_variable("viewport", viewport)
 
         # Create the collection if necessary
@@ -92,40 +87,56 @@ class Points(Visual):
             # kept up to date with canvas size
             canvas = viewport._canvas._figure.canvas
             canvas.mpl_connect('resize_event',
-                               lambda event: self.render(viewport))
+                               lambda event: self.resize(viewport))
 
         collection = self._viewports[viewport]
-        positions = self.eval_variable("positions")
-        positions = positions.reshape(-1,3)
-        positions = glm.to_vec3(glm.to_vec4(positions) @ transform.T)
-        depth = -positions[:,2]
-
-        sort_indices = np.argsort(depth)
-        positions = positions[sort_indices]
-        collection.set_offsets(positions[:,:2])
-        self.set_variable("screen", {"positions": positions})
-        self.set_variable("depth",  {"positions": depth})
-
-        fill_colors = self.eval_variable("fill_colors")
-        if isinstance(fill_colors, np.ndarray) and (len(fill_colors) == len(positions)):
-            collection.set_facecolors(fill_colors[sort_indices])
-        else:
-            collection.set_facecolors(fill_colors)
-
-        line_colors = self.eval_variable("line_colors")
-        if isinstance(line_colors, np.ndarray) and (len(line_colors) == len(positions)):
-            collection.set_edgecolors(line_colors[sort_indices])
-        else:
-            collection.set_edgecolors(line_colors)
+        if self.unchanged(viewport):
+            return
 
+        # Skip the visual entirely if it is outside the viewport
+        # (taking the extent of points into account)
+        sizes = self.eval_variable("sizes")
         line_widths = self.eval_variable("line_widths")
-        if isinstance(line_widths, np.ndarray) and (len(line_widths) == len(positions)):
-            collection.set_linewidths(line_widths[sort_indices])
-        else:
-            collection.set_linewidths(line_widths)
+        margin = (np.sqrt(np.max(sizes)) + np.max(line_widths))/2
+        margin = margin*viewport._canvas._dpi/72
+        if self.outside(viewport, transform, margin):
+            collection.set_visible(False)
+            return
+        collection.set_visible(True)
 
-        sizes = self.eval_variable("sizes")
-        if isinstance(sizes, np.ndarray) and (len(sizes) == len(positions)):
-            collection.set_sizes(sizes[sort_indices])
-        else:
-            collection.set_sizes(sizes)
+        positions = self.eval_variable("positions")
+        positions = positions.reshape(-1,3)
+        positions = self.project(viewport, positions, transform)
+        depth = self.workspace(viewport, "depth", (len(positions),))
+        np.negative(positions[:,2], out=depth)
+        self.set_variable("screen", Provider(positions = positions))
+        self.set_variable("depth",  Provider(positions = depth))
+
+        # Cull points outside the viewport and apply optional
+        # decimation (level of detail)
+        count = len(positions)
+        codes = self.outcodes(viewport, positions, margin)
+        index = self.eval_index(None if codes is None else codes == 0)
+        if index is not None:
+            positions = positions[index]
+            depth = depth[index]
+
+        sort_indices = self.sort(viewport, depth, index)
+        self.update_collection(viewport, collection, "offsets",
+                               positions[:,:2], sort_indices)
+
+        fill_colors = self.select(self.eval_variable("fill_colors"), count, index)
+        self.update_collection(viewport, collection, "facecolors",
+                               fill_colors, sort_indices, "fill_colors")
+
+        line_colors = self.select(self.eval_variable("line_colors"), count, index)
+        self.update_collection(viewport, collection, "edgecolors",
+                               line_colors, sort_indices, "line_colors")
+
+        line_widths = self.select(line_widths, count, index)
+        self.update_collection(viewport, collection, "linewidths",
+                               line_widths, sort_indices, "line_widths")
+
+        sizes = self.select(sizes, count, index)
+        self.update_collection(viewport, collection, "sizes",
+                               sizes, sort_indices, "sizes")
@@ -0,0 +1,59 @@
+# Package: Graphic Server Protocol / Matplotlib
+# Authors: Nicolas P .Rougier <nicolas.rougier@inria.fr>
+# License: BSD 3 clause
+
+class Provider:
+    """
+    A provider is a read-only mapping whose values are computed just
+    in time, on first access. It is used by visuals to expose screen
+    and depth buffers to JIT transforms (Screen, Depth) without
+    computing buffers that are never read.
+
+    Examples
+    --------
+
+    ```pycon
+    >>> provider = Provider(positions = P, faces = lambda: P[F])
+    >>> "faces" in provider
+    True
+    >>> faces = provider["faces"] # Computed now
+    ```
+    """
+
+    def __init__(self, **values):
+        """
+        Parameters
+        ----------
+        values : dict
+            Values or functions (without argument) computing values
+        """
+
+        self._functions = {}
+        self._values = {}
+        for key, value in values.items():
+            if callable(value):
+                self._functions[key] = value
+            else:
+                self._values[key] = value
+
+    def keys(self):
+        """
+        Name of provided buffers
+        """
+
+        return self._values.keys() | self._functions.keys()
+
+    def computed(self, key):
+        """
+        Indicate whether buffer *key* has already been computed
+        """
+
+        return key in self._values
+
+    def __contains__(self, key):
+        return key in self._values or key in self._functions
+
+    def __getitem__(self, key):
+        if key not in self._values:
+            self._values[key] = self._functions.pop(key)()
+        return self._values[key]
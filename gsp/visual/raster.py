@@ -0,0 +1,98 @@
+# Package: Graphic Server Protocol / Matplotlib
+# Authors: Nicolas P .Rougier <nicolas.rougier@inria.fr>
+# License: BSD 3 clause
+"""
+Vectorized z-buffer rasterization of flat shaded triangles. Each
+triangle is expanded into the fragments (pixels) of its bounding box
+whose center is inside the triangle. Fragments are processed by
+batches of triangles and, for each pixel, the nearest fragment is
+kept if it is nearer than the current content of the depth buffer.
+"""
+import numpy as np
+
+
+def rasterize(vertices, depth, colors, image, zbuffer, batch=2**22):
+    """
+    Rasterize triangles into *image* and *zbuffer* (that are
+    cleared first). Pixel (i,j) covers [i,i+1]×[j,j+1] and is
+    considered inside a triangle if its center is.
+
+    Parameters
+    ----------
+    vertices : np.ndarray
+        Triangles vertices in pixel coordinates (n,3,2)
+    depth : np.ndarray
+        Triangles vertices depth, smaller is nearer (n,3)
+    colors : np.ndarray
+        Triangles colors (n,4)
+    image : np.ndarray
+        Output color buffer (height,width,4)
+    zbuffer : np.ndarray
+        Output depth buffer (height,width)
+    batch : int
+        Maximum number of fragments processed at once (approximative)
+    """
+
+    height, width = zbuffer.shape
+    zbuffer[...] = np.inf
+    image[...] = 0
+    if not len(vertices):
+        return image, zbuffer
+
+    x, y = vertices[...,0], vertices[...,1]
+    x0 = np.maximum(np.ceil(x.min(axis=1) - 0.5), 0).astype(np.int64)
+    x1 = np.minimum(np.floor(x.max(axis=1) - 0.5), width-1).astype(np.int64)
+    y0 = np.maximum(np.ceil(y.min(axis=1) - 0.5), 0).astype(np.int64)
+    y1 = np.minimum(np.floor(y.max(axis=1) - 0.5), height-1).astype(np.int64)
+    cols = np.maximum(x1 - x0 + 1, 0)
+    rows = np.maximum(y1 - y0 + 1, 0)
+
+    # Twice the signed area, degenerated triangles are discarded
+    area = ((x[:,1]-x[:,0])*(y[:,2]-y[:,0]) - (x[:,2]-x[:,0])*(y[:,1]-y[:,0]))
+    sizes = np.where(area != 0, cols*rows, 0)
+    triangles = np.flatnonzero(sizes)
+    if not len(triangles):
+        return image, zbuffer
+
+    # Batches of consecutive triangles with about *batch* fragments
+    ends = np.cumsum(sizes[triangles])
+    splits = np.searchsorted(ends, np.arange(batch, ends[-1], batch), side="right")
+    flat_z = zbuffer.reshape(-1)
+    flat_image = image.reshape(-1, 4)
+    for T in np.split(triangles, np.unique(splits)):
+        if not len(T):
+            continue
+
+        # Fragments of the bounding boxes
+        S = sizes[T]
+        tri = np.repeat(np.arange(len(T)), S)
+        local = np.arange(S.sum()) - np.repeat(np.cumsum(S) - S, S)
+        C = cols[T][tri]
+        px = x0[T][tri] + local % C
+        py = y0[T][tri] + local // C
+        cx, cy = px + 0.5, py + 0.5
+
+        # Barycentric coordinates of pixel centers
+        X, Y, A = x[T][tri], y[T][tri], area[T][tri]
+        w0 = ((X[:,1]-cx)*(Y[:,2]-cy) - (X[:,2]-cx)*(Y[:,1]-cy)) / A
+        w1 = ((X[:,2]-cx)*(Y[:,0]-cy) - (X[:,0]-cx)*(Y[:,2]-cy)) / A
+        w2 = 1 - w0 - w1
+        inside = (w0 >= 0) & (w1 >= 0) & (w2 >= 0)
+
+        tri, px, py = tri[inside], px[inside], py[inside]
+        Z = depth[T][tri]
+        z = w0[inside]*Z[:,0] + w1[inside]*Z[:,1] + w2[inside]*Z[:,2]
+
+        # Nearest fragment per pixel, then depth test
+        pixel = py*width + px
+        order = np.lexsort((z, pixel))
+        pixel, z, tri = pixel[order], z[order], tri[order]
+        first = np.ones(len(pixel), dtype=bool)
+        first[1:] = pixel[1:] != pixel[:-1]
+        pixel, z, tri = pixel[first], z[first], tri[first]
+        nearer = z < flat_z[pixel]
+        pixel = pixel[nearer]
+        flat_z[pixel] = z[nearer]
+        flat_image[pixel] = colors[T[tri[nearer]]]
+
+    return image, zbuffer
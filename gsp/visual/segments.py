@@ -2,11 +2,12 @@
 # Graphic Server Protocol (GSP)
 # Copyright 2023-2024 Vispy Development Team - BSD 2 Clauses licence
 # -----------------------------------------------------------------------------
-import glm
 import numpy as np
 from matplotlib.collections import LineCollection
 
 from gsp.visual import Visual
+from gsp.visual.visual import composited
+from gsp.visual.provider import Provider
 from gsp.core import Viewport, Buffer, Color, Measure
 from gsp.core import LineCap, LineJoin, LineStyle
 
@@ -47,6 +48,7 @@ class Segments(Visual):
         self.set_variable("line_widths", line_widths)
 
 
+    @composited
     def render(self, viewport=None, model=None, view=None, proj=None):
         """
         Render the visual on *viewport* using the given *model*,
@@ -65,19 +67,8 @@ class Segments(Visual):
         """
 
         # We store the model/view/proj matrices for the resize_event below
-        if model is not None:
-            self._model = model
-        model = self._model
+        transform = self.set_matrices(model, view, proj)
 
-        if view is not None:
-            self._view = view
-        view = self._view
-
-        if proj is not None:
-            self._proj = proj
-        proj = self._proj
-
-        transform = proj @ view @ model
         self.set_variable("viewport", viewport)
 
         # Create the collection if necessary
@@ -89,31 +80,51 @@ class Segments(Visual):
             # This is necessary for measure transforms that need to be
             # kept up to date with canvas size
             canvas = viewport._canvas._figure.canvas
-            canvas.mpl_connect('resize_event', lambda event: self.render(viewport))
+            canvas.mpl_connect('resize_event', lambda event: self.resize(viewport))
 
         collection = self._viewports[viewport]
+        if self.unchanged(viewport):
+            return
+
+        # Skip the visual entirely if it is outside the viewport
+        line_widths = self.eval_variable("line_widths")
+        margin = np.max(line_widths)/2 * viewport._canvas._dpi/72
+        if self.outside(viewport, transform, margin):
+            collection.set_visible(False)
+            return
+        collection.set_visible(True)
+
         positions = self.eval_variable("positions")
         positions = positions.reshape(-1,3)
-        positions = glm.to_vec3(glm.to_vec4(positions) @ transform.T)
+        positions = self.project(viewport, positions, transform)
         positions = positions.reshape(-1,2,3)
-
         depth = -positions[:,:,2].mean(axis=1)
-        sort_indices = np.argsort(depth)
-        positions = positions[sort_indices]
-        collection.set_segments(positions[...,:2])
-        self.set_variable("screen", {"positions": positions,
-                                     "segments": positions.mean(axis=1)})
-        self.set_variable("depth",  {"positions": positions[:2],
-                                     "segments" : depth})
-
-        line_colors = self.eval_variable("line_colors")
-        if isinstance(line_colors, np.ndarray) and (len(line_colors) == len(positions)):
-            collection.set_edgecolors(line_colors[sort_indices])
-        else:
-            collection.set_edgecolors(line_colors)
-
-        line_widths = self.eval_variable("line_widths")
-        if isinstance(line_widths, np.ndarray) and (len(line_widths) == len(positions)):
-            collection.set_linewidths(line_widths[sort_indices])
-        else:
-            collection.set_linewidths(line_widths)
+        self.set_variable("screen", Provider(
+            positions = positions,
+            segments = lambda P=positions: P.mean(axis=1)))
+        self.set_variable("depth",  Provider(
+            positions = lambda P=positions: -P[...,2],
+            segments = depth))
+
+        # Cull segments whose both ends are outside the same side of
+        # the viewport (taking line widths into account)
+        count = len(positions)
+        codes = self.outcodes(viewport, positions, margin)
+        if codes is not None:
+            codes = np.bitwise_and.reduce(codes, axis=1)
+        index = self.eval_index(None if codes is None else codes == 0)
+        if index is not None:
+            positions = positions[index]
+            depth = depth[index]
+
+        sort_indices = self.sort(viewport, depth, index)
+        self.update_collection(viewport, collection, "segments",
+                               positions[...,:2], sort_indices)
+
+        line_colors = self.select(self.eval_variable("line_colors"), count, index)
+        self.update_collection(viewport, collection, "edgecolors",
+                               line_colors, sort_indices, "line_colors")
+
+        line_widths = self.select(line_widths, count, index)
+        self.update_collection(viewport, collection, "linewidths",
+                               line_widths, sort_indices, "line_widths")
@@ -1,19 +1,169 @@
 # Package: Graphic Server Protocol / Matplotlib
 # Authors: Nicolas P .Rougier <nicolas.rougier@inria.fr>
 # License: BSD 3 clause
+import functools
 import numpy as np
 from gsp.core import Viewport, Buffer
 from gsp.transform import Transform
 
+
+def radix_argsort(values, precision=16):
+    """
+    Return the indices that sort *values* after quantization of their
+    range into 2**precision levels. Keys are sorted using a stable
+    radix sort (numpy uses a radix sort for the stable sort of 16
+    bits integers), hence in linear time. Values closer than the
+    quantization step, i.e. (max-min)/2**precision, may share a same
+    key in which case they keep their input order (stable). A radix
+    sort over more than 16 bits needs several passes and is slower
+    than a comparison sort such that for higher precisions, values
+    are sorted without quantization using a stable comparison sort.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        Values to sort (float)
+    precision : int
+        Number of bits of the quantized keys (at least 1, keys are
+        not quantized above 16)
+    """
+
+    if precision < 1:
+        raise ValueError(f"Precision must be at least 1 bit ({precision})")
+
+    values = np.asarray(values)
+    if precision > 16:
+        return np.argsort(values, kind="stable")
+    if len(values) < 2:
+        return np.arange(len(values))
+    vmin, vmax = values.min(), values.max()
+    if vmax <= vmin:
+        return np.arange(len(values))
+
+    # Quantization is made in double precision to avoid overflow
+    scale = (2.0**precision - 1) / (float(vmax) - float(vmin))
+    keys = (values - vmin).astype(np.float64)
+    keys *= scale
+    np.minimum(keys, 2.0**precision - 1, out=keys)
+    return np.argsort(keys.astype(np.uint16), kind="stable")
+
+
+def version(value):
+    """
+    Return the version of a tracked *value* (Data, Buffer, Transform
+    or any object with a version). Untracked values (e.g. numpy
+    arrays) have a None version.
+    """
+
+    if hasattr(value, "version"):
+        return value.version
+    return None
+
+
+def immutable(value):
+    """
+    Indicate whether *value* cannot be modified in place (None,
+    numbers, strings or tuples of such values).
+    """
+
+    if value is None or isinstance(value, (bool, int, float, complex, str, bytes, np.generic)):
+        return True
+    if isinstance(value, tuple):
+        return all(immutable(item) for item in value)
+    return False
+
+
+def tracked(value):
+    """
+    Indicate whether modifications of *value* are reflected by its
+    version, i.e. *value* is tracked (Data, Buffer), immutable or a
+    transform whose parameters are all tracked or immutable (setting
+    a parameter bumps the transform version). Numpy arrays and lists
+    are not tracked and neither are Data and Buffer modified through
+    their underlying array instead of `set_data`.
+    """
+
+    if isinstance(value, Transform):
+        return all(tracked(item) if hasattr(item, "version") else immutable(item)
+                   for item in vars(value).values())
+    if hasattr(value, "version"):
+        return True
+    if isinstance(value, (np.ndarray, list)):
+        return False
+    return True
+
+
+def composited(render):
+    """
+    Decorate the *render* method of a visual such that, when the
+    visual is managed by a compositor on the rendered viewport, the
+    compositor composites the visual again (which also hides the
+    collections of the visual). This is not done while the compositor
+    is itself rendering its visuals.
+    """
+
+    @functools.wraps(render)
+    def wrapper(self, viewport=None, *args, **kwargs):
+        result = render(self, viewport, *args, **kwargs)
+        compositor = self._composited.get(viewport, None)
+        if compositor is not None and not compositor._rendering:
+            compositor.composite(viewport)
+        return result
+    return wrapper
+
+
 class Visual:
+
+    # Variables that are set by the visual during rendering
+    __frame_variables__ = ("viewport", "screen", "depth")
+
+    # Whether items are single vertices (pixels, points, markers) such
+    # that the decimation variable, which selects vertices, applies
+    __decimation__ = False
+
     def __init__(self):
         """ Generic visual """
 
         self._variables = {}
         self._viewports = {}
-        self._model = np.eye(4)
-        self._view = np.eye(4)
-        self._proj = np.eye(4)
+
+        # Version of variables (incremented each time a variable is set)
+        # and fingerprint of last render on each viewport
+        self._version = 0
+        self._fingerprints = {}
+        self._counters = {"rendered": 0, "skipped": 0,
+                          "arena_allocations": 0, "arena_bytes": 0}
+        self._model = np.eye(4, dtype=np.float32)
+        self._view = np.eye(4, dtype=np.float32)
+        self._proj = np.eye(4, dtype=np.float32)
+
+        # Workspace arena: intermediate arrays (per viewport) reused
+        # across renders
+        self._workspace = {}
+
+        # Arrays and values bound to collections (per viewport)
+        self._collections = {}
+
+        # Compositor managing the visual (per viewport)
+        self._composited = {}
+
+        # Sorting mode can be None, "full", "coherent" or "radix". In
+        # coherent mode, previous order is reused when view direction
+        # changed by less than the given threshold (degrees). In radix
+        # mode, depth is quantized using the given precision (bits, up
+        # to 16, depth is sorted without quantization above).
+        self.set_variable("sorting", "coherent")
+        self.set_variable("sorting_threshold", 0.0)
+        self.set_variable("sorting_precision", 16)
+        self._sortings = {}
+        self._depths = {}
+
+        # Culling mode can be None, "viewport" or "frustum"
+        self.set_variable("culling", "viewport")
+
+        # Bounding volumes of positions and the key they were computed for
+        self._bounds = None
+        self._bounds_key = None
 
     def set_variable(self, name, value):
         """
@@ -27,6 +177,88 @@ class Visual:
             Value of the variable to store
         """
         self._variables[name] = value
+        if name not in self.__frame_variables__:
+            self._version += 1
+
+    def resize(self, viewport):
+        """
+        Render the visual again on *viewport* after a resize, unless
+        it is managed by a compositor that renders it.
+
+        Parameters
+        ----------
+        viewport : Viewport
+            Viewport where the visual is rendered
+        """
+
+        if viewport not in self._composited:
+            self.render(viewport)
+
+    @property
+    def counters(self):
+        """
+        Number of renders that have been made or skipped because
+        nothing changed since the previous render, and number of
+        arrays (and bytes) allocated in the workspace arena.
+
+        !!! Note
+
+            Arena counters only account for the growth of the arena.
+            Other temporaries (sort orders, index arrays, gathered
+            items, collection values) are still allocated on each
+            render and are not counted.
+        """
+
+        return dict(self._counters)
+
+    def fingerprint(self, viewport):
+        """
+        Return a key identifying everything a render on *viewport*
+        depends on: matrices, viewport geometry, variables and version
+        of tracked variables.
+
+        Parameters
+        ----------
+        viewport : Viewport
+            Viewport where the visual is rendered
+        """
+
+        key = [self._model.tobytes(), self._view.tobytes(), self._proj.tobytes(),
+               tuple(viewport.size), viewport.xlim, viewport.ylim,
+               viewport._canvas._dpi, self._version]
+        for name, value in self._variables.items():
+            if name not in self.__frame_variables__:
+                key.append(version(value))
+        return tuple(key)
+
+    def unchanged(self, viewport):
+        """
+        Indicate whether nothing changed since the last render on
+        *viewport*, in which case render can be skipped. Counters are
+        updated accordingly.
+
+        !!! Notes
+
+            In-place modification of numpy arrays cannot be detected
+            such that render is never skipped if a variable is not
+            tracked (see `tracked`). Use Data or Buffer objects to
+            benefit from skipped renders.
+
+        Parameters
+        ----------
+        viewport : Viewport
+            Viewport where the visual is rendered
+        """
+
+        fingerprint = self.fingerprint(viewport)
+        if (self._fingerprints.get(viewport, None) == fingerprint
+            and all(tracked(value) for name, value in self._variables.items()
+                    if name not in self.__frame_variables__)):
+            self._counters["skipped"] += 1
+            return True
+        self._fingerprints[viewport] = fingerprint
+        self._counters["rendered"] += 1
+        return False
 
     def get_variable(self, name):
         """
@@ -59,6 +291,455 @@ class Visual:
             value = np.asanyarray(value)
         return np.atleast_1d(value)
 
+    def set_matrices(self, model=None, view=None, proj=None):
+        """
+        Store the given *model*, *view* and *proj* matrices (such that
+        the visual can be rendered again without them, e.g. on resize)
+        and return the model-view-projection matrix (float32).
+
+        Parameters
+        ----------
+        model : mat4
+            Model matrix to use for rendering
+        view : mat4
+            View matrix to use for rendering
+        proj : mat4
+            Projection matrix to use for rendering
+        """
+
+        if model is not None:
+            self._model = np.asarray(model, dtype=np.float32)
+        if view is not None:
+            self._view = np.asarray(view, dtype=np.float32)
+        if proj is not None:
+            self._proj = np.asarray(proj, dtype=np.float32)
+        return self._proj @ self._view @ self._model
+
+    def workspace(self, viewport, name, shape, dtype=np.float32):
+        """
+        Return an array with the given *shape* and *dtype* from the
+        workspace arena of *viewport*. The array is a view of a buffer
+        that is only reallocated when it is too small, such that
+        steady renders do not grow the arena. Its content is undefined and
+        only valid until next request with the same *name*.
+
+        Parameters
+        ----------
+        viewport : Viewport
+            Viewport where the visual is rendered
+        name : str
+            Name of the array
+        shape : tuple
+            Shape of the array
+        dtype : np.dtype
+            Type of the array
+        """
+
+        dtype = np.dtype(dtype)
+        size = int(np.prod(shape))
+        key = viewport, name
+        buffer = self._workspace.get(key, None)
+        if buffer is None or buffer.dtype != dtype or buffer.size < size:
+            buffer = np.empty(size, dtype=dtype)
+            self._workspace[key] = buffer
+            self._counters["arena_allocations"] += 1
+            self._counters["arena_bytes"] += buffer.nbytes
+        return buffer[:size].reshape(shape)
+
+    def project(self, viewport, positions, transform, name="positions"):
+        """
+        Transform *positions* with the given *transform* and return
+        normalized device coordinates (float32). Homogeneous product
+        and perspective divide are made in place into an output buffer
+        of the workspace arena named after *name*. The result is thus
+        only valid until next projection.
+
+        Parameters
+        ----------
+        viewport : Viewport
+            Viewport where the visual is rendered
+        positions : np.ndarray
+            Positions to transform (vec3)
+        transform : mat4
+            Transform matrix (usually model-view-projection)
+        name : str
+            Name of the output buffer
+        """
+
+        positions = np.asarray(positions).reshape(-1,3)
+        transform = np.asarray(transform, dtype=np.float32)
+        count = len(positions)
+        if positions.dtype != np.float32:
+            source = self.workspace(viewport, name + ".source", (count,3))
+            np.copyto(source, positions, casting="same_kind")
+            positions = source
+        out = self.workspace(viewport, name, (count,3))
+        w = self.workspace(viewport, name + ".w", (count,1))
+
+        np.matmul(positions, transform[:3,:3].T, out=out)
+        out += transform[:3,3]
+        if (transform[3] != (0,0,0,1)).any():
+            np.matmul(positions, transform[3:,:3].T, out=w)
+            w += transform[3,3]
+            out /= w
+        return out
+
+    def outcodes(self, viewport, positions, margin=0):
+        """
+        Compute the clip codes of projected *positions*, one bit per
+        clipping plane (left, right, bottom, top, near, far), according
+        to the *culling* variable. A null code means the position is
+        inside. An item made of several vertices is outside if the
+        bitwise and of the codes of its vertices is not null, which is
+        a conservative test. Returns None if culling is disabled.
+
+        Parameters
+        ----------
+        viewport : Viewport
+            Viewport where the visual is rendered
+        positions : np.ndarray
+            Projected positions (vec3)
+        margin : float
+            Additional margin (pixels) around the viewport limits
+        """
+
+        culling = self._variables.get("culling", None)
+        if culling is None:
+            return None
+        if culling not in ("viewport", "frustum"):
+            raise ValueError(f"Unknown culling mode ({culling})")
+
+        xmin, xmax = viewport.xlim
+        ymin, ymax = viewport.ylim
+        if margin > 0:
+            width, height = viewport.size
+            dx = margin*(xmax - xmin)/width
+            dy = margin*(ymax - ymin)/height
+            xmin, xmax, ymin, ymax = xmin-dx, xmax+dx, ymin-dy, ymax+dy
+
+        x, y = positions[...,0], positions[...,1]
+        tests = [(np.less, x, xmin), (np.greater, x, xmax),
+                 (np.less, y, ymin), (np.greater, y, ymax)]
+        if culling == "frustum":
+            z = positions[...,2]
+            tests += [(np.less, z, -1), (np.greater, z, +1)]
+
+        codes = self.workspace(viewport, "codes", x.shape, np.uint8)
+        bits = self.workspace(viewport, "codes.bits", x.shape, np.bool_)
+        codes[...] = 0
+        for bit, (test, value, limit) in enumerate(tests):
+            test(value, limit, out=bits)
+            codes |= np.left_shift(bits.view(np.uint8), bit, out=bits.view(np.uint8))
+        return codes
+
+    def bounds(self, untracked=False):
+        """
+        Return the axis-aligned bounding box (as a (2,3) array of
+        minimum and maximum) and the bounding sphere (as a center and
+        a radius) of the visual positions in model coordinates, or
+        None if positions are empty. Bounds are only recomputed when
+        the version of positions changes. Untracked positions (e.g.
+        numpy arrays that may be modified in place) have no bounds
+        unless explicitly requested, in which case they are computed
+        each time.
+
+        Parameters
+        ----------
+        untracked : bool
+            Whether to compute bounds of untracked positions
+        """
+
+        value = self.get_variable("positions")
+        key = (id(value), version(value)) if tracked(value) else None
+        if key is None and not untracked:
+            return None
+        if key is None or key != self._bounds_key:
+            positions = self.eval_variable("positions").reshape(-1,3)
+            if len(positions):
+                box = np.array([positions.min(axis=0), positions.max(axis=0)])
+                center = box.mean(axis=0)
+                radius = np.sqrt(((positions - center)**2).sum(axis=1).max())
+                self._bounds = box, center, radius
+            else:
+                self._bounds = None
+            self._bounds_key = key
+        return self._bounds
+
+    def outside(self, viewport, transform, margin=0):
+        """
+        Indicate whether the visual is entirely outside the *viewport*
+        when rendered with the given *transform*, in which case no
+        item needs to be processed. The bounding sphere is used to
+        reject visuals behind the camera and the bounding box is
+        projected to test viewport (or frustum) limits. This test is
+        conservative and is only performed when culling is active and
+        positions are tracked (see `bounds`). Rejection behind the
+        camera only applies to perspective projections.
+
+        Parameters
+        ----------
+        viewport : Viewport
+            Viewport where the visual is rendered
+        transform : mat4
+            Model view projection matrix
+        margin : float
+            Additional margin (pixels) around the viewport limits
+        """
+
+        if self._variables.get("culling", None) is None:
+            return False
+
+        bounds = self.bounds()
+        if bounds is None:
+            return False
+        box, center, radius = bounds
+
+        # Bounding sphere entirely behind the camera (eye coordinates),
+        # geometry behind the eye is visible with an orthographic
+        # projection
+        if self._proj[3,3] == 0:
+            modelview = self._view @ self._model
+            scale = np.sqrt((modelview[:3,:3]**2).sum(axis=0)).max()
+            center = modelview @ np.append(center, 1)
+            if center[3] > 0 and center[2]/center[3] - radius*scale > 0:
+                return True
+
+        # Projected bounding box corners, we cannot conclude if a
+        # corner is on or behind the camera plane
+        corners = np.array([[box[i,0], box[j,1], box[k,2], 1]
+                            for i in (0,1) for j in (0,1) for k in (0,1)])
+        corners = corners @ np.asarray(transform).T
+        if (corners[:,3] <= 0).any():
+            return False
+        corners = corners[:,:3] / corners[:,3:]
+        codes = self.outcodes(viewport, corners, margin)
+        return np.bitwise_and.reduce(codes) != 0
+
+    def sort(self, viewport, depth, index=None):
+        """
+        Return the indices that sort the given *depth* of (selected)
+        items, according to the *sorting* variable. In coherent mode,
+        the order of the previous render on the same viewport is
+        applied to the new depth and a full sort is only made if the
+        set of items changed. If the result is not sorted, it is
+        sorted again using a stable sort that is fast on nearly sorted
+        data. Sorting can also be skipped if the view direction changed
+        by less than the *sorting_threshold* variable. In radix mode,
+        depth is quantized over its range using *sorting_precision*
+        bits (at most 16) and sorted in linear time, items whose depth
+        falls in a same quantization step keeping their relative
+        order (see `radix_argsort`).
+
+        Parameters
+        ----------
+        viewport : Viewport
+            Viewport where the visual is rendered
+        depth : np.ndarray
+            Depth of items to sort
+        index : np.ndarray | None
+            Indices of the selected items
+        """
+
+        mode = self._variables.get("sorting", None)
+        if mode is None:
+            order = np.arange(len(depth))
+        elif mode not in ("full", "coherent", "radix"):
+            raise ValueError(f"Unknown sorting mode ({mode})")
+        elif mode == "radix":
+            precision = self._variables.get("sorting_precision", 16)
+            order = radix_argsort(depth, precision)
+        else:
+            order = self.sort_depth(viewport, depth, index, mode)
+
+        # Depth in drawing order is kept for compositing, tagged with
+        # the fingerprint of the render
+        self._depths[viewport] = self._fingerprints.get(viewport, None), depth, order
+        return order
+
+    def sort_depth(self, viewport, depth, index, mode):
+        """
+        Return the indices that sort *depth* in "full" or "coherent"
+        *mode* (see `sort`).
+        """
+
+        # View direction (model coordinates)
+        modelview = self._view @ self._model
+        direction = modelview[2,:3] / np.linalg.norm(modelview[2,:3])
+
+        previous = self._sortings.get(viewport, None)
+        if mode == "coherent" and previous is not None:
+            previous_index, order, previous_direction = previous
+            if len(order) == len(depth) and (
+                (index is None and previous_index is None) or
+                (index is not None and previous_index is not None and
+                 np.array_equal(index, previous_index))):
+                threshold = self._variables.get("sorting_threshold", 0)
+                angle = np.degrees(np.arccos(np.clip(direction @ previous_direction, -1, 1)))
+                if threshold > 0 and angle < threshold:
+                    return order
+                sorted_depth = self.workspace(viewport, "sort.depth",
+                                              depth.shape, depth.dtype)
+                np.take(depth, order, out=sorted_depth, mode="clip")
+                ordered = self.workspace(viewport, "sort.ordered",
+                                         (max(len(depth)-1, 0),), np.bool_)
+                np.greater_equal(sorted_depth[1:], sorted_depth[:-1], out=ordered)
+                if not ordered.all():
+                    order = order[np.argsort(sorted_depth, kind="stable")]
+                self._sortings[viewport] = index, order, direction
+                return order
+
+        order = np.argsort(depth)
+        self._sortings[viewport] = index, order, direction
+        return order
+
+    def streams(self, viewport):
+        """
+        Return the list of (collection, depth) of the last render on
+        *viewport*, where depth is the depth of the collection items
+        in drawing order. The list is empty if the visual has not
+        been sorted during its last render (e.g. it was outside the
+        viewport).
+
+        Parameters
+        ----------
+        viewport : Viewport
+            Viewport where the visual is rendered
+        """
+
+        fingerprint, depth, order = self._depths.get(viewport, (None,)*3)
+        if fingerprint is None or fingerprint is not self._fingerprints.get(viewport, None):
+            return []
+        return [(self._viewports[viewport], depth[order])]
+
+    def update_collection(self, viewport, collection, attribute, value,
+                                order=None, variable=None, name=None, count=None):
+        """
+        Update *attribute* of *collection* with *value*, such that
+        the collection setter is only called when content changed.
+
+        Per item values (with *count* items, defaulting to the size
+        of *order*) are gathered in place into two persistent arrays
+        that are used alternately: the one bound to the collection
+        is never written and the other one receives new content that
+        is compared with the bound one. If the given *variable* is
+        directly bound to a tracked buffer whose version did not
+        change and the order is the same as for the last update, the
+        comparison is skipped. Other values are compared with the
+        last ones.
+
+        Parameters
+        ----------
+        viewport : Viewport
+            Viewport where the visual is rendered
+        collection : matplotlib.collections.Collection
+            Collection to update
+        attribute : str
+            Name of the attribute (e.g. "facecolors" for `set_facecolors`)
+        value : any
+            New value
+        order : np.ndarray | None
+            Order of items
+        variable : str | None
+            Name of the variable the value comes from
+        name : str | None
+            Name under which the value is stored (default to
+            *attribute*), needed when a visual owns several
+            collections on a same viewport
+        count : int | None
+            Number of items of per item values
+        """
+
+        setter = getattr(collection, "set_" + attribute)
+        name = name or attribute
+        key = viewport, name
+        stored = self._collections.get(key, None)
+
+        tracked = None
+        if variable is not None:
+            item = self._variables.get(variable, None)
+            if hasattr(item, "version") and not isinstance(item, Transform):
+                tracked = item.version, order
+
+        if count is None and order is not None:
+            count = len(order)
+        if (order is not None and isinstance(value, np.ndarray)
+            and value.ndim > 0 and len(value) == count):
+            if (tracked is not None and stored is not None and stored[0] == "items"
+                and stored[3] is not None and stored[3][0] == tracked[0]
+                and stored[3][1] is tracked[1]):
+                return
+            shape = (len(order),) + value.shape[1:]
+            if (stored is None or stored[0] != "items"
+                or stored[1].shape != shape or stored[1].dtype != value.dtype):
+                bound, scratch = None, np.empty(shape, dtype=value.dtype)
+            else:
+                bound, scratch = stored[1], stored[2]
+            np.take(value, order, axis=0, out=scratch, mode="clip")
+            equal = self.workspace(viewport, name + ".equal", shape, np.bool_)
+            if bound is not None and np.equal(bound, scratch, out=equal).all():
+                self._collections[key] = "items", bound, scratch, tracked
+                return
+            setter(scratch)
+            if bound is None:
+                bound = np.empty(shape, dtype=value.dtype)
+            self._collections[key] = "items", scratch, bound, tracked
+        else:
+            if stored is not None and stored[0] == "value":
+                try:
+                    if np.array_equal(stored[1], value):
+                        return
+                except (TypeError, ValueError):
+                    pass
+            setter(value)
+            self._collections[key] = "value", np.copy(value)
+
+    def eval_index(self, mask=None):
+        """
+        Combine the visibility *mask* with the optional *decimation*
+        variable and return the (sorted) indices of the items to
+        render, or None if all items are to be rendered. The index is
+        not exposed to transforms such that per item values (e.g.
+        colormap normalization) do not depend on visibility and are
+        restricted afterwards (see `select`). Decimation selects
+        vertices and is only supported by visuals whose items are
+        vertices.
+
+        Parameters
+        ----------
+        mask : np.ndarray | None
+            Visibility mask of items (bool)
+        """
+
+        index = None
+        if mask is not None and not mask.all():
+            index = np.flatnonzero(mask)
+        if self._variables.get("decimation", None) is not None:
+            if not self.__decimation__:
+                raise ValueError(f"Decimation is not supported ({type(self).__name__})")
+            index = self.eval_variable("decimation")
+            if mask is not None:
+                index = index[mask[index]]
+        return index
+
+    def select(self, value, count, index=None):
+        """
+        Restrict a per item *value* to the given *index*.
+
+        Parameters
+        ----------
+        value : any
+            Evaluated variable
+        count : int
+            Number of items before selection
+        index : np.ndarray | None
+            Indices of the selected items
+        """
+
+        if (index is not None and isinstance(value, np.ndarray)
+            and len(value) == count and len(value) != len(index)):
+            return value[index]
+        return value
+
     def render(self, viewport, transform = None):
         """Render the visual on *viewport* using the given *transform*.
 
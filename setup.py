@@ -1,7 +1,22 @@
 # Package: Graphic Server Protocol / Matplotlib
 # Authors: Nicolas P .Rougier <nicolas.rougier@inria.fr>
 # License: BSD 3 clause
-from distutils.core import setup
+import os
+import sys
+import subprocess
+from setuptools import setup
+from setuptools.command.build_py import build_py
+
+
+class build_atlas(build_py):
+    """ Build the package and compile the atlas of builtin markers. """
+
+    def run(self):
+        build_py.run(self)
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "build_atlas.py")
+        filename = os.path.join(self.build_lib, "gsp", "core", "markers.npz")
+        if not self.dry_run:
+            subprocess.check_call([sys.executable, script, filename])
 
 setup(
     name = 'GSP',
@@ -9,6 +24,7 @@ setup(
     description = "Graphic Server Protocol",
     author = "Nicolas P. Rougier",
     author_email = "nicolas.rougier@inria.fr",
+    cmdclass = { "build_py": build_atlas },
     packages = [ "gsp",
                  "gsp.core",
                  "gsp.visual",
@@ -0,0 +1,16 @@
+# Package: Graphic Server Protocol / Matplotlib
+# Authors: Nicolas P .Rougier <nicolas.rougier@inria.fr>
+# License: BSD 3 clause
+import matplotlib
+matplotlib.use("Agg")
+
+import pytest
+import matplotlib.pyplot as plt
+from gsp import core
+
+
+@pytest.fixture
+def viewport():
+    canvas = core.Canvas(256, 256, 100)
+    yield core.Viewport(canvas)
+    plt.close("all")
@@ -0,0 +1,31 @@
+# Package: Graphic Server Protocol / Matplotlib
+# Authors: Nicolas P .Rougier <nicolas.rougier@inria.fr>
+# License: BSD 3 clause
+import numpy as np
+from gsp.transform import X
+from gsp.transform.accessor import _as_slice, _gather
+
+
+def test_as_slice_contiguous():
+    assert _as_slice(np.arange(3, 8)) == slice(3, 8)
+    assert _as_slice(range(2, 10, 2)) == slice(2, 10, 2)
+    assert _as_slice(np.array([0, 2, 3])) is None
+
+
+def test_as_slice_empty():
+    buffer = np.arange(10)
+    for index in (range(0, -1), range(5, 3), range(0), np.zeros(0, int)):
+        assert len(_gather(buffer, index)) == 0
+
+
+def test_as_slice_negative_step():
+    buffer = np.arange(10)
+    assert (_gather(buffer, range(5, 0, -1)) == [5, 4, 3, 2, 1]).all()
+
+
+def test_accessor_index():
+    P = np.random.uniform(-1, 1, (100, 3))
+    index = np.array([1, 5, 7])
+    assert (X(P).evaluate({"index": index}) == P[index, 0]).all()
+    assert (X(P).evaluate({"index": range(10, 20)}) == P[10:20, 0]).all()
+    assert np.shares_memory(X(P).evaluate({"index": range(10, 20)}), P)
@@ -0,0 +1,46 @@
+# Package: Graphic Server Protocol / Matplotlib
+# Authors: Nicolas P .Rougier <nicolas.rougier@inria.fr>
+# License: BSD 3 clause
+import os
+import numpy as np
+from gsp.core import atlas, svg, Marker
+
+
+def test_compile(tmp_path):
+    filename = str(tmp_path / "markers.npz")
+    atlas.compile(Marker.__sources__, filename)
+    paths = atlas.read(filename, Marker.__sources__)
+    assert sorted(paths) == sorted(Marker.__sources__)
+    for key, path in paths.items():
+        reference = svg.svg_to_path(Marker.__sources__[key])
+        assert np.allclose(path.vertices, reference.vertices)
+
+    # Markers whose source differs are not read from the atlas
+    sources = dict(Marker.__sources__)
+    sources[1] = "M0 0 L1 1"
+    assert 1 not in atlas.read(filename, sources)
+
+
+def test_load(tmp_path):
+    sources = {1: "M0 0 L1 1 L1 0 Z", 2: "M0 0 L2 1"}
+    paths = atlas.load(sources)
+    assert np.allclose(paths[2].vertices, svg.svg_to_path(sources[2]).vertices)
+    atlas.load(sources, str(tmp_path))
+    assert len(os.listdir(tmp_path)) == 1
+    cached = atlas.load(sources, str(tmp_path))
+    assert np.allclose(cached[1].vertices, paths[1].vertices)
+
+
+def test_compile_on_first_load(tmp_path, monkeypatch):
+    filename = str(tmp_path / "markers.npz")
+    monkeypatch.setattr(atlas, "filename", filename)
+    monkeypatch.setattr(Marker, "__paths__", None)
+    path = Marker.path(Marker.heart)
+    reference = svg.svg_to_path(Marker.__sources__[int(Marker.heart)])
+    assert np.allclose(path.vertices, reference.vertices)
+    assert sorted(atlas.read(filename, Marker.__sources__)) == sorted(int(m) for m in Marker)
+
+    # Read-only locations are silently ignored
+    monkeypatch.setattr(atlas, "filename", str(tmp_path / "missing" / "markers.npz"))
+    monkeypatch.setattr(Marker, "__paths__", None)
+    assert np.allclose(Marker.path(Marker.heart).vertices, reference.vertices)
@@ -0,0 +1,88 @@
+# Package: Graphic Server Protocol / Matplotlib
+# Authors: Nicolas P .Rougier <nicolas.rougier@inria.fr>
+# License: BSD 3 clause
+import numpy as np
+from gsp import core, visual, glm
+from gsp.visual import Visual
+
+
+class Collection:
+    """ Collection recording the values it is given """
+
+    def __init__(self):
+        self.values = []
+
+    def set_colors(self, value):
+        self.values.append(value)
+
+
+def buffer(P):
+    P = np.asarray(P, dtype=np.float32)
+    data = core.Data(nbytes=P.nbytes)
+    data.set_data(0, P.tobytes())
+    return core.Buffer(P.size, np.dtype(np.float32), data, 0)
+
+
+def test_items_are_only_set_when_changed():
+    vis, collection = Visual(), Collection()
+    colors = np.random.default_rng(1).uniform(0, 1, (10, 4))
+    order = np.arange(10)[::-1]
+    vis.update_collection("viewport", collection, "colors", colors, order)
+    assert len(collection.values) == 1
+    assert np.array_equal(collection.values[0], colors[order])
+    vis.update_collection("viewport", collection, "colors", colors.copy(), order.copy())
+    assert len(collection.values) == 1
+    vis.update_collection("viewport", collection, "colors", colors, np.arange(10))
+    assert len(collection.values) == 2
+
+
+def test_bound_array_is_never_written():
+    vis, collection = Visual(), Collection()
+    colors = np.random.default_rng(1).uniform(0, 1, (10, 4))
+    order = np.arange(10)
+    vis.update_collection("viewport", collection, "colors", colors, order)
+    bound = collection.values[0]
+    reference = bound.copy()
+    vis.update_collection("viewport", collection, "colors", 1 - colors, order)
+    assert collection.values[1] is not bound
+    assert np.array_equal(bound, reference)
+    # Arrays are used alternately
+    vis.update_collection("viewport", collection, "colors", colors, order)
+    assert collection.values[2] is bound
+    assert np.array_equal(bound, colors)
+
+
+def test_tracked_variable():
+    vis, collection = Visual(), Collection()
+    B = buffer(np.zeros(10))
+    vis.set_variable("colors", B)
+    order = np.arange(10)
+    vis.update_collection("viewport", collection, "colors", np.zeros(10), order, "colors")
+    # Same version and order: content is not even compared
+    vis.update_collection("viewport", collection, "colors", np.ones(10), order, "colors")
+    assert len(collection.values) == 1
+    B.set_data(0, np.ones(10, np.float32).tobytes())
+    vis.update_collection("viewport", collection, "colors", np.ones(10), order, "colors")
+    assert len(collection.values) == 2
+
+
+def test_values_are_only_set_when_changed():
+    vis, collection = Visual(), Collection()
+    vis.update_collection("viewport", collection, "colors", (1, 0, 0, 1))
+    vis.update_collection("viewport", collection, "colors", (1, 0, 0, 1))
+    assert len(collection.values) == 1
+    vis.update_collection("viewport", collection, "colors", (0, 0, 0, 1))
+    assert len(collection.values) == 2
+
+
+def test_render_does_not_set_unchanged_colors(viewport, monkeypatch):
+    P = np.random.default_rng(1).uniform(-0.5, 0.5, (100, 3)).astype(np.float32)
+    points = visual.Points(P, 25, core.Color(1, 0, 0, 1))
+    points.render(viewport)
+    collection = points._viewports[viewport]
+    calls = []
+    setter = collection.set_facecolors
+    monkeypatch.setattr(collection, "set_facecolors",
+                        lambda value: (calls.append(value), setter(value)))
+    points.render(viewport, glm.zrotate(10))
+    assert not calls
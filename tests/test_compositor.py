@@ -0,0 +1,72 @@
+# Package: Graphic Server Protocol / Matplotlib
+# Authors: Nicolas P .Rougier <nicolas.rougier@inria.fr>
+# License: BSD 3 clause
+import numpy as np
+from matplotlib.backend_bases import ResizeEvent
+from gsp import visual, glm
+from gsp.visual.compositor import Compositor, merge
+
+
+def scene(viewport, n=100):
+    rng = np.random.default_rng(1)
+    P = rng.uniform(-1, 1, (n, 3)).astype(np.float32)
+    Q = rng.uniform(-1, 1, (n, 3)).astype(np.float32)
+    points = visual.Points(P, 25)
+    other = visual.Points(Q, 25)
+    compositor = Compositor(points, other)
+    compositor.render(viewport, np.eye(4),
+                      glm.translate((0, 0, -5)), glm.perspective(30, 1, 1, 100))
+    return compositor, (points, other)
+
+
+def parts(compositor, viewport):
+    return compositor._composites[viewport].parts
+
+
+def count(compositor, viewport):
+    return sum(len(part.get_offsets()) for part in parts(compositor, viewport))
+
+
+def visible(visuals, viewport):
+    return sum(len(points._viewports[viewport].get_offsets()) for points in visuals)
+
+
+def test_merge():
+    keys = [np.array([0, 2, 4]), np.array([1, 2, 3]), np.array([2, 5])]
+    source, items = merge(keys)
+    merged = np.array([keys[s][i] for s, i in zip(source, items)])
+    assert (merged == [0, 1, 2, 2, 2, 3, 4, 5]).all()
+    # Ties are resolved in favor of the first sequence
+    assert list(source[2:5]) == [0, 1, 2]
+
+
+def test_merge_empty():
+    source, items = merge([])
+    assert len(source) == len(items) == 0
+
+
+def test_composite(viewport):
+    compositor, visuals = scene(viewport)
+    assert count(compositor, viewport) == 200
+    for points in visuals:
+        assert not points._viewports[viewport].get_visible()
+        assert points._composited[viewport] is compositor
+
+
+def test_render_single_visual(viewport):
+    compositor, (points, other) = scene(viewport)
+    points.render(viewport, glm.zrotate(30))
+    assert not points._viewports[viewport].get_visible()
+    assert count(compositor, viewport) == visible((points, other), viewport)
+
+
+def test_resize(viewport):
+    compositor, visuals = scene(viewport)
+    previous = parts(compositor, viewport)
+    canvas = viewport._axes.get_figure().canvas
+    viewport._axes.get_figure().set_size_inches(3, 2)
+    ResizeEvent("resize_event", canvas)._process()
+    assert parts(compositor, viewport) is not previous
+    assert count(compositor, viewport) == 200
+    for points in visuals:
+        assert not points._viewports[viewport].get_visible()
@@ -0,0 +1,89 @@
+# Package: Graphic Server Protocol / Matplotlib
+# Authors: Nicolas P .Rougier <nicolas.rougier@inria.fr>
+# License: BSD 3 clause
+import numpy as np
+from gsp import core, visual, transform, glm
+
+
+def positions(n=1000, seed=1):
+    P = np.random.default_rng(seed).uniform(-1, 1, (n, 3))
+    P[0] = -1, 0, 0
+    return P.astype(np.float32)
+
+
+def colors(points, viewport):
+    collection = points._viewports[viewport]
+    offsets = collection.get_offsets()
+    return { tuple(np.round(offset, 6)): tuple(color)
+             for offset, color in zip(offsets, collection.get_facecolors()) }
+
+
+def test_viewport_culling(viewport):
+    points = visual.Points(positions(), 25)
+    viewport._axes.set_xlim(-0.5, 0.5)
+    points.render(viewport)
+    offsets = points._viewports[viewport].get_offsets()
+    assert 0 < len(offsets) < 1000
+    assert (np.abs(offsets[:,0]) <= 0.5 + 0.1).all()
+
+    points.set_variable("culling", None)
+    points.render(viewport)
+    assert len(points._viewports[viewport].get_offsets()) == 1000
+
+
+def test_colormap_does_not_depend_on_culling(viewport):
+    P = positions()
+    points = visual.Points(P, 25, transform.Colormap("magma")(transform.X(P)))
+    points.set_variable("culling", None)
+    points.render(viewport)
+    reference = colors(points, viewport)
+
+    viewport._axes.set_xlim(-1.05, -0.5)
+    points.set_variable("culling", "viewport")
+    points.render(viewport)
+    culled = colors(points, viewport)
+    assert 0 < len(culled) < len(reference)
+    for offset, color in culled.items():
+        assert np.allclose(color, reference[offset])
+
+
+def test_outside_visual_is_hidden(viewport):
+    points = visual.Points(tracked(positions() + [10, 0, 0]), 25)
+    points.render(viewport)
+    assert not points._viewports[viewport].get_visible()
+
+
+def tracked(P):
+    P = np.asarray(P, dtype=np.float32)
+    data = core.Data(nbytes=P.nbytes)
+    data.set_data(0, P.tobytes())
+    return core.Buffer(P.size, np.dtype(np.float32), data, 0)
+
+
+def test_untracked_positions_have_no_bounds(viewport):
+    P = positions()
+    points = visual.Points(P, 25)
+    assert points.bounds() is None
+    points.render(viewport)
+    P += 10
+    points.render(viewport)
+    assert not points.outside(viewport, np.eye(4))
+
+    points = visual.Points(tracked(positions()), 25)
+    box, center, radius = points.bounds()
+    assert np.allclose(box, [[-1, -1, -1], [1, 1, 1]], atol=0.05)
+
+
+def test_behind_camera_rejection_is_perspective_only(viewport):
+    P = tracked(positions() + [0, 0, 5])
+    points = visual.Points(P, 25)
+    view = np.eye(4)
+    view[2,3] = 0.5
+    proj = glm.perspective(35, 1, 1, 100)
+    transform = points.set_matrices(np.eye(4), view, proj)
+    assert points.outside(viewport, transform)
+
+    ortho = np.eye(4)
+    ortho[2,2] = -0.01
+    transform = points.set_matrices(np.eye(4), view, ortho)
+    assert not points.outside(viewport, transform)
@@ -0,0 +1,73 @@
+# Package: Graphic Server Protocol / Matplotlib
+# Authors: Nicolas P .Rougier <nicolas.rougier@inria.fr>
+# License: BSD 3 clause
+import numpy as np
+import pytest
+from gsp import visual, transform
+from gsp.visual.provider import Provider
+
+
+def decimate(viewport, positions, depth, **kwargs):
+    viewport._axes.set_xlim(-1, 1)
+    viewport._axes.set_ylim(-1, 1)
+    buffers = {"viewport": viewport,
+               "screen": Provider(positions=np.asarray(positions, np.float32)),
+               "depth": Provider(positions=np.asarray(depth, np.float32))}
+    return transform.Decimate(**kwargs).evaluate(buffers)
+
+
+def test_nearest_per_bin(viewport):
+    # Three items in a same bin, one in another bin
+    P = [(0.5, 0.5, 0), (0.5, 0.5, 0), (0.5, 0.5, 0), (-0.5, -0.5, 0)]
+    index = decimate(viewport, P, [0.1, 0.3, 0.2, 0.0], size=4)
+    assert list(index) == [1, 3]
+    index = decimate(viewport, P, [0.1, 0.3, 0.2, 0.0], size=4, count=2)
+    assert list(index) == [1, 2, 3]
+
+
+def test_priority(viewport):
+    P = [(0.5, 0.5, 0), (0.5, 0.5, 0)]
+    index = decimate(viewport, P, [0.1, 0.3], size=4,
+                     priority=np.array([2.0, 1.0]))
+    assert list(index) == [0]
+
+
+def test_outside(viewport):
+    P = [(0, 0, 0), (2, 0, 0), (0, -1.5, 0)]
+    index = decimate(viewport, P, [0, 0, 0], size=4)
+    assert list(index) == [0]
+
+
+def test_bins(viewport):
+    # One item per bin of a regular grid of 8×8 pixels
+    rng = np.random.default_rng(1)
+    P = rng.uniform(-1, 1, (10000, 3))
+    index = decimate(viewport, P, P[:,2], size=8)
+    assert (np.diff(index) > 0).all()
+    width, height = viewport.size
+    x = ((P[index,0] + 1)/2*np.ceil(width/8)).astype(int)
+    y = ((P[index,1] + 1)/2*np.ceil(height/8)).astype(int)
+    bins = y*1000 + x
+    assert len(np.unique(bins)) == len(bins)
+
+
+def test_points(viewport):
+    rng = np.random.default_rng(1)
+    P = rng.uniform(-1, 1, (10000, 3)).astype(np.float32)
+    points = visual.Points(P, 4)
+    points.set_variable("decimation", transform.Decimate(count=1, size=16))
+    points.render(viewport)
+    count = len(points._viewports[viewport].get_offsets())
+    assert 0 < count < 10000
+
+
+def test_items_are_not_vertices(viewport):
+    P = np.random.default_rng(1).uniform(-1, 1, (100, 3)).astype(np.float32)
+    segments = visual.Segments(P.reshape(-1, 2, 3))
+    segments.set_variable("decimation", transform.Decimate())
+    with pytest.raises(ValueError):
+        segments.render(viewport)
+    paths = visual.Paths(P, np.array([[0, 49], [50, 99]]))
+    paths.set_variable("decimation", transform.Decimate())
+    with pytest.raises(ValueError):
+        paths.render(viewport)
@@ -0,0 +1,16 @@
+# Package: Graphic Server Protocol / Matplotlib
+# Authors: Nicolas P .Rougier <nicolas.rougier@inria.fr>
+# License: BSD 3 clause
+import os
+from gsp.core import diskcache
+
+
+def test_eviction(tmp_path):
+    for i, name in enumerate(["lod-a.npz", "markers-b.npz", "c.gspmesh", "other.txt"]):
+        (tmp_path / name).write_bytes(b"\0"*100)
+        os.utime(tmp_path / name, (i, i))
+    diskcache.evict(str(tmp_path), 250)
+    assert sorted(os.listdir(tmp_path)) == ["c.gspmesh", "markers-b.npz", "other.txt"]
+    diskcache.touch(str(tmp_path / "markers-b.npz"))
+    diskcache.evict(str(tmp_path), 100)
+    assert sorted(os.listdir(tmp_path)) == ["markers-b.npz", "other.txt"]
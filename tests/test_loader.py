@@ -0,0 +1,141 @@
+# Package: Graphic Server Protocol / Matplotlib
+# Authors: Nicolas P .Rougier <nicolas.rougier@inria.fr>
+# License: BSD 3 clause
+import os
+import struct
+import numpy as np
+import pytest
+from gsp.core import loader, diskcache, Data
+
+P = np.array([(0,0,0), (1,0,0), (1,1,0), (0,1,0), (0,0,1)], float)
+T = np.array([(0,1,2), (0,2,3), (1,2,4)])
+
+
+def test_obj(tmp_path):
+    filename = tmp_path / "mesh.obj"
+    filename.write_text("# comment\n"
+                        + "".join("v %g %g %g\n" % tuple(p) for p in P)
+                        + "vn 0 0 1\r\nvt 0 0\n"
+                        + "f 1/1/1 2/1/1 3/1/1 4/1/1\n"
+                        + "f -4//1 -3//1 -1//1\n")
+    V, F, N = loader.read_obj(str(filename))
+    assert np.allclose(V, P)
+    assert F.tolist() == T.tolist()
+
+
+def test_obj_vertex_widths(tmp_path):
+    # Vertices with an optional w or colors
+    filename = tmp_path / "mesh.obj"
+    filename.write_text("v 0 0 0\nv 1 0 0 1\nv 1 1 0 1 0 0\n"
+                        "v 0 1 0\nv 0 0 1 1\nf 1 2 3 4\nf 2 3 5\n")
+    V, F, N = loader.read_obj(str(filename))
+    assert np.allclose(V, P)
+    assert F.tolist() == T.tolist()
+
+    filename.write_text("v 0 0 0\nv 1 0\nf 1 2 1\n")
+    with pytest.raises(ValueError):
+        loader.read_obj(str(filename))
+
+
+def test_ply(tmp_path):
+    header = ("ply\nformat %s 1.0\nelement vertex 5\nproperty float x\n"
+              "property float y\nproperty float z\nelement face 2\n"
+              "property list uchar int vertex_indices\nend_header\n")
+    filename = tmp_path / "ascii.ply"
+    filename.write_text(header % "ascii"
+                        + "".join("%g %g %g\n" % tuple(p) for p in P)
+                        + "4 0 1 2 3\n3 1 2 4\n")
+    V, F, N = loader.read_ply(str(filename))
+    assert np.allclose(V, P) and F.tolist() == T.tolist()
+
+    filename = tmp_path / "binary.ply"
+    with open(filename, "wb") as file:
+        file.write((header % "binary_little_endian").encode())
+        file.write(P.astype("<f4").tobytes())
+        file.write(struct.pack("<B4i", 4, 0, 1, 2, 3))
+        file.write(struct.pack("<B3i", 3, 1, 2, 4))
+    V, F, N = loader.read_ply(str(filename))
+    assert np.allclose(V, P) and F.tolist() == T.tolist()
+
+
+def test_stl(tmp_path):
+    filename = tmp_path / "binary.stl"
+    with open(filename, "wb") as file:
+        file.write(b"\0"*80 + struct.pack("<I", len(T)))
+        for t in T:
+            file.write(struct.pack("<3f", 0, 0, 0) + P[t].astype("<f4").tobytes() + b"\0\0")
+    V, F, N = loader.read_stl(str(filename))
+    assert np.allclose(V[F], P[T])
+
+    filename = tmp_path / "ascii.stl"
+    with open(filename, "w") as file:
+        file.write("solid mesh\n")
+        for t in T:
+            file.write("facet normal 0 0 0\n outer loop\n"
+                       + "".join("  vertex %g %g %g\n" % tuple(P[i]) for i in t)
+                       + " endloop\nendfacet\n")
+        file.write("endsolid mesh\n")
+    V, F, N = loader.read_stl(str(filename))
+    assert np.allclose(V[F], P[T])
+
+
+def write(directory):
+    filename = directory / "mesh.obj"
+    filename.write_text("".join("v %g %g %g\n" % tuple(p) for p in P)
+                        + "".join("f %d %d %d\n" % tuple(t+1) for t in T))
+    return str(filename)
+
+
+def test_mesh_without_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(diskcache, "directory", None)
+    filename = write(tmp_path)
+    positions, faces = loader.mesh(filename)
+    assert np.allclose(np.asarray(positions).reshape(-1,3), P)
+    assert np.array_equal(np.asarray(faces).reshape(-1,3), T)
+    assert positions._data._uri is None
+    # Nothing is written next to the source
+    assert os.listdir(tmp_path) == ["mesh.obj"]
+
+
+def test_mesh_cache_disabled(tmp_path, monkeypatch):
+    monkeypatch.setattr(diskcache, "directory", str(tmp_path / "cache"))
+    filename = write(tmp_path)
+    positions, faces = loader.mesh(filename, cache=False)
+    assert positions._data._uri is None
+    assert os.listdir(tmp_path) == ["mesh.obj"]
+    positions, faces = loader.mesh(filename)
+    assert positions._data._uri is not None
+    assert len(os.listdir(tmp_path / "cache")) == 1
+
+
+def test_mesh_cache(tmp_path):
+    source, cache = tmp_path / "source", tmp_path / "cache"
+    source.mkdir()
+    filename = write(source)
+    positions, faces, normals = loader.mesh(filename, cache=str(cache), normals=True)
+    assert normals is None
+    assert len(os.listdir(cache)) == 1 and os.listdir(source) == ["mesh.obj"]
+
+    # Sidecar is mapped without parsing the source again
+    sidecar = cache / os.listdir(cache)[0]
+    os.utime(sidecar, (0, 0))
+    positions, faces = loader.mesh(filename, cache=str(cache))
+    assert positions._data._uri == str(sidecar)
+    assert np.allclose(np.asarray(positions).reshape(-1,3), P)
+    assert np.array_equal(np.asarray(faces).reshape(-1,3), T)
+    assert os.stat(sidecar).st_mtime > 0
+
+
+def test_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        loader.mesh(str(tmp_path / "mesh.xyz"))
+
+
+
+def test_data_file_size(tmp_path):
+    filename = tmp_path / "data.bin"
+    filename.write_bytes(P.astype(np.float32).tobytes())
+    data = Data(str(filename))
+    assert np.allclose(np.asarray(data).view(np.float32).reshape(-1,3), P)
+    filename.write_bytes(b"")
+    assert len(np.asarray(Data(str(filename)))) == 0
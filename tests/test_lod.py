@@ -0,0 +1,70 @@
+# Package: Graphic Server Protocol / Matplotlib
+# Authors: Nicolas P .Rougier <nicolas.rougier@inria.fr>
+# License: BSD 3 clause
+import os
+import numpy as np
+from gsp import visual
+from gsp.visual import lod
+
+
+def sphere(n=64):
+    t, p = np.meshgrid(np.linspace(0, np.pi, n),
+                       np.linspace(0, 2*np.pi, 2*n, endpoint=False), indexing="ij")
+    V = np.stack([np.sin(t)*np.cos(p), np.sin(t)*np.sin(p), np.cos(t)], -1)
+    I = np.arange(n*2*n).reshape(n, 2*n)
+    J = np.roll(I, -1, 1)
+    F = np.concatenate([np.stack([I[:-1], I[1:], J[1:]], -1).reshape(-1,3),
+                        np.stack([I[:-1], J[1:], J[:-1]], -1).reshape(-1,3)])
+    return V.reshape(-1,3).astype(np.float32), F
+
+
+def test_cluster():
+    V, F = sphere()
+    P, I, face_map = lod.cluster(V, F, 8)
+    assert len(I) < len(F) and len(P) < len(V)
+    assert len(face_map) == len(I)
+    # No degenerate faces and merged vertices stay close to the surface
+    assert (I[:,0] != I[:,1]).all() and (I[:,1] != I[:,2]).all() and (I[:,0] != I[:,2]).all()
+    assert np.allclose(np.linalg.norm(P, axis=1), 1, atol=0.25)
+
+
+def test_pyramid():
+    V, F = sphere()
+    levels = lod.pyramid(V, F, minimum=64)
+    assert levels[0][2] is None and len(levels[0][1]) == len(F)
+    sizes = [len(I) for P, I, face_map in levels]
+    assert sizes == sorted(sizes, reverse=True) and len(set(sizes)) == len(sizes)
+    assert sizes[-1] >= 64
+    for P, I, face_map in levels[1:]:
+        assert (face_map >= 0).all() and (face_map < len(F)).all()
+
+
+def test_pyramid_cache(tmp_path):
+    V, F = sphere()
+    levels = lod.pyramid(V, F, cache=str(tmp_path))
+    assert len(os.listdir(tmp_path)) == 1
+    cached = lod.pyramid(V, F, cache=str(tmp_path))
+    assert len(cached) == len(levels)
+    for (P0, I0, M0), (P1, I1, M1) in zip(levels[1:], cached[1:]):
+        assert np.array_equal(P0, P1) and np.array_equal(I0, I1) and np.array_equal(M0, M1)
+
+
+def test_select():
+    V, F = sphere()
+    levels = lod.pyramid(V, F, minimum=64)
+    assert lod.select(levels, len(F)) == 0
+    assert lod.select(levels, 0) == len(levels) - 1
+    i = lod.select(levels, len(F) // 2)
+    assert len(levels[i][1]) <= len(F) // 2 < len(levels[i-1][1])
+
+
+def test_untracked_levels_are_refreshed(viewport):
+    V, F = sphere()
+    mesh = visual.Mesh(V, F)
+    mesh.set_variable("lod_budget", len(F) // 2)
+    mesh.set_variable("lod_cache", None)
+    mesh.render(viewport)
+    P = mesh._pyramid[1][1][0].copy()
+    V *= 0.5
+    mesh.render(viewport)
+    assert np.allclose(mesh._pyramid[1][1][0], 0.5*P, atol=1e-6)
@@ -0,0 +1,130 @@
+# Package: Graphic Server Protocol / Matplotlib
+# Authors: Nicolas P .Rougier <nicolas.rougier@inria.fr>
+# License: BSD 3 clause
+import numpy as np
+import matplotlib as mpl
+import pytest
+from gsp import core, visual, glm
+
+
+def reference(mtype, angle, axis=None):
+    """ Per marker path (one marker at a time) """
+
+    marker = mpl.markers.MarkerStyle(core.Marker.path(mtype))
+    path = marker.get_path().transformed(marker.get_transform())
+    transform = np.asarray(glm.zrotate(angle), dtype=np.float64)[:3,:3]
+    if axis is not None:
+        # Rotation of z onto axis around z × axis
+        a = np.asarray(axis, dtype=np.float64)
+        a = a / np.linalg.norm(a)
+        k = np.cross((0, 0, 1), a)
+        sin, cos = np.linalg.norm(k), a[2]
+        K = np.zeros((3,3))
+        if sin > 0:
+            k = k / sin
+            K = np.array([[0, -k[2], k[1]], [k[2], 0, -k[0]], [-k[1], k[0], 0]])
+        R = np.eye(3) + sin*K + (1 - cos)*(K @ K)
+        transform = R @ transform
+    return path.vertices @ transform[:2,:2].T
+
+
+types = [core.Marker.heart, core.Marker.club, core.Marker.star, core.Marker.arrow]
+
+@pytest.mark.parametrize("axis", [None, "single", "individual"])
+def test_generate_markers(axis):
+    rng = np.random.default_rng(1)
+    n = len(types)
+    P = rng.uniform(-1, 1, (n, 3)).astype(np.float32)
+    A = rng.uniform(0, 360, n).astype(np.float32)
+    if axis == "single":
+        axis = np.array([(1, 1, 1)], np.float32)
+    elif axis == "individual":
+        axis = rng.uniform(-1, 1, (n, 3)).astype(np.float32)
+    T = np.array(types, np.float32)
+    markers = visual.Markers(P, T, 25, axis, A)
+    markers.generate_markers(P)
+    for i in range(n):
+        a = None if axis is None else axis[i % len(axis)]
+        assert np.allclose(markers.paths[i].vertices, reference(T[i], A[i], a), atol=1e-5)
+
+
+def test_generate_markers_shared():
+    P = np.zeros((10, 3), np.float32)
+    markers = visual.Markers(P, core.Marker.heart, 25, None, 30.0)
+    markers.generate_markers(P)
+    assert len(markers.paths) == 1
+    assert np.allclose(markers.paths[0].vertices,
+                       reference(core.Marker.heart, 30.0), atol=1e-5)
+
+
+def test_untracked_types_and_angles(viewport):
+    P = np.zeros((2, 3), np.float32)
+    T = np.array([core.Marker.heart, core.Marker.club], np.float32)
+    A = np.zeros(2, np.float32)
+    markers = visual.Markers(P, T, 25, None, A)
+    markers.render(viewport)
+    A[0] = 90
+    T[1] = core.Marker.spade
+    markers.render(viewport)
+    assert np.allclose(markers.paths[0].vertices,
+                       reference(core.Marker.heart, 90), atol=1e-5)
+    assert np.allclose(markers.paths[1].vertices,
+                       reference(core.Marker.spade, 0), atol=1e-5)
+
+
+def batch(viewport, batching):
+    # Alpha identifies markers and depths are distinct
+    n = 12
+    P = np.zeros((n, 3), np.float32)
+    P[:,0] = np.linspace(-0.9, 0.9, n)
+    P[:,2] = np.random.default_rng(1).permutation(n)/n - 0.5
+    T = np.array([core.Marker.heart, core.Marker.club]*(n//2), np.float32)
+    A = np.array([0, 0, 0.4, 90]*(n//4), np.float32)
+    C = np.zeros((n, 4), np.float32)
+    C[:,3] = np.arange(1, n+1)/n
+    markers = visual.Markers(P, T, 25, None, A, C)
+    markers.set_variable("batching", batching)
+    markers.render(viewport)
+    return markers, T, A
+
+
+def identifiers(collection):
+    return list(np.round(collection.get_facecolors()[:,3]*12).astype(int) - 1)
+
+
+def test_batching_groups(viewport):
+    markers, T, A = batch(viewport, None)
+    order = identifiers(markers._viewports[viewport])
+
+    markers.set_variable("batching", "groups")
+    markers.render(viewport)
+    assert not markers._viewports[viewport].get_visible()
+    groups = {key: collection for key, collection in markers._groups[viewport].items()
+              if collection.get_visible()}
+    # Angles are quantized (0.4 → 0)
+    assert set(groups) == {(int(core.Marker.heart), 0.0),
+                           (int(core.Marker.club), 0.0),
+                           (int(core.Marker.club), 90.0)}
+    for (mtype, angle), collection in groups.items():
+        items = identifiers(collection)
+        assert all(T[i] == mtype and round(A[i]) == angle for i in items)
+        # Items keep the depth order inside their group
+        assert items == [i for i in order if i in items]
+    assert sum(len(c.get_offsets()) for c in groups.values()) == 12
+
+
+def test_batching_merged(viewport):
+    markers, T, A = batch(viewport, None)
+    order = identifiers(markers._viewports[viewport])
+
+    markers.set_variable("batching", "merged")
+    markers.render(viewport)
+    parts = markers._compositor._composites[viewport].parts
+    assert len(parts) > 3
+    assert sum((identifiers(part) for part in parts), []) == order
+    for collection in markers._groups[viewport].values():
+        assert not collection.get_visible()
+
+    markers.set_variable("batching", "groups")
+    markers.render(viewport)
+    assert not markers._compositor._composites[viewport].parts
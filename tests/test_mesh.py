@@ -0,0 +1,87 @@
+# Package: Graphic Server Protocol / Matplotlib
+# Authors: Nicolas P .Rougier <nicolas.rougier@inria.fr>
+# License: BSD 3 clause
+import numpy as np
+import pytest
+from gsp import core, visual, glm
+
+
+def sphere(count, seed=1):
+    rng = np.random.default_rng(seed)
+    V = rng.normal(0, 1, (count, 3))
+    V /= np.linalg.norm(V, axis=1)[:,None]
+    F = rng.integers(0, count, (count, 3))
+    return V.astype(np.float32), F
+
+
+def render(mesh, viewport, angle=0):
+    mesh.render(viewport, glm.yrotate(angle), glm.translate((0, 0, -5)),
+                glm.perspective(30, 1, 1, 100))
+
+
+def test_arena_does_not_grow(viewport):
+    mesh = visual.Mesh(*sphere(1000), None, core.Color(1,1,1,1),
+                       core.Color(0,0,0,1), 0.25)
+    for angle in range(5):
+        render(mesh, viewport, angle)
+    counters = mesh.counters
+    assert counters["arena_allocations"] > 0
+    for angle in range(5, 25):
+        render(mesh, viewport, angle)
+    assert mesh.counters["rendered"] == counters["rendered"] + 20
+    assert mesh.counters["arena_allocations"] == counters["arena_allocations"]
+    assert mesh.counters["arena_bytes"] == counters["arena_bytes"]
+
+
+def triangles():
+    # Counter-clockwise triangle on the left, clockwise on the right
+    V = np.array([(-0.9, 0, 0), (-0.5, 0, 0), (-0.7, 0.5, 0),
+                  ( 0.5, 0, 0), ( 0.7, 0.5, 0), ( 0.9, 0, 0)], np.float32)
+    return V, np.arange(6).reshape(2, 3)
+
+
+def test_face_culling(viewport):
+    mesh = visual.Mesh(*triangles())
+    mesh.render(viewport)
+    assert len(mesh._viewports[viewport].get_paths()) == 2
+
+    mesh.set_variable("face_culling", "back")
+    mesh.render(viewport)
+    paths = mesh._viewports[viewport].get_paths()
+    assert len(paths) == 1 and (paths[0].vertices[:,0] < 0).all()
+
+    mesh.set_variable("face_culling", "front")
+    mesh.render(viewport)
+    paths = mesh._viewports[viewport].get_paths()
+    assert len(paths) == 1 and (paths[0].vertices[:,0] > 0).all()
+
+
+def test_face_culling_unknown(viewport):
+    mesh = visual.Mesh(*triangles())
+    mesh.set_variable("face_culling", "both")
+    with pytest.raises(ValueError):
+        mesh.render(viewport)
+
+
+def test_merge_faces(viewport):
+    # Three small faces in a same pixel, one in another pixel and
+    # a large face
+    def face(x, y, z, size=0.001):
+        return [(x, y, z), (x+size, y, z), (x, y+size, z)]
+    V = np.array(face(0.1, 0.1, 0.3) + face(0.1, 0.1, -0.2) +
+                 face(0.1, 0.1, 0.1) + face(-0.5, -0.5, 0.0) +
+                 face(0.5, 0.5, 0.0, 0.25), np.float32)
+    F = np.arange(15).reshape(5, 3)
+    # Alpha identifies faces
+    colors = np.zeros((5, 4))
+    colors[:,3] = np.linspace(0.1, 0.5, 5)
+    mesh = visual.Mesh(V, F, None, colors)
+    mesh.set_variable("face_threshold", 1)
+    mesh.render(viewport)
+    facecolors = mesh._viewports[viewport].get_facecolors()
+    # Nearest face (smallest depth) of the pixel is kept
+    assert sorted(np.round(facecolors[:,3], 1)) == [0.2, 0.4, 0.5]
+
+    mesh.set_variable("face_threshold", 0)
+    mesh.render(viewport)
+    assert len(mesh._viewports[viewport].get_paths()) == 5
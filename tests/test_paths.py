@@ -0,0 +1,205 @@
+# Package: Graphic Server Protocol / Matplotlib
+# Authors: Nicolas P .Rougier <nicolas.rougier@inria.fr>
+# License: BSD 3 clause
+import numpy as np
+import pytest
+from gsp import core, visual
+
+
+def line(n=10):
+    P = np.zeros((n, 3), np.float32)
+    P[:,0] = np.linspace(-0.9, 0.9, n)
+    return P
+
+
+def lengths(paths, viewport):
+    collection = paths._viewports[viewport]
+    return [len(path.vertices) for path in collection.get_paths()]
+
+
+def test_untracked_line_indices(viewport):
+    I = np.array([[0, 4], [5, 9]])
+    paths = visual.Paths(line(), I)
+    paths.render(viewport)
+    assert sorted(lengths(paths, viewport)) == [5, 5]
+    views = paths._viewports[viewport].get_paths()
+    paths.render(viewport)
+    # Unchanged layout keeps the same views
+    assert all(a is b for a, b in zip(views, paths._viewports[viewport].get_paths()))
+
+    I[0,1], I[1,0] = 2, 3
+    paths.render(viewport)
+    assert sorted(lengths(paths, viewport)) == [3, 7]
+    vertices = np.concatenate([path.vertices for path in
+                               paths._viewports[viewport].get_paths()])
+    assert np.allclose(np.sort(vertices[:,0]), line()[:,0], atol=1e-6)
+
+
+def test_m4(viewport):
+    viewport._axes.set_xlim(-1, 1)
+    rng = np.random.default_rng(1)
+    n = 5000
+    P = np.zeros((n, 3))
+    P[:,0] = np.sort(rng.uniform(-1.1, 1.1, n))
+    P[:,1] = rng.uniform(-1, 1, n)
+    offsets = np.array([0, 1000, 1001, 3000])
+    paths = visual.Paths(P, np.array([[0, 999], [1000, 1000], [1001, 2999], [3000, 4999]]))
+    kept, starts = paths.decimate(viewport, P, offsets)
+    assert list(starts) == list(np.searchsorted(kept, offsets))
+
+    # Reference: first, last, min and max of each run of vertices of
+    # a same path falling in a same column
+    width = viewport.size[0]
+    columns = np.clip(np.floor((P[:,0] + 1) * width / 2), -1, width)
+    expected = set()
+    for start, stop in zip(offsets, list(offsets[1:]) + [n]):
+        for column in np.unique(columns[start:stop]):
+            run = start + np.flatnonzero(columns[start:stop] == column)
+            expected |= {run[0], run[-1],
+                         run[np.argmin(P[run,1])], run[np.argmax(P[run,1])]}
+    assert sorted(expected) == list(kept)
+
+
+def visible(paths, viewport, xmin, xmax):
+    V = np.concatenate([path.vertices for path in
+                        paths._viewports[viewport].get_paths()])
+    return ((V[:,0] >= xmin) & (V[:,0] <= xmax)).sum()
+
+
+def test_m4_xlim(viewport):
+    n = 20000
+    P = np.zeros((n, 3), np.float32)
+    P[:,0] = np.linspace(-1, 1, n)
+    P[:,1] = np.sin(np.linspace(0, 400*np.pi, n))/2
+    paths = visual.Paths(P, np.array([[0, n-1]]))
+    paths.set_variable("line_decimation", "m4")
+    viewport._axes.set_xlim(-1, 1)
+    paths.render(viewport)
+    assert sum(lengths(paths, viewport)) < n // 4
+    count = visible(paths, viewport, -0.1, 0.1)
+
+    # Zooming in recomputes decimated vertices
+    viewport._axes.set_xlim(-0.1, 0.1)
+    assert visible(paths, viewport, -0.1, 0.1) > 4*count
+
+    paths.set_variable("line_decimation", None)
+    paths.render(viewport)
+    assert sum(lengths(paths, viewport)) == n
+
+
+def test_m4_unknown(viewport):
+    paths = visual.Paths(line(), np.array([[0, 9]]))
+    paths.set_variable("line_decimation", "m5")
+    with pytest.raises(ValueError):
+        paths.render(viewport)
+
+
+def styled(viewport, n, I, colors, widths):
+    # Paths are drawn in reverse order (depth)
+    P = line(n)
+    P[:,2] = np.linspace(-0.5, 0.5, n)
+    paths = visual.Paths(P, np.array(I), colors, widths)
+    paths.render(viewport)
+    collection = paths._viewports[viewport]
+    starts = [path.vertices[0,0] for path in collection.get_paths()]
+    return (collection, np.searchsorted(P[:,0], np.array(starts) - 1e-6),
+            [len(path.vertices) for path in collection.get_paths()])
+
+
+@pytest.mark.parametrize("n, I", [(4, [[0, 3]]), (8, [[0, 1], [2, 3], [4, 5], [6, 7]])])
+def test_single_color_and_width(viewport, n, I):
+    # A single color has 4 components (as many as vertices or paths)
+    color = core.Color(1, 0, 0, 1)
+    collection, starts, sizes = styled(viewport, n, I, color, 2)
+    assert len(sizes) == len(I)
+    assert np.allclose(collection.get_edgecolors(), (1, 0, 0, 1))
+    assert np.allclose(collection.get_linewidths(), 2)
+
+
+def test_per_path_colors_and_widths(viewport):
+    I = [[0, 1], [2, 3], [4, 5], [6, 7]]
+    colors = np.array([(1,0,0,1), (0,1,0,1), (0,0,1,1), (1,1,0,1)], np.float32)
+    widths = np.array([1, 2, 3, 4], np.float32)
+    collection, starts, sizes = styled(viewport, 8, I, colors, widths)
+    paths = starts // 2
+    assert sizes == [2]*4
+    assert np.allclose(collection.get_edgecolors(), colors[paths])
+    assert np.allclose(collection.get_linewidths(), widths[paths])
+
+
+@pytest.mark.parametrize("n, I", [(4, [[0, 3]]), (8, [[0, 3], [4, 7]])])
+def test_per_vertex_colors_and_widths(viewport, n, I):
+    colors = np.zeros((n, 4), np.float32)
+    colors[:,0], colors[:,3] = np.linspace(0, 1, n), 1
+    widths = np.arange(n, dtype=np.float32)
+    collection, starts, sizes = styled(viewport, n, I, colors, widths)
+    # Paths are expanded into segments with values at their midpoint
+    assert sizes == [2]*(n - len(I))
+    assert np.allclose(collection.get_edgecolors(), (colors[starts] + colors[starts+1])/2)
+    assert np.allclose(collection.get_linewidths(), starts + 0.5)
+
+
+def grouped(viewport, grouping):
+    # Six paths of two vertices at distinct depths, identified by
+    # their first vertex
+    n = 6
+    P = line(2*n)
+    P[:,2] = np.repeat(np.random.default_rng(1).permutation(n)/n - 0.5, 2)
+    I = np.arange(2*n).reshape(n, 2)
+    paths = visual.Paths(P, I)
+    paths.render(viewport)
+    order = identifiers(paths._viewports[viewport], P)
+
+    S = np.array([core.LineStyle.solid, core.LineStyle.dashed]*(n//2))
+    # Start and end caps
+    butt, rnd = core.LineCap.butt, core.LineCap.round
+    C = np.array([butt, rnd, butt, butt, rnd, rnd, rnd, butt, butt, rnd, rnd, rnd])
+    J = np.array([core.LineJoin.bevel]*n)
+    paths.set_variable("line_styles", S)
+    paths.set_variable("line_caps", C)
+    paths.set_variable("line_joins", J)
+    paths.set_variable("grouping", grouping)
+    paths.render(viewport)
+    return paths, P, order, S, C[::2], J
+
+
+def identifiers(collection, P):
+    return [int(np.argmin(np.abs(P[::2,0] - path.vertices[0,0])))
+            for path in collection.get_paths()]
+
+
+def test_grouping_groups(viewport):
+    paths, P, order, S, C, J = grouped(viewport, "groups")
+    assert not paths._viewports[viewport].get_visible()
+    groups = {key: collection for key, collection in paths._groups[viewport].items()
+              if collection.get_visible()}
+    # Start caps are used when start and end caps are given
+    assert set(groups) == set(int(s)*16 + int(c)*4 + int(j) for s, c, j in zip(S, C, J))
+    for key, collection in groups.items():
+        items = identifiers(collection, P)
+        assert all(int(S[i])*16 + int(C[i])*4 + int(J[i]) == key for i in items)
+        # Items keep the depth order inside their group
+        assert items == [i for i in order if i in items]
+        assert collection.get_capstyle() == ("butt" if C[items[0]] == core.LineCap.butt else "round")
+        assert collection.get_joinstyle() == "bevel"
+    assert sum(len(collection.get_paths()) for collection in groups.values()) == 6
+
+
+def test_grouping_merged(viewport):
+    paths, P, order, S, C, J = grouped(viewport, "merged")
+    parts = paths._compositor._composites[viewport].parts
+    assert len(parts) > len(set(zip(S, C)))
+    assert sum((identifiers(part, P) for part in parts), []) == order
+    for collection in paths._groups[viewport].values():
+        assert not collection.get_visible()
+
+    paths.set_variable("grouping", "groups")
+    paths.render(viewport)
+    assert not paths._compositor._composites[viewport].parts
+
+
+def test_grouping_unknown(viewport):
+    paths = visual.Paths(line(), np.array([[0, 9]]))
+    paths.set_variable("grouping", "interleaved")
+    with pytest.raises(ValueError):
+        paths.render(viewport)
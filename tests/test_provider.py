@@ -0,0 +1,52 @@
+# Package: Graphic Server Protocol / Matplotlib
+# Authors: Nicolas P .Rougier <nicolas.rougier@inria.fr>
+# License: BSD 3 clause
+import numpy as np
+from gsp import core, visual, transform, glm
+from gsp.visual.provider import Provider
+
+
+def test_provider():
+    calls = []
+    def faces():
+        calls.append(1)
+        return np.ones(3)
+
+    provider = Provider(positions=np.zeros(3), faces=faces)
+    assert provider.keys() == {"positions", "faces"}
+    assert "faces" in provider and "normals" not in provider
+    assert provider.computed("positions") and not provider.computed("faces")
+    assert not calls
+    assert (provider["faces"] == 1).all()
+    assert (provider["faces"] == 1).all()
+    assert len(calls) == 1 and provider.computed("faces")
+
+
+def mesh(fill_colors):
+    rng = np.random.default_rng(1)
+    P = rng.uniform(-1, 1, (100, 3)).astype(np.float32)
+    F = rng.integers(0, 100, (50, 3))
+    return visual.Mesh(P, F, None, fill_colors)
+
+
+def render(mesh, viewport):
+    mesh.render(viewport, np.eye(4), glm.translate((0, 0, -5)),
+                glm.perspective(30, 1, 1, 100))
+
+
+def test_faces_are_lazy(viewport):
+    m = mesh(core.Color(1, 1, 1, 1))
+    render(m, viewport)
+    assert not m._variables["screen"].computed("faces")
+    assert not m._variables["depth"].computed("faces")
+
+
+def test_faces_on_request(viewport):
+    m = mesh(transform.Colormap("gray")(transform.Depth("faces")))
+    render(m, viewport)
+    assert m._variables["depth"].computed("faces")
+    assert not m._variables["screen"].computed("faces")
+    # Faces are drawn back to front, i.e. with increasing gray level
+    colors = m._viewports[viewport].get_facecolors()
+    assert len(colors) == 50
+    assert (np.diff(colors[:,0]) >= 0).all()
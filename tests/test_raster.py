@@ -0,0 +1,69 @@
+# Package: Graphic Server Protocol / Matplotlib
+# Authors: Nicolas P .Rougier <nicolas.rougier@inria.fr>
+# License: BSD 3 clause
+import numpy as np
+from gsp.visual import raster
+
+
+def buffers(width=8, height=8):
+    return np.zeros((height, width, 4)), np.zeros((height, width))
+
+
+def test_coverage():
+    # Two triangles covering the whole image
+    image, zbuffer = buffers()
+    vertices = np.array([[(0,0), (8,0), (8,8)], [(0,0), (8,8), (0,8)]], float)
+    colors = np.array([(1,0,0,1), (0,1,0,1)], float)
+    raster.rasterize(vertices, np.zeros((2,3)), colors, image, zbuffer)
+    assert np.isfinite(zbuffer).all()
+    # Pixel centers below the diagonal belong to the first triangle
+    j, i = np.mgrid[0:8, 0:8]
+    assert (image[i > j] == (1,0,0,1)).all()
+    assert (image[i < j] == (0,1,0,1)).all()
+
+
+def test_depth():
+    # Nearest triangle wins whatever the order
+    image, zbuffer = buffers()
+    triangle = [(0,0), (8,0), (0,8)]
+    vertices = np.array([triangle, triangle], float)
+    depth = np.array([(2,2,2), (1,1,1)], float)
+    colors = np.array([(1,0,0,1), (0,1,0,1)], float)
+    raster.rasterize(vertices, depth, colors, image, zbuffer)
+    covered = np.isfinite(zbuffer)
+    assert covered.sum() == 36
+    assert (zbuffer[covered] == 1).all()
+    assert (image[covered] == (0,1,0,1)).all()
+    assert (image[~covered] == 0).all()
+
+    reference = image.copy()
+    raster.rasterize(vertices[::-1], depth[::-1], colors[::-1], image, zbuffer)
+    assert np.array_equal(image, reference)
+
+
+def test_interpolated_depth():
+    image, zbuffer = buffers()
+    vertices = np.array([[(0,0), (8,0), (8,8)], [(0,0), (8,8), (0,8)]], float)
+    depth = np.array([(0,8,8), (0,8,0)], float)
+    colors = np.ones((2,4))
+    raster.rasterize(vertices, depth, colors, image, zbuffer)
+    assert np.allclose(zbuffer, np.arange(8) + 0.5)
+
+
+def test_batches():
+    rng = np.random.default_rng(1)
+    vertices = rng.uniform(-2, 10, (50,3,2))
+    depth = rng.uniform(0, 1, (50,3))
+    colors = rng.uniform(0, 1, (50,4))
+    image, zbuffer = buffers()
+    raster.rasterize(vertices, depth, colors, image, zbuffer)
+    batched, zbatched = buffers()
+    raster.rasterize(vertices, depth, colors, batched, zbatched, batch=16)
+    assert np.array_equal(image, batched) and np.array_equal(zbuffer, zbatched)
+
+
+def test_degenerate():
+    image, zbuffer = buffers()
+    vertices = np.array([[(0,0), (4,4), (8,8)]], float)
+    raster.rasterize(vertices, np.zeros((1,3)), np.ones((1,4)), image, zbuffer)
+    assert np.isinf(zbuffer).all() and (image == 0).all()
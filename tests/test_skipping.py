@@ -0,0 +1,71 @@
+# Package: Graphic Server Protocol / Matplotlib
+# Authors: Nicolas P .Rougier <nicolas.rougier@inria.fr>
+# License: BSD 3 clause
+import numpy as np
+from gsp import core, visual, transform
+from gsp.visual.visual import tracked
+
+
+def buffer(P):
+    P = np.asarray(P, dtype=np.float32)
+    data = core.Data(nbytes=P.nbytes)
+    data.set_data(0, P.tobytes())
+    return core.Buffer(P.size, np.dtype(np.float32), data, 0)
+
+
+def test_tracked():
+    P = np.zeros((10, 3))
+    assert tracked(buffer(P)) and tracked(25) and tracked(core.Color(0, 0, 0, 1))
+    assert not tracked(P) and not tracked([0, 1])
+    assert not tracked(transform.X(P))
+    assert tracked(transform.X(buffer(P)))
+
+
+def test_untracked_arrays_are_not_skipped(viewport):
+    P = np.random.default_rng(0).uniform(-1, 1, (100, 3)).astype(np.float32)
+    points = visual.Points(P, 25)
+    points.render(viewport)
+    points.render(viewport)
+    assert points.counters["skipped"] == 0
+    P[...] *= 0.5
+    points.render(viewport)
+    offsets = points._viewports[viewport].get_offsets()
+    assert np.abs(offsets).max() <= 0.5
+
+
+def test_tracked_buffers_are_skipped(viewport):
+    P = np.random.default_rng(0).uniform(-1, 1, (100, 3))
+    B = buffer(P)
+    points = visual.Points(B, 25)
+    points.render(viewport)
+    points.render(viewport)
+    assert points.counters["skipped"] == 1
+    B.set_data(0, (0.5*P).astype(np.float32).tobytes())
+    points.render(viewport)
+    assert points.counters["skipped"] == 1
+    assert np.abs(points._viewports[viewport].get_offsets()).max() <= 0.5
+
+
+def test_transform_parameters_are_tracked(viewport):
+    P = np.random.default_rng(0).uniform(-1, 1, (100, 3))
+    colormap = transform.Colormap("gray")(transform.X(buffer(P)))
+    points = visual.Points(buffer(P), 25, colormap)
+    points.render(viewport)
+    points.render(viewport)
+    assert points.counters["skipped"] == 1
+    before = points._viewports[viewport].get_facecolors().copy()
+    colormap.set_colormap("magma")
+    points.render(viewport)
+    assert points.counters["skipped"] == 1
+    assert not np.array_equal(before, points._viewports[viewport].get_facecolors())
+
+
+def test_mutable_transform_parameters_are_not_tracked():
+    P = np.zeros((10, 3))
+    light = transform.Light((0, 0, 1))
+    assert not tracked(light)
+    X = transform.X(buffer(P))
+    X._key = {"mutable": True}
+    assert not tracked(X)
+    X._key = ("x", 0)
+    assert tracked(X)
@@ -0,0 +1,52 @@
+# Package: Graphic Server Protocol / Matplotlib
+# Authors: Nicolas P .Rougier <nicolas.rougier@inria.fr>
+# License: BSD 3 clause
+import numpy as np
+import pytest
+from gsp import visual
+from gsp.visual.visual import radix_argsort
+
+
+def test_radix_argsort_quantized_order():
+    depth = np.random.default_rng(0).uniform(-1, 1, 10000).astype(np.float32)
+    order = radix_argsort(depth, 16)
+    assert sorted(order) == list(range(len(depth)))
+    step = 2 / (2**16 - 1)
+    assert (np.diff(depth[order]) >= -step).all()
+
+
+def test_radix_argsort_ties_are_stable():
+    depth = np.array([0.0, 1.0, 0.5, 0.5001, 0.4999, 1.0])
+    order = radix_argsort(depth, 2)
+    assert list(order) == [0, 2, 3, 4, 1, 5]
+
+
+def test_radix_argsort_high_precision_is_exact():
+    depth = np.random.default_rng(1).uniform(-1, 1, 1000)
+    assert (radix_argsort(depth, 24) == np.argsort(depth, kind="stable")).all()
+    with pytest.raises(ValueError):
+        radix_argsort(depth, 0)
+
+
+@pytest.mark.parametrize("mode", ["full", "coherent", "radix"])
+def test_sort_modes(viewport, mode):
+    rng = np.random.default_rng(2)
+    points = visual.Points(rng.uniform(-1, 1, (1000, 3)))
+    points.set_variable("sorting", mode)
+    for i in range(3):
+        depth = rng.uniform(-1, 1, 1000).astype(np.float32)
+        order = points.sort(viewport, depth)
+        assert sorted(order) == list(range(1000))
+        tolerance = 2 / (2**16 - 1) if mode == "radix" else 0
+        assert (np.diff(depth[order]) >= -tolerance).all()
+
+
+def test_coherent_sort_reuses_order(viewport):
+    points = visual.Points(np.zeros((100, 3)))
+    depth = np.random.default_rng(3).uniform(-1, 1, 100)
+    first = points.sort(viewport, depth)
+    depth[first[:10]] -= 1e-6
+    second = points.sort(viewport, depth)
+    assert (np.diff(depth[second]) >= 0).all()
+    points.set_variable("sorting", None)
+    assert (points.sort(viewport, depth) == np.arange(100)).all()
@@ -0,0 +1,125 @@
+# Package: Graphic Server Protocol / Matplotlib
+# Authors: Nicolas P .Rougier <nicolas.rougier@inria.fr>
+# License: BSD 3 clause
+import numpy as np
+import pytest
+from matplotlib.path import Path
+from gsp.core import svg
+
+M, L, Q, C, Z = Path.MOVETO, Path.LINETO, Path.CURVE3, Path.CURVE4, Path.CLOSEPOLY
+
+
+def normalized(vertices):
+    """ Expected vertices normalized to [-0.5, +0.5] with y up. """
+
+    vertices = np.array(vertices, dtype=float)
+    lower, upper = vertices.min(), vertices.max()
+    vertices = (vertices - lower)/(upper - lower) - 0.5
+    vertices[:,1] *= -1
+    return vertices
+
+
+def check(pathdef, vertices, codes):
+    path = svg.svg_to_path(pathdef)
+    assert list(path.codes) == codes
+    assert np.allclose(path.vertices, normalized(vertices))
+
+
+def samples(pathdef):
+    vertices, codes, offsets = svg._parse_paths([pathdef], 0j)
+    path = Path(vertices, codes)
+    return vertices, np.concatenate([curve(np.linspace(0, 1, 32))
+                                     for curve, code in path.iter_bezier()])
+
+
+@pytest.mark.parametrize("pathdef", [
+    "m10 10 l 5 5 5 -5 h 3 v 4 H 1 V 2 z m 3 3 l 1 1 z",
+    "M10 10 L15 15 20 10 H23 V14 H1 V2 Z M13 13 L14 14 Z"])
+def test_relative_absolute(pathdef):
+    check(pathdef,
+          [(10,10), (15,15), (20,10), (23,10), (23,14), (1,14), (1,2),
+           (10,10), (10,10), (13,13), (14,14), (13,13), (13,13)],
+          [M, L, L, L, L, L, L, L, Z, M, L, L, Z])
+
+
+def test_close_then_relative():
+    # Relative commands following Z are relative to the subpath start
+    check("M0,0 L10,0 L10,10 Z l 1 1",
+          [(0,0), (10,0), (10,10), (0,0), (0,0), (1,1)],
+          [M, L, L, L, Z, L])
+
+
+def test_smooth_cubic_chain():
+    # First control point is the reflection of the previous one
+    check("M10,10 C 20,20 30,20 40,10 S 60,0 70,10 s 10 10 20 0",
+          [(10,10), (20,20), (30,20), (40,10), (50,0), (60,0), (70,10),
+           (80,20), (80,20), (90,10)],
+          [M] + [C]*9)
+
+
+def test_smooth_quadratic_chain():
+    check("M10 10 Q 20 20 30 10 T 50 10 t 10 0",
+          [(10,10), (20,20), (30,10), (40,0), (50,10), (60,20), (60,10)],
+          [M] + [Q]*6)
+
+
+def test_numbers():
+    # Signs, dots and exponents separate numbers, implicit lineto
+    check("M1-2.5.5.5L3e1,4E-1",
+          [(1,-2.5), (0.5,0.5), (30,0.4)], [M, L, L])
+
+
+def test_offset():
+    # Initial moveto is relative to the given position
+    vertices, codes, offsets = svg._parse_paths(["m 1 1 l 2 4"], 3+4j)
+    assert np.allclose(vertices, [(4,5), (6,9)])
+    vertices, codes, offsets = svg._parse_paths(["m 1 1 l 2 4"], 0j)
+    assert np.allclose(vertices, [(1,1), (3,5)])
+
+
+@pytest.mark.parametrize("sweep, side", [(1, -1), (0, +1)])
+def test_arc(sweep, side):
+    vertices, points = samples(f"M 0 0 A 10 10 0 0 {sweep} 20 0")
+    assert np.allclose(vertices[[0,-1]], [(0,0), (20,0)])
+    radius = np.hypot(*(points - (10,0)).T)
+    assert np.allclose(radius, 10, rtol=1e-4)
+    # Sweep flag selects the half circle
+    assert (side*points[:,1] > -1e-9).all()
+    assert np.isclose(side*points[:,1], 10).any()
+
+
+def test_arc_large_relative():
+    # Almost full circle around (10,0)
+    vertices, points = samples("M 0 0 a 10 10 0 1 1 0 0.001")
+    radius = np.hypot(*(points - (10,0)).T)
+    assert np.allclose(radius, 10, rtol=1e-3)
+    assert np.allclose(vertices[-1], (0, 0.001))
+    assert points[:,0].max() == pytest.approx(20, rel=1e-3)
+
+
+def test_arc_scaled_radius():
+    # Radius too small to reach the end point is scaled up
+    vertices, points = samples("M 0 0 A 5 5 0 0 1 40 0")
+    assert np.allclose(np.hypot(*(points - (20,0)).T), 20, rtol=1e-4)
+
+
+def test_arc_zero_radius():
+    # Arc with a zero radius is a line
+    vertices, codes, offsets = svg._parse_paths(["M0 0 A 0 5 0 0 0 40 40"], 0j)
+    assert list(codes) == [M, L]
+    assert np.allclose(vertices, [(0,0), (40,40)])
+
+
+def test_batch():
+    pathdefs = ["M0 0 L1 1", "", "M10 10 Q 20 20 30 10 T 50 10", "M0 0 L1 1"]
+    paths = svg.svg_to_paths(pathdefs)
+    assert len(paths) == 4 and len(paths[1].vertices) == 0
+    for pathdef, path in zip(pathdefs, paths):
+        single = svg.svg_to_path(pathdef)
+        assert np.array_equal(single.vertices, path.vertices)
+
+
+@pytest.mark.parametrize("pathdef", ["L 1 1 z", "M 1 1 2", "1 2 M 3 4"])
+def test_invalid(pathdef):
+    with pytest.raises(ValueError):
+        svg.svg_to_paths(["M0 0 L1 1", pathdef])